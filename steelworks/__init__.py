@@ -0,0 +1,6 @@
+"""Reusable building blocks for the steel temperature / energy pipeline.
+
+The notebook export ``energy_consumption_reduction.py`` walks through the
+analysis step by step; the modules in this package hold the parts of it that
+are worth running outside of a notebook.
+"""
@@ -0,0 +1,8 @@
+"""``python -m steelworks <command>``; see :mod:`steelworks.cli`."""
+
+import sys
+
+from .cli import main
+
+
+sys.exit(main())
@@ -0,0 +1,190 @@
+"""Batch scoring of a whole feature table, for the historical backfill.
+
+``predict`` on one in-memory DataFrame needs the whole archive in memory.
+:func:`score_table` streams the feature rows of an Arrow IPC / Feather file
+(the training table written by ``steelworks features``, with
+``--partitions`` for a history that does not fit in memory) in chunks of
+``chunk_rows`` heats:
+
+* the main thread reads the chunks one after another and hands them to a
+  pool of ``threads`` threads.  LightGBM, CatBoost and the NumPy trees of
+  :mod:`steelworks.trees` predict without holding the GIL, so the chunks are
+  predicted in parallel, each call on one thread.  At most two chunks per
+  thread are read ahead, so memory is bounded by ``chunk_rows`` and
+  ``threads``, not by the length of the input;
+* every predicted chunk is committed, in input order, as an Arrow file of
+  ``key`` (when the input has it) and ``prediction`` in a ``.parts``
+  directory next to the output: written under a temporary name and renamed,
+  so a chunk file is either complete or missing;
+* once all chunks are committed they are concatenated into ``output`` (an
+  Arrow IPC file, readable with ``pandas.read_feather``) and the directory
+  is removed.
+
+An interrupted run is resumed: the next call with the same input, model and
+``chunk_rows`` skips the committed chunks and predicts only the rest.  Any
+other call starts over.  The returned summary has the throughput in heats
+per second.
+"""
+
+import collections
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+
+from . import trace
+from .columns import FEATURE_COLUMNS, KEY
+from .io import _fingerprint
+from .models import load_model, predictor
+from .parallel import effective_n_jobs
+
+
+CHUNK_ROWS = 50_000
+PARTS_SUFFIX = '.parts'
+MANIFEST = 'manifest.json'
+
+
+def _chunk_path(parts_dir, chunk):
+    return os.path.join(parts_dir, f'chunk-{chunk:06d}.arrow')
+
+
+def _write_arrow(table, path):
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _committed_chunks(parts_dir, settings):
+    """Number of leading chunks already committed under ``settings``; clears
+    ``parts_dir`` when it belongs to another run."""
+    try:
+        with open(os.path.join(parts_dir, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    if manifest != settings:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        os.makedirs(parts_dir)
+        with open(os.path.join(parts_dir, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(settings, f)
+        return 0
+    chunk = 0
+    while os.path.exists(_chunk_path(parts_dir, chunk)):
+        chunk += 1
+    return chunk
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS, start=0, columns=FEATURE_COLUMNS):
+    """Yield (chunk number, keys or None, 2-D float array in ``columns``
+    order) of the Arrow IPC / Feather file ``path``, ``chunk_rows`` rows at a
+    time, from chunk ``start`` on."""
+    skip = start * chunk_rows
+    chunk = start
+    pending, size = [], 0
+    with pa.memory_map(path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        names = reader.schema.names
+        missing = [c for c in columns if c not in names]
+        if missing:
+            raise ValueError(f'{path} has no columns {missing}')
+        selected = [*columns, KEY] if KEY in names else list(columns)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            batch = batch.slice(skip).select(selected)
+            skip = 0
+            while batch.num_rows:
+                part = batch.slice(0, chunk_rows - size)
+                batch = batch.slice(part.num_rows)
+                pending.append(part)
+                size += part.num_rows
+                if size == chunk_rows:
+                    yield (chunk, *_arrays(pending, columns))
+                    chunk += 1
+                    pending, size = [], 0
+        if size:
+            yield (chunk, *_arrays(pending, columns))
+
+
+def _arrays(batches, columns):
+    table = pa.Table.from_batches(batches)
+    rows = np.column_stack([table.column(c).to_numpy().astype(np.float64) for c in columns])
+    keys = table.column(KEY).to_numpy() if KEY in table.column_names else None
+    return keys, rows
+
+
+def _predict_chunk(predict, keys, rows):
+    predictions = np.asarray(predict(rows), dtype=np.float64)
+    columns = {'prediction': predictions}
+    if keys is not None:
+        columns = {KEY: keys, **columns}
+    return pa.table(columns)
+
+
+def _concatenate(parts_dir, n_chunks, output):
+    tmp = output + '.tmp'
+    with pa.OSFile(tmp, 'wb') as sink:
+        writer = None
+        for chunk in range(n_chunks):
+            with pa.memory_map(_chunk_path(parts_dir, chunk), 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+                if writer is None:
+                    writer = pa.ipc.new_file(sink, table.schema)
+                writer.write_table(table)
+        if writer is None:
+            # No rows to score: an empty file with the prediction column.
+            writer = pa.ipc.new_file(sink, pa.schema([('prediction', pa.float64())]))
+        writer.close()
+    os.replace(tmp, output)
+
+
+def score_table(model_path, path, output, chunk_rows=CHUNK_ROWS, threads=-1):
+    """Predict every row of ``path`` with the model saved at ``model_path``
+    and write them to ``output``; returns a summary dict (see the module
+    docstring)."""
+    threads = effective_n_jobs(threads)
+    parts_dir = output + PARTS_SUFFIX
+    settings = {'input': {'path': os.path.abspath(path), **_fingerprint(path)},
+                'model': {'path': os.path.abspath(model_path), **_fingerprint(model_path)},
+                'chunk_rows': chunk_rows}
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    committed = _committed_chunks(parts_dir, settings)
+    predict = predictor(load_model(model_path), threads=1)
+
+    started = time.perf_counter()
+    heats = 0
+    chunk = committed
+    with trace.stage('score_table', 'io', path=path, chunk_rows=chunk_rows, threads=threads,
+                     resumed_chunks=committed) as span, \
+            ThreadPoolExecutor(threads, thread_name_prefix='score') as executor:
+        running = collections.deque()
+
+        def commit():
+            nonlocal heats
+            number, future = running.popleft()
+            table = future.result()
+            tmp = _chunk_path(parts_dir, number) + '.tmp'
+            _write_arrow(table, tmp)
+            os.replace(tmp, _chunk_path(parts_dir, number))
+            heats += table.num_rows
+
+        for number, keys, rows in iter_chunks(path, chunk_rows, start=committed):
+            running.append((number, executor.submit(_predict_chunk, predict, keys, rows)))
+            chunk = number + 1
+            while len(running) >= 2 * threads:
+                commit()
+        while running:
+            commit()
+        span.rows_out = heats
+    seconds = time.perf_counter() - started
+    _concatenate(parts_dir, chunk, output)
+    shutil.rmtree(parts_dir)
+    return {'heats': heats, 'chunks': chunk, 'resumed_chunks': committed, 'seconds': seconds,
+            'heats_per_s': heats / seconds if seconds > 0 else float('nan')}
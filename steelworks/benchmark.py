@@ -0,0 +1,250 @@
+"""End-to-end benchmark of the pipeline on synthetic data.
+
+For every requested size (number of heats) a dataset is generated with
+:mod:`steelworks.synthetic`, written as CSV once and then run through the same
+steps as the notebook, each one timed and memory-profiled on its own:
+
+* ``load_csv`` - :func:`steelworks.io.load_tables` with an empty cache (CSV
+  parsing plus writing the Feather cache);
+* ``load_cached`` - the same call with a warm cache;
+* ``summary`` - :meth:`HeatSummary.from_measurements`;
+* ``clean`` - the quality rules and the accepted keys;
+* ``features`` - :func:`build_training_table` (arc energy and all the merges);
+* ``train_linear`` / ``train_lgbm`` - fitting the models on the training table;
+* ``features_sparse``, ``train_linear_sparse``, ``train_lgbm_sparse`` - the
+  same with sparse Bulk/Wire columns and a CSR feature matrix.
+
+Memory is reported twice.  ``peak_mb`` is the peak of memory allocated
+through Python and NumPy during the stage (tracemalloc); it does not depend on
+what the allocator kept from earlier stages, so it is the number regressions
+are checked against.  As tracing slows the code down, it is measured in a
+second, untimed run of the stage.  ``rss_mb`` is the growth of the resident
+set during the timed run and also covers native buffers (Arrow, LightGBM); on
+Linux the kernel's high-water mark is reset before every stage, elsewhere it
+is only a lower bound.  Every size runs in a fresh process.
+
+Results are written as JSON and can be compared against a stored baseline::
+
+    python -m steelworks.benchmark --heats 10000 100000 --compare benchmarks/baseline.json
+    python -m steelworks.benchmark --heats 10000 100000 1000000 --save benchmarks/baseline.json
+
+A stage regresses when it is more than ``--tolerance`` slower or larger than
+the baseline (and not just by noise-level amounts); the command then exits
+with status 1.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .features import TARGET, build_training_table, feature_matrix
+from .io import load_tables
+from .quality import accepted_keys, check_quality
+from .summary import HeatSummary
+from .synthetic import generate_tables, write_tables
+from .trace import PeakRss
+
+
+STAGES = ('load_csv', 'load_cached', 'summary', 'clean', 'features',
+          'train_linear', 'train_lgbm', 'features_sparse', 'train_linear_sparse',
+          'train_lgbm_sparse')
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_DATA_DIR = './benchmarks/data'
+DEFAULT_BASELINE = './benchmarks/baseline.json'
+
+# Differences below these are noise, whatever the ratio.
+MIN_SECONDS = 0.05
+MIN_MB = 16.0
+
+
+def dataset(n_heats, data_dir=DEFAULT_DATA_DIR, seed=0):
+    """Directory with the CSVs of the ``n_heats`` synthetic dataset, generated
+    on first use."""
+    path = os.path.join(data_dir, f'heats_{n_heats}_seed_{seed}')
+    marker = os.path.join(path, 'complete')
+    if not os.path.exists(marker):
+        write_tables(generate_tables(n_heats, seed), path)
+        open(marker, 'w').close()
+    return path
+
+
+def _traced_peak_mb(func, *args, setup=None):
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def _n_rows(result):
+    if isinstance(result, dict):
+        return sum(len(table) for table in result.values())
+    return len(result)
+
+
+def _train(model, final_df, sparse=False):
+    X = feature_matrix(final_df) if sparse else final_df.drop(['key', TARGET], axis=1)
+    return model.fit(X, final_df[TARGET])
+
+
+def run_pipeline(path, repeat=1):
+    """Rows of (stage, seconds, peak_mb, rss_mb, rows) for the dataset at ``path``;
+    with ``repeat > 1`` the best of the runs is kept for every stage."""
+    from lightgbm import LGBMRegressor
+    from sklearn.linear_model import LinearRegression
+
+    cache_dir = os.path.join(path, '.cache')
+    best = {}
+
+    def clear_cache():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def measure(stage, func, *args, rows=None, setup=None):
+        if setup is not None:
+            setup()
+        with PeakRss() as rss:
+            start = time.perf_counter()
+            result = func(*args)
+            seconds = time.perf_counter() - start
+        row = {'stage': stage, 'seconds': seconds,
+               'peak_mb': _traced_peak_mb(func, *args, setup=setup), 'rss_mb': rss.rss_mb,
+               'rows': _n_rows(result) if rows is None else rows}
+        previous = best.get(stage)
+        if previous is not None:
+            row.update({name: min(row[name], previous[name])
+                        for name in ('seconds', 'peak_mb', 'rss_mb')})
+        best[stage] = row
+        return result
+
+    for _ in range(repeat):
+        tables = measure('load_csv', load_tables, path, cache_dir, setup=clear_cache)
+        del tables
+        tables = measure('load_cached', load_tables, path, cache_dir)
+        heats = measure('summary', HeatSummary.from_measurements, tables['data_temp'])
+        keys = measure('clean', lambda: accepted_keys(check_quality(tables, heats)))
+        for suffix, sparse in (('', False), ('_sparse', True)):
+            final_df = measure('features' + suffix, build_training_table, tables, heats, keys,
+                               sparse)
+            # The sparse solver of LinearRegression (LSQR) needs a tighter
+            # tolerance than its default to match the dense solution.
+            for stage, model in (('train_linear', LinearRegression(tol=1e-10)),
+                                 ('train_lgbm', LGBMRegressor(n_estimators=100,
+                                                              random_state=12345, verbose=-1))):
+                measure(stage + suffix, _train, model, final_df, sparse, rows=len(final_df))
+            del final_df
+        del tables, heats, keys
+    return [best[stage] for stage in STAGES]
+
+
+def _run_size(n_heats, data_dir, seed, repeat):
+    path = dataset(n_heats, data_dir, seed)
+    return [{'heats': n_heats, **row} for row in run_pipeline(path, repeat)]
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, data_dir=DEFAULT_DATA_DIR, seed=0, repeat=1):
+    """Benchmark every size in a fresh process; returns a DataFrame with one
+    row per (heats, stage)."""
+    rows = []
+    for n_heats in sizes:
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            rows.extend(pool.apply(_run_size, (n_heats, data_dir, seed, repeat)))
+    return pd.DataFrame(rows, columns=['heats', 'stage', 'seconds', 'peak_mb', 'rss_mb', 'rows'])
+
+
+def environment():
+    import lightgbm
+    import sklearn
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'lightgbm': lightgbm.__version__,
+    }
+
+
+def read_results(path):
+    with open(path, encoding='utf-8') as f:
+        document = json.load(f)
+    return pd.DataFrame(document['results'])
+
+
+def write_results(results, path):
+    """Write ``results`` as JSON; sizes already in the file and not in
+    ``results`` are kept, so a baseline can be extended size by size."""
+    if os.path.exists(path):
+        kept = read_results(path)
+        results = pd.concat([kept[~kept['heats'].isin(results['heats'])], results])
+    order = results['stage'].map(STAGES.index)
+    results = results.assign(order=order).sort_values(['heats', 'order']).drop(columns='order')
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    document = {'environment': environment(), 'results': results.to_dict('records')}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+
+
+def compare(results, baseline, tolerance=0.25):
+    """``results`` joined with ``baseline`` on (heats, stage), with the
+    time and memory ratios and a ``regression`` flag."""
+    table = results.merge(baseline[['heats', 'stage', 'seconds', 'peak_mb']],
+                          on=['heats', 'stage'], suffixes=('', '_baseline'))
+    table['time_ratio'] = table['seconds'] / table['seconds_baseline']
+    table['memory_ratio'] = table['peak_mb'] / table['peak_mb_baseline']
+    slower = ((table['time_ratio'] > 1 + tolerance)
+              & (table['seconds'] - table['seconds_baseline'] > MIN_SECONDS))
+    larger = ((table['memory_ratio'] > 1 + tolerance)
+              & (table['peak_mb'] - table['peak_mb_baseline'] > MIN_MB))
+    table['regression'] = slower | larger
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--heats', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help='where the generated datasets are kept between runs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help='keep the best of N runs')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--save', metavar='BASELINE', help='store the results as the baseline')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against this baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.heats, args.data_dir, args.seed, args.repeat)
+    with pd.option_context('display.width', 120, 'display.max_rows', None):
+        print(results.to_string(index=False, float_format='{:.3f}'.format))
+        if args.output:
+            write_results(results, args.output)
+        if args.save:
+            write_results(results, args.save)
+        if args.compare:
+            table = compare(results, read_results(args.compare), args.tolerance)
+            print()
+            print(table[['heats', 'stage', 'seconds', 'seconds_baseline', 'time_ratio',
+                         'peak_mb', 'peak_mb_baseline', 'memory_ratio', 'regression']]
+                  .to_string(index=False, float_format='{:.2f}'.format))
+            if table['regression'].any():
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
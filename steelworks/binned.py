@@ -0,0 +1,188 @@
+"""Binned training sets of the search folds, built once per fold.
+
+Before growing a single tree LightGBM bins every feature into histogram
+buckets and CatBoost quantizes it into borders, and ``fit`` does this again
+for every candidate of a search although the bins only depend on the fold's
+rows and a few binning parameters (``max_bin``, ``border_count``, ...), never
+on the depth, learning rate or l2 the notebook's grids vary.
+:class:`FoldDatasets` keeps one ``lightgbm.Dataset`` and one quantized
+``catboost.Pool`` per fold (plus the eval sets of the learning curves) and
+trains every candidate on them; the fitted models and scores are the same
+as with ``fit`` on the raw rows.
+
+Both are kept per set of binning parameters: LightGBM Datasets per value
+of the Dataset-level parameters (:data:`DATASET_PARAMS`), CatBoost pools per
+set of quantization parameters.  The Datasets are built without
+``feature_pre_filter``, so that candidates with different
+``min_child_samples`` share them; it only drops features no split could use,
+so the trees are the same.  Should a candidate still make LightGBM rebuild
+a Dataset (a Dataset-level alias not listed here), that Dataset is dropped
+after the candidate, so later candidates never train on its bins.  Other
+estimators are not supported (:meth:`FoldDatasets.supports`) and are fitted
+as usual.
+"""
+
+import time
+
+import numpy as np
+from sklearn.base import clone
+
+
+# LightGBM parameters (and the aliases LGBMRegressor passes) that decide the
+# bins of a Dataset.
+DATASET_PARAMS = ('max_bin', 'max_bin_by_feature', 'min_data_in_bin', 'bin_construct_sample_cnt',
+                  'data_random_seed', 'seed', 'random_state', 'use_missing', 'zero_as_missing',
+                  'enable_bundle', 'is_enable_sparse', 'linear_tree', 'categorical_feature',
+                  'forcedbins_filename', 'feature_pre_filter')
+# With feature_pre_filter on, the Dataset also depends on the leaf size.
+PRE_FILTER_PARAMS = ('min_data_in_leaf', 'min_child_samples')
+
+# CatBoost parameters that decide the borders of a quantized pool.
+QUANTIZE_PARAMS = ('border_count', 'feature_border_type', 'nan_mode',
+                   'per_float_feature_quantization')
+
+
+def library(estimator):
+    """'lightgbm', 'catboost' or None, from the module of the estimator's class."""
+    module = type(estimator).__module__
+    for name in ('lightgbm', 'catboost'):
+        if module.startswith(name):
+            return name
+    return None
+
+
+def lightgbm_params(model):
+    """Booster parameters of an ``LGBMRegressor``; the scikit-learn names of
+    its parameters are all aliases the booster understands."""
+    params = model.get_params()
+    for name in ('n_estimators', 'importance_type', 'class_weight'):
+        params.pop(name, None)
+    params['objective'] = params.get('objective') or 'regression'
+    return {name: value for name, value in params.items() if value is not None}
+
+
+def dataset_params(booster_params):
+    """The Dataset-level part of ``booster_params``, with
+    ``feature_pre_filter`` off unless they turn it on."""
+    params = {name: booster_params[name] for name in DATASET_PARAMS if name in booster_params}
+    params.setdefault('feature_pre_filter', False)
+    if params['feature_pre_filter']:
+        params.update((name, booster_params[name]) for name in PRE_FILTER_PARAMS
+                      if name in booster_params)
+    return params
+
+
+class FoldDatasets:
+    """LightGBM Datasets and CatBoost Pools of ``folds``, built on first use."""
+
+    def __init__(self, X, y, folds):
+        self.X, self.y, self.folds = X, y, folds
+        self._sets = {}
+
+    @staticmethod
+    def supports(estimator):
+        return library(estimator) is not None
+
+    @staticmethod
+    def _lightgbm_key(kind, fold, params):
+        return kind, fold, tuple(sorted((name, repr(value)) for name, value in params.items()))
+
+    def _lightgbm_train(self, fold, params):
+        params = dataset_params(params)
+        key = self._lightgbm_key('lightgbm', fold, params)
+        if key not in self._sets:
+            import lightgbm
+
+            train, _ = self.folds[fold]
+            dataset = lightgbm.Dataset(self.X[train], self.y[train], free_raw_data=False,
+                                       params={**params, 'verbose': -1}).construct()
+            self._sets[key] = dataset, dict(dataset.params)
+        return self._sets[key][0]
+
+    def _lightgbm_valid(self, fold, params):
+        key = self._lightgbm_key('lightgbm_valid', fold, dataset_params(params))
+        if key not in self._sets:
+            import lightgbm
+
+            _, test = self.folds[fold]
+            reference = self._lightgbm_train(fold, params)
+            dataset = lightgbm.Dataset(self.X[test], self.y[test], free_raw_data=False,
+                                       params=reference.params, reference=reference).construct()
+            self._sets[key] = dataset, dict(dataset.params)
+        return self._sets[key][0]
+
+    def _drop_rebuilt(self):
+        # lightgbm.train rebuilds a Dataset whose parameters conflict with the
+        # candidate's and keeps the candidate's parameters in it.
+        for key, (dataset, params) in list(self._sets.items()):
+            if key[0].startswith('lightgbm') and dataset.params != params:
+                del self._sets[key]
+
+    def _catboost_pool(self, fold, model):
+        params = model.get_params()
+        quantization = {name: params[name] for name in QUANTIZE_PARAMS if params.get(name) is not None}
+        key = 'catboost', fold, tuple(sorted(quantization.items()))
+        if key not in self._sets:
+            from catboost import Pool
+
+            train, _ = self.folds[fold]
+            pool = Pool(self.X[train], self.y[train])
+            pool.quantize(**quantization)
+            self._sets[key] = pool
+        return self._sets[key]
+
+    def _catboost_eval(self, fold):
+        key = 'catboost_eval', fold
+        if key not in self._sets:
+            from catboost import Pool
+
+            _, test = self.folds[fold]
+            self._sets[key] = Pool(self.X[test], self.y[test])
+        return self._sets[key]
+
+    def fit_and_score(self, estimator, params, fold):
+        """Like :func:`steelworks.search.fit_and_score` on the whole fold."""
+        model = clone(estimator).set_params(**params)
+        _, test = self.folds[fold]
+        start = time.perf_counter()
+        if library(model) == 'lightgbm':
+            import lightgbm
+
+            booster_params = lightgbm_params(model)
+            model = lightgbm.train(booster_params, self._lightgbm_train(fold, booster_params),
+                                   num_boost_round=model.n_estimators)
+            self._drop_rebuilt()
+        else:
+            model.fit(self._catboost_pool(fold, model))
+        fit_time = time.perf_counter() - start
+        mae = float(np.mean(np.abs(self.y[test] - model.predict(self.X[test]))))
+        return mae, fit_time
+
+    def learning_curve(self, estimator, params, fold, patience=None):
+        """Like :func:`steelworks.search.learning_curve` on the whole fold."""
+        model = clone(estimator).set_params(**params)
+        start = time.perf_counter()
+        if library(model) == 'lightgbm':
+            import lightgbm
+
+            booster_params = {**lightgbm_params(model), 'metric': 'l1'}
+            evals = {}
+            callbacks = [lightgbm.record_evaluation(evals)]
+            if patience is not None:
+                callbacks.append(lightgbm.early_stopping(patience, verbose=False))
+            lightgbm.train(booster_params, self._lightgbm_train(fold, booster_params),
+                           num_boost_round=model.n_estimators,
+                           valid_sets=[self._lightgbm_valid(fold, booster_params)],
+                           valid_names=['valid'], callbacks=callbacks)
+            self._drop_rebuilt()
+            curve = evals['valid']['l1']
+        else:
+            if model.get_params().get('learning_rate') is None:
+                # CatBoost derives the learning rate from the number of iterations.
+                raise ValueError('CatBoost learning curves need a fixed learning_rate')
+            model.set_params(eval_metric='MAE', use_best_model=False)
+            model.fit(self._catboost_pool(fold, model), eval_set=self._catboost_eval(fold),
+                      early_stopping_rounds=patience)
+            curve = model.get_evals_result()['validation']['MAE']
+        fit_time = time.perf_counter() - start
+        return np.asarray(curve, dtype=np.float64), fit_time
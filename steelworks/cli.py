@@ -0,0 +1,401 @@
+"""Command-line interface of the pipeline.
+
+::
+
+    python -m steelworks ingest --data-dir ./final_steel
+    python -m steelworks features --data-dir ./final_steel --output final_df.feather
+    python -m steelworks train --model lgbm --input final_df.feather --output models/lgbm.pkl
+    python -m steelworks update --model models/lgbm.pkl --input final_df.feather
+    python -m steelworks predict --model models/lgbm.pkl --input heats.csv --output predictions.csv
+    python -m steelworks score --model models/lgbm.trees --input archive.arrow --output scores.arrow
+    python -m steelworks report --data-dir ./final_steel --leaderboard models/leaderboard.json
+
+(``steelworks <command>`` once the package is installed.)
+
+* ``ingest`` parses the seven CSVs into the Feather cache of
+  :mod:`steelworks.io`, or into key partitions with ``--partitions``;
+* ``features`` applies the quality rules and writes the training table;
+* ``train`` fits one model on a training table and saves it with
+  :func:`steelworks.models.save_model`; tree models are also exported next to
+  it as a ``.trees`` file (:mod:`steelworks.trees`), and its state for
+  ``update`` as a ``.json`` file;
+* ``update`` refreshes a trained model with the heats of a newer training
+  table that it has not seen (:mod:`steelworks.refresh`);
+* ``predict`` predicts the final temperature for a CSV, Feather or ``.npy``
+  file of feature rows;
+* ``score`` predicts a whole Arrow / Feather table in chunks on a thread pool
+  and resumes an interrupted run (:mod:`steelworks.backfill`);
+* ``report`` prints the rejected heats per quality rule, a leaderboard and
+  benchmark results.
+
+Every command imports what it needs inside its own function, so ``--help``
+loads nothing but the standard library.  ``predict`` reads CSV and ``.npy``
+input without pandas and only imports the library of the model it loads:
+with a ``.trees`` model it needs NumPy alone and starts in well under a
+second, and catboost is imported only for ``.cbm`` files.
+
+``--trace trace.json`` (before the command) records the stages of the run
+with :mod:`steelworks.trace`.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+
+# name: (module, estimator class, default parameters); the defaults are the
+# fixed parameters of the notebook's searches.
+MODELS = {
+    'linear': ('sklearn.linear_model', 'LinearRegression', {}),
+    'tree': ('sklearn.tree', 'DecisionTreeRegressor',
+             {'criterion': 'absolute_error', 'random_state': 12345}),
+    'forest': ('sklearn.ensemble', 'RandomForestRegressor', {'random_state': 22}),
+    'lgbm': ('lightgbm', 'LGBMRegressor', {'random_state': 22, 'verbose': -1}),
+    'catboost': ('catboost', 'CatBoostRegressor',
+                 {'loss_function': 'MAE', 'random_state': 22, 'verbose': 0,
+                  'allow_writing_files': False}),
+}
+
+FEATHER_SUFFIXES = ('.feather', '.arrow')
+
+
+def _param(text):
+    name, sep, value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f'expected NAME=VALUE, got {text!r}')
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def _read_table(path):
+    import pandas as pd
+
+    if path.endswith(FEATHER_SUFFIXES):
+        return pd.read_feather(path)
+    return pd.read_csv(path)
+
+
+def _write_table(df, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if path.endswith(FEATHER_SUFFIXES):
+        df.to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+
+
+def ingest(args):
+    if args.partitions:
+        from .partition import write_partitions
+
+        start = time.perf_counter()
+        partitions = write_partitions(args.data_dir, keys_per_partition=args.keys_per_partition,
+                                      n_jobs=args.n_jobs)
+        print(f'{len(partitions)} partitions in {time.perf_counter() - start:.1f} s')
+        return 0
+
+    from .io import TABLES, load_table
+
+    for name in TABLES:
+        start = time.perf_counter()
+        table = load_table(name, args.data_dir)
+        print(f'{name:15s} {len(table):10d} rows {time.perf_counter() - start:8.2f} s')
+    return 0
+
+
+def features(args):
+    if args.partitions:
+        from .partition import write_training_table
+
+        rows = write_training_table(args.output, args.data_dir, n_jobs=args.n_jobs)
+        print(f'{rows} heats written to {args.output}')
+        return 0
+
+    from .features import build_training_table
+    from .io import load_tables
+    from .quality import accepted_keys, check_quality, rejection_reasons
+    from .summary import HeatSummary
+
+    tables = load_tables(args.data_dir)
+    heats = HeatSummary.from_measurements(tables['data_temp'])
+    violations = check_quality(tables, heats)
+    final_df = build_training_table(tables, heats, accepted_keys(violations))
+    _write_table(final_df, args.output)
+    print(rejection_reasons(violations).groupby(['rule', 'reject']).size().to_string())
+    print(f'{len(final_df)} heats written to {args.output}')
+    return 0
+
+
+def train(args):
+    import importlib
+
+    from sklearn.base import clone
+
+    from .columns import FEATURE_COLUMNS, KEY, TARGET
+    from .models import CATBOOST_SUFFIX, predictor
+    from .refresh import meta_path, training_meta, write_meta
+
+    module, name, defaults = MODELS[args.model]
+    estimator = getattr(importlib.import_module(module), name)(**{**defaults, **dict(args.param)})
+    final_df = _read_table(args.input)
+    X, y = final_df[FEATURE_COLUMNS], final_df[TARGET]
+    if args.test_size > 0:
+        from sklearn.model_selection import train_test_split
+
+        X, X_test, y, y_test = train_test_split(X, y, test_size=args.test_size,
+                                                random_state=12345)
+
+    start = time.perf_counter()
+    model = estimator.fit(X, y)
+    print(f'fitted {name} on {len(X)} heats in {time.perf_counter() - start:.1f} s')
+    test_mae = None
+    if args.test_size > 0:
+        predictions = predictor(model)(X_test.to_numpy(dtype='float64'))
+        test_mae = float(abs(y_test.to_numpy() - predictions).mean())
+        print(f'test MAE {test_mae:.3f} on {len(X_test)} heats')
+        # The held-out heats are a random sample, scattered over all keys:
+        # the saved model is fitted on every heat, so that "update" can start
+        # after the newest one.
+        start = time.perf_counter()
+        model = clone(estimator).fit(final_df[FEATURE_COLUMNS], final_df[TARGET])
+        print(f'refitted {name} on all {len(final_df)} heats '
+              f'in {time.perf_counter() - start:.1f} s')
+
+    output = args.output
+    if output is None:
+        suffix = CATBOOST_SUFFIX if args.model == 'catboost' else '.pkl'
+        output = os.path.join('models', args.model + suffix)
+    _save(model, args.model, output)
+    write_meta(training_meta(args.model, estimator, final_df[KEY].max(), len(final_df), test_mae),
+               output)
+    print(f'state saved to {meta_path(output)}')
+    return 0
+
+
+def _save(model, kind, output):
+    from .models import TREES_SUFFIX, save_model
+
+    save_model(model, output)
+    print(f'saved to {output}')
+    if kind != 'linear' and not output.endswith(TREES_SUFFIX):
+        # Tree models also get the NumPy export that "predict" loads without
+        # importing their library.
+        trees_path = os.path.splitext(output)[0] + TREES_SUFFIX
+        save_model(model, trees_path)
+        print(f'exported to {trees_path}')
+
+
+def update(args):
+    import importlib
+
+    from .models import load_model
+    from .refresh import read_meta, update_model, write_meta
+
+    meta = read_meta(args.model)
+    module, name, _ = MODELS[meta['model']]
+    estimator = getattr(importlib.import_module(module), name)(**meta['params'])
+    model, meta = update_model(load_model(args.model), estimator, meta, _read_table(args.input),
+                               holdout=args.holdout, max_drift=args.max_drift,
+                               n_trees=args.new_trees)
+    record = meta['history'][-1]
+    print(', '.join(f'{field} {value:.3f}' if isinstance(value, float) else f'{field} {value}'
+                    for field, value in record.items()))
+    if record['mode'] in ('incremental', 'retrain'):
+        _save(model, meta['model'], args.model)
+    write_meta(meta, args.model)
+    return 0
+
+
+def _read_csv_rows(path, columns):
+    import csv
+
+    import numpy as np
+
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        missing = [c for c in columns if c not in header]
+        if missing:
+            raise ValueError(f'{path} has no columns {missing}')
+        positions = [header.index(c) for c in columns]
+        key = header.index('key') if 'key' in header else None
+        keys, rows = [], []
+        for record in reader:
+            rows.append([float(record[i]) if record[i] else float('nan') for i in positions])
+            if key is not None:
+                keys.append(record[key])
+    rows = np.array(rows, dtype=np.float64).reshape(-1, len(columns))
+    return (keys if key is not None else None), rows
+
+
+def _read_feature_rows(path, columns):
+    """(keys or None, 2-D float array in ``columns`` order) of an input file."""
+    import numpy as np
+
+    if path.endswith('.npy'):
+        return None, np.load(path).astype(np.float64, copy=False)
+    if path.endswith(FEATHER_SUFFIXES):
+        import pyarrow.feather as feather
+
+        table = feather.read_table(path)
+        rows = np.column_stack([table.column(c).to_numpy(zero_copy_only=False).astype(np.float64)
+                                for c in columns])
+        keys = table.column('key').to_pylist() if 'key' in table.column_names else None
+        return keys, rows
+    return _read_csv_rows(path, columns)
+
+
+def predict(args):
+    import csv
+
+    from .columns import FEATURE_COLUMNS
+    from .models import load_model, predictor
+
+    model = load_model(args.model)
+    keys, rows = _read_feature_rows(args.input, FEATURE_COLUMNS)
+    predictions = predictor(model)(rows)
+
+    f = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        writer = csv.writer(f)
+        if keys is None:
+            writer.writerow(['prediction'])
+            writer.writerows([float(p)] for p in predictions)
+        else:
+            writer.writerow(['key', 'prediction'])
+            writer.writerows(zip(keys, map(float, predictions)))
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return 0
+
+
+def score(args):
+    from .backfill import score_table
+
+    summary = score_table(args.model, args.input, args.output, chunk_rows=args.chunk_rows,
+                          threads=args.threads)
+    resumed = f', {summary["resumed_chunks"]} resumed' if summary['resumed_chunks'] else ''
+    print(f'{summary["heats"]} heats in {summary["chunks"]} chunks{resumed}, '
+          f'{summary["seconds"]:.1f} s, {summary["heats_per_s"]:.0f} heats/s')
+    print(f'written to {args.output}')
+    return 0
+
+
+def report(args):
+    import pandas as pd
+
+    if not (args.data_dir or args.leaderboard or args.benchmark):
+        print('nothing to report: pass --data-dir, --leaderboard or --benchmark', file=sys.stderr)
+        return 2
+    with pd.option_context('display.width', 120, 'display.max_rows', None):
+        if args.data_dir:
+            from .io import load_tables
+            from .quality import accepted_keys, check_quality, rejection_reasons
+            from .summary import HeatSummary
+
+            tables = load_tables(args.data_dir)
+            heats = HeatSummary.from_measurements(tables['data_temp'])
+            violations = check_quality(tables, heats)
+            reasons = rejection_reasons(violations)
+            print(f'{len(heats.keys)} heats, {len(accepted_keys(violations))} accepted')
+            print(reasons.groupby(['rule', 'reject']).size().to_string())
+            print()
+        if args.leaderboard:
+            table = (pd.read_json(args.leaderboard) if args.leaderboard.endswith('.json')
+                     else pd.read_csv(args.leaderboard))
+            print(table.to_string(index=False, float_format='{:.3f}'.format))
+            print()
+        if args.benchmark:
+            from .benchmark import read_results
+
+            print(read_results(args.benchmark).to_string(index=False, float_format='{:.3f}'.format))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='steelworks', description=__doc__.splitlines()[0])
+    parser.add_argument('--trace', metavar='PATH',
+                        help='write a stage trace (JSON and Chrome trace) of the command')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('ingest', help='parse the CSVs into the columnar cache')
+    command.add_argument('--data-dir', default='./final_steel')
+    command.add_argument('--partitions', action='store_true',
+                         help='split into key partitions for out-of-core processing')
+    command.add_argument('--keys-per-partition', type=int, default=25_000)
+    command.add_argument('--n-jobs', type=int, default=1)
+    command.set_defaults(handler=ingest)
+
+    command = commands.add_parser('features', help='clean the heats and write the training table')
+    command.add_argument('--data-dir', default='./final_steel')
+    command.add_argument('--output', required=True, help='.feather/.arrow or .csv file')
+    command.add_argument('--partitions', action='store_true',
+                         help='build it partition by partition (Arrow IPC output)')
+    command.add_argument('--n-jobs', type=int, default=1)
+    command.set_defaults(handler=features)
+
+    command = commands.add_parser('train', help='fit one model on a training table')
+    command.add_argument('--model', required=True, choices=sorted(MODELS))
+    command.add_argument('--input', required=True, help='training table written by "features"')
+    command.add_argument('--output', help='model file (default models/<model>.pkl or .cbm)')
+    command.add_argument('--param', type=_param, action='append', default=[],
+                         metavar='NAME=VALUE', help='estimator parameter, value parsed as JSON')
+    command.add_argument('--test-size', type=float, default=0.2,
+                         help='held-out share for the test MAE; the saved model is then '
+                              'refitted on every heat (0 fits once, on everything)')
+    command.set_defaults(handler=train)
+
+    command = commands.add_parser('update', help='refresh a trained model with the new heats')
+    command.add_argument('--model', required=True,
+                         help='model saved by "train" (its .json state next to it)')
+    command.add_argument('--input', required=True, help='training table with the new heats')
+    command.add_argument('--holdout', type=int, default=500,
+                         help='newest heats held out to check the refreshed model')
+    command.add_argument('--max-drift', type=float, default=0.1,
+                         help='relative holdout MAE increase that triggers a full retrain')
+    command.add_argument('--new-trees', type=int,
+                         help='trees to add (default: in proportion to the new heats)')
+    command.set_defaults(handler=update)
+
+    command = commands.add_parser('predict', help='predict the final temperature')
+    command.add_argument('--model', required=True, help='.cbm, .trees or pickled model')
+    command.add_argument('--input', required=True,
+                         help='CSV, Feather or .npy file with the feature columns')
+    command.add_argument('--output', help='CSV file to write (default: standard output)')
+    command.set_defaults(handler=predict)
+
+    command = commands.add_parser('score', help='predict a whole table in resumable chunks')
+    command.add_argument('--model', required=True, help='.cbm, .trees or pickled model')
+    command.add_argument('--input', required=True,
+                         help='Arrow IPC / Feather file with the feature columns')
+    command.add_argument('--output', required=True, help='Arrow IPC file of key and prediction')
+    command.add_argument('--chunk-rows', type=int, default=50_000)
+    command.add_argument('--threads', type=int, default=-1, help='-1 uses every core')
+    command.set_defaults(handler=score)
+
+    command = commands.add_parser('report', help='print data-quality, leaderboard and benchmark results')
+    command.add_argument('--data-dir', help='report the quality rules on these tables')
+    command.add_argument('--leaderboard', help='leaderboard written by write_leaderboard')
+    command.add_argument('--benchmark', help='results written by steelworks.benchmark')
+    command.set_defaults(handler=report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace is None:
+        return args.handler(args)
+    from .trace import tracing
+
+    with tracing(args.trace):
+        return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
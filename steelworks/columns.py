@@ -0,0 +1,19 @@
+"""Column names of the tables and of the training table.
+
+Kept apart from :mod:`steelworks.schema` and :mod:`steelworks.features` and
+free of pandas, so that the prediction path (:mod:`steelworks.serve`, ``python
+-m steelworks predict``) can know the feature order without importing them.
+"""
+
+KEY = 'key'
+TARGET = 'Температура_y'
+
+BULK_COLUMNS = [f'Bulk {i}' for i in range(1, 16)]
+WIRE_COLUMNS = [f'Wire {i}' for i in range(1, 10)]
+
+# Wire 5 is dropped from the training table (see the notebook).
+DROPPED_COLUMNS = ['Wire 5']
+WIRE_FEATURES = [c for c in WIRE_COLUMNS if c not in DROPPED_COLUMNS]
+
+# Column order of ``x = final_df.drop(['key', 'Температура_y'], axis=1)``.
+FEATURE_COLUMNS = ['electricity', *WIRE_FEATURES, *BULK_COLUMNS, 'Температура_x', 'Газ 1']
@@ -0,0 +1,129 @@
+"""Per-heat training table (``final_df`` in the notebook).
+
+One row per heat: summed arc energy (``electricity``), the added volume of
+every bulk and wire material, the first (``Температура_x``) and the last
+(``Температура_y``, the target) temperature and the gas volume.
+
+A heat gets one to four of the 24 materials, so with ``sparse=True`` the
+material columns are pandas sparse columns built straight from the masks of
+the nullable source columns, without a dense ``fillna(0.0)`` copy.
+:func:`feature_matrix` turns the table into a SciPy CSR matrix, which
+LightGBM and ``LinearRegression`` fit on without densifying it.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse as sp
+
+from .columns import BULK_COLUMNS, DROPPED_COLUMNS, FEATURE_COLUMNS, TARGET, WIRE_FEATURES
+from .trace import stage
+
+
+def arc_electricity(arc):
+    """Energy of every arc session: sqrt(P² + Q²) times its duration in seconds."""
+    seconds = (arc['Конец нагрева дугой'] - arc['Начало нагрева дугой']).dt.total_seconds()
+    power = np.sqrt(arc['Активная мощность'] ** 2 + arc['Реактивная мощность'] ** 2)
+    return power * seconds
+
+
+def material_matrix(table, columns):
+    """CSR matrix of the material volumes of ``table`` (one row per table
+    row); missing and zero volumes are not stored."""
+    rows, values = [], []
+    for column in columns:
+        volume = table[column].to_numpy(dtype=np.float32, na_value=0.0)
+        present = np.flatnonzero(volume)
+        rows.append(present)
+        values.append(volume[present])
+    return _from_columns(rows, values, len(table)).tocsr()
+
+
+def _from_columns(rows, values, n_rows):
+    """CSC matrix from the row numbers and values of every column."""
+    indptr = np.r_[0, np.cumsum([len(r) for r in rows])]
+    indices = np.concatenate([r.astype(np.int32, copy=False) for r in rows])
+    return sp.csc_matrix((np.concatenate(values), indices, indptr), shape=(n_rows, len(rows)))
+
+
+def _sparse_materials(table, columns, keys):
+    """Sparse material columns of ``keys``, which all occur in ``table``."""
+    position = pd.Index(table['key']).get_indexer(keys)
+    matrix = material_matrix(table, columns)[position].tocsc()
+    return pd.DataFrame({column: pd.arrays.SparseArray.from_spmatrix(matrix[:, [j]])
+                         for j, column in enumerate(columns)})
+
+
+def build_training_table(tables, heats, keys=None, sparse=False):
+    """Assemble ``final_df`` from the raw tables and a :class:`HeatSummary`.
+
+    ``keys`` restricts the heats (typically ``quality.accepted_keys``); heats
+    missing any of the sources are dropped, as the ``dropna`` calls in the
+    notebook do.  ``sparse=True`` keeps the Bulk/Wire columns sparse, with
+    the same values.
+    """
+    with stage('build_training_table', rows_in=len(heats.frame), sparse=sparse) as span:
+        final_df = _build_training_table(tables, heats, keys, sparse)
+        span.rows_out = len(final_df)
+    return final_df
+
+
+def _build_training_table(tables, heats, keys, sparse):
+    if keys is not None:
+        heats = heats.subset(keys)
+    arc = tables['data_arc']
+    arc = arc[arc['key'].isin(heats.keys)]
+    electricity = (arc_electricity(arc).groupby(arc['key']).sum()
+                   .rename('electricity').reset_index())
+
+    if sparse:
+        return _sparse_training_table(tables, heats, electricity)
+
+    final_df = (electricity
+                .merge(tables['data_wire'].fillna(0.0), on='key', how='left')
+                .merge(tables['data_bulk'].fillna(0.0), on='key', how='left')
+                .merge(heats.temperature_columns(), on='key', how='left')
+                .dropna()
+                .merge(tables['data_gas'], on='key', how='left')
+                .dropna()
+                .drop(DROPPED_COLUMNS, axis=1))
+    return final_df.reset_index(drop=True)
+
+
+def _sparse_training_table(tables, heats, electricity):
+    # An inner join on the keys of the material tables drops the same heats
+    # as the dropna after the left merges of the dense version.
+    final_df = (electricity
+                .merge(tables['data_wire'][['key']], on='key')
+                .merge(tables['data_bulk'][['key']], on='key')
+                .merge(heats.temperature_columns(), on='key', how='left')
+                .dropna()
+                .merge(tables['data_gas'], on='key', how='left')
+                .dropna()
+                .reset_index(drop=True))
+    wire = _sparse_materials(tables['data_wire'], WIRE_FEATURES, final_df['key'])
+    bulk = _sparse_materials(tables['data_bulk'], BULK_COLUMNS, final_df['key'])
+    columns = ['key', 'electricity', *WIRE_FEATURES, *BULK_COLUMNS,
+               'Температура_x', TARGET, 'Газ 1']
+    return pd.concat([final_df, wire, bulk], axis=1)[columns]
+
+
+def feature_matrix(final_df, columns=FEATURE_COLUMNS, dtype=np.float64):
+    """CSR matrix of the ``columns`` of ``final_df``; sparse columns are
+    copied without densifying them.
+
+    ``LinearRegression`` solves sparse problems with LSQR, whose default
+    ``tol=1e-6`` moves predictions by tenths of a degree here; fit it with
+    ``tol=1e-10`` to get the dense solution.
+    """
+    rows, values = [], []
+    for column in columns:
+        array = final_df[column].array
+        if isinstance(array, pd.arrays.SparseArray):
+            present, data = array.sp_index.indices, array.sp_values
+        else:
+            data = array.to_numpy(dtype=dtype)
+            present = np.flatnonzero(data)
+            data = data[present]
+        rows.append(present)
+        values.append(data.astype(dtype, copy=False))
+    return _from_columns(rows, values, len(final_df)).tocsr()
@@ -0,0 +1,131 @@
+"""Interval-level training table for nowcasting during a heat.
+
+The heat-level ``final_df`` only lets a model predict the last temperature
+from whole-heat totals.  :func:`build_interval_table` instead has one row per
+temperature measurement (except the first of each heat): what happened
+between the previous measurement and this one, the previous temperature
+(``Температура_x``) and the measured one (``Температура_y``, the target).
+
+* ``electricity`` / ``arc_seconds`` - arc energy and arc time inside the
+  interval.  An arc session that spans a measurement is split at the
+  measurement time in proportion to its duration.  The cumulative energy
+  of a heat at each measurement is found with one ``merge_asof`` of the
+  measurements against the arc sessions sorted by start time;
+* one column per Bulk/Wire material - the volume added inside the interval.
+  Every material is added to a heat at most once, so this is a vectorized
+  comparison of its time with the interval bounds;
+* ``interval_seconds`` / ``elapsed_seconds`` - length of the interval and
+  time since the first measurement of the heat.
+
+``data_gas`` only has one total per heat and no timestamps, so gas cannot be
+assigned to intervals and is left out; using the heat total would leak the
+future into mid-heat predictions.  Rows whose temperatures are NaN are kept,
+drop them as needed.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .features import WIRE_FEATURES, arc_electricity
+from .schema import BULK_COLUMNS
+from .summary import KEY, TEMPERATURE, TIME
+
+
+ARC_START = 'Начало нагрева дугой'
+ARC_END = 'Конец нагрева дугой'
+
+INTERVAL_COLUMNS = ['key', TIME, 'interval_seconds', 'elapsed_seconds', 'electricity',
+                    'arc_seconds', *WIRE_FEATURES, *BULK_COLUMNS,
+                    'Температура_x', 'Температура_y']
+
+
+def _seconds(delta):
+    return np.asarray(delta, dtype='timedelta64[ns]').astype(np.int64) / 1e9
+
+
+def cumulative_arc(measurements, arc):
+    """Arc energy and arc seconds of every heat up to each measurement time.
+
+    ``measurements`` has ``key`` and ``Время замера`` columns and must be
+    sorted by time; the result is aligned with it.
+    """
+    sessions = pd.DataFrame({
+        KEY: arc[KEY].to_numpy(),
+        ARC_START: arc[ARC_START].to_numpy(dtype='datetime64[ns]'),
+        'duration': _seconds(arc[ARC_END] - arc[ARC_START]),
+        'energy': arc_electricity(arc).to_numpy(),
+    }).sort_values([KEY, ARC_START], kind='stable')
+    grouped = sessions.groupby(KEY, sort=False)
+    sessions['energy_before'] = grouped['energy'].cumsum() - sessions['energy']
+    sessions['seconds_before'] = grouped['duration'].cumsum() - sessions['duration']
+    sessions = sessions.sort_values(ARC_START, kind='stable')
+
+    # Last session started at or before each measurement (of the same heat).
+    last = pd.merge_asof(measurements[[KEY, TIME]], sessions, left_on=TIME,
+                         right_on=ARC_START, by=KEY, direction='backward')
+    started = last[ARC_START].notna().to_numpy()
+    duration = last['duration'].to_numpy()
+    running = np.clip(_seconds(last[TIME] - last[ARC_START]), 0, duration)
+    power = np.divide(last['energy'].to_numpy(), duration,
+                      out=np.zeros(len(last)), where=duration > 0)
+    energy = np.where(started, last['energy_before'].to_numpy() + power * running, 0.0)
+    seconds = np.where(started, last['seconds_before'].to_numpy() + running, 0.0)
+    return energy, seconds
+
+
+def _added_in_interval(table, times_table, columns, keys, start, end, sparse):
+    """Volume of every material whose addition time falls in (start, end]."""
+    position = pd.Index(table[KEY]).get_indexer(keys)
+    time_position = pd.Index(times_table[KEY]).get_indexer(keys)
+    found = (position >= 0) & (time_position >= 0)
+    added = {}
+    for column in columns:
+        volume = table[column].to_numpy(dtype=np.float32, na_value=0.0)[position]
+        times = times_table[column].to_numpy(dtype='datetime64[ns]')[time_position]
+        inside = found & (times > start) & (times <= end)
+        values = np.where(inside, volume, np.float32(0.0))
+        added[column] = pd.arrays.SparseArray(values, fill_value=0.0) if sparse else values
+    return added
+
+
+def build_interval_table(tables, sparse=False):
+    """One row per measurement after the first of each heat; see the module
+    docstring.  ``sparse=True`` keeps the material columns sparse."""
+    temp = tables['data_temp']
+    order = np.lexsort((temp[TIME].to_numpy(), temp[KEY].to_numpy()))
+    measurements = pd.DataFrame({
+        KEY: temp[KEY].to_numpy()[order],
+        TIME: temp[TIME].to_numpy(dtype='datetime64[ns]')[order],
+        TEMPERATURE: temp[TEMPERATURE].to_numpy()[order],
+    })
+    keys = measurements[KEY].to_numpy()
+    times = measurements[TIME].to_numpy()
+    first = np.r_[True, keys[1:] != keys[:-1]]
+    heat_start = times[np.maximum.accumulate(np.where(first, np.arange(len(keys)), 0))]
+
+    by_time = np.argsort(times, kind='stable')
+    energy, arc_seconds = np.empty(len(keys)), np.empty(len(keys))
+    energy[by_time], arc_seconds[by_time] = cumulative_arc(measurements.iloc[by_time],
+                                                           tables['data_arc'])
+
+    # Every row but the first of a heat closes the interval since the row before.
+    current = np.flatnonzero(~first)
+    previous = current - 1
+    start, end = times[previous], times[current]
+    interval_keys = keys[current]
+    interval = {
+        'key': interval_keys,
+        TIME: end,
+        'interval_seconds': _seconds(end - start),
+        'elapsed_seconds': _seconds(end - heat_start[current]),
+        'electricity': energy[current] - energy[previous],
+        'arc_seconds': arc_seconds[current] - arc_seconds[previous],
+    }
+    interval.update(_added_in_interval(tables['data_wire'], tables['data_wire_time'],
+                                       WIRE_FEATURES, interval_keys, start, end, sparse))
+    interval.update(_added_in_interval(tables['data_bulk'], tables['data_bulk_time'],
+                                       BULK_COLUMNS, interval_keys, start, end, sparse))
+    temperature = measurements[TEMPERATURE].to_numpy()
+    interval['Температура_x'] = temperature[previous]
+    interval['Температура_y'] = temperature[current]
+    return pd.DataFrame(interval, columns=INTERVAL_COLUMNS)
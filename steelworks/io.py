@@ -0,0 +1,124 @@
+"""Loading of the ``final_steel`` CSV sources with an on-disk columnar cache.
+
+The first time a table is read its CSV is parsed and written next to it as an
+uncompressed Feather (Arrow IPC) file, with the column types from
+:mod:`steelworks.schema` already applied.  Later reads memory-map that file
+instead of re-parsing text.  Every cache file has a small JSON sidecar with the
+size and mtime of the CSV it was built from, so a table is rebuilt only when
+its own source changes.
+
+pyarrow is optional: without it the tables are simply read from CSV.
+"""
+
+import json
+import os
+
+from .schema import read_typed_csv
+from .trace import stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+    feather = None
+
+
+DATA_DIR = './final_steel'
+CACHE_DIRNAME = '.cache'
+
+TABLES = ('data_arc', 'data_bulk', 'data_bulk_time', 'data_gas',
+          'data_temp', 'data_wire', 'data_wire_time')
+
+# Bump whenever the way a CSV is turned into a DataFrame changes, so that
+# caches written by an older version are rebuilt.
+CACHE_VERSION = 2
+
+
+def _source_path(name, data_dir):
+    return os.path.join(data_dir, name + '.csv')
+
+
+def _cache_paths(name, cache_dir):
+    base = os.path.join(cache_dir, name)
+    return base + '.feather', base + '.json'
+
+
+def _fingerprint(path):
+    st = os.stat(path)
+    return {'version': CACHE_VERSION, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _read_source(name, data_dir):
+    with stage('parse_csv', 'io', table=name) as span:
+        df = read_typed_csv(_source_path(name, data_dir), name)
+        span.rows_out = len(df)
+    return df
+
+
+def _cache_is_fresh(data_path, meta_path, fingerprint):
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return False
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f) == fingerprint
+    except (OSError, ValueError):
+        return False
+
+
+def _write_cache(df, data_path, meta_path, fingerprint):
+    # Write to temporary names first so that an interrupted run never leaves
+    # a half-written table behind a valid sidecar.
+    tmp_data, tmp_meta = data_path + '.tmp', meta_path + '.tmp'
+    with stage('write_cache', 'io', rows_in=len(df), path=data_path):
+        feather.write_feather(df, tmp_data, compression='uncompressed')
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump(fingerprint, f)
+    os.replace(tmp_data, data_path)
+    os.replace(tmp_meta, meta_path)
+
+
+def _read_cache(data_path, memory_map):
+    with stage('read_cache', 'io', path=data_path) as span:
+        if memory_map:
+            with pa.memory_map(data_path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+        else:
+            table = feather.read_table(data_path, memory_map=False)
+        df = table.to_pandas()
+        span.rows_out = len(df)
+    return df
+
+
+def load_table(name, data_dir=DATA_DIR, cache_dir=None, use_cache=True, memory_map=True):
+    """Return table ``name`` (e.g. ``'data_arc'``) as a DataFrame.
+
+    ``cache_dir`` defaults to ``<data_dir>/.cache``.  With ``use_cache=False``
+    or without pyarrow the CSV is parsed every time.
+    """
+    if name not in TABLES:
+        raise ValueError(f'unknown table {name!r}, expected one of {TABLES}')
+    source = _source_path(name, data_dir)
+    if not use_cache or feather is None:
+        return _read_source(name, data_dir)
+
+    if cache_dir is None:
+        cache_dir = os.path.join(data_dir, CACHE_DIRNAME)
+    data_path, meta_path = _cache_paths(name, cache_dir)
+    fingerprint = _fingerprint(source)
+    if _cache_is_fresh(data_path, meta_path, fingerprint):
+        return _read_cache(data_path, memory_map)
+
+    df = _read_source(name, data_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_cache(df, data_path, meta_path, fingerprint)
+    return df
+
+
+def load_tables(data_dir=DATA_DIR, cache_dir=None, use_cache=True, memory_map=True):
+    """Load all seven tables, keyed by name (``'data_arc'`` ... ``'data_wire_time'``)."""
+    with stage('load_tables', 'io', data_dir=data_dir) as span:
+        tables = {name: load_table(name, data_dir, cache_dir, use_cache, memory_map)
+                  for name in TABLES}
+        span.rows_out = sum(len(table) for table in tables.values())
+    return tables
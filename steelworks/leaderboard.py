@@ -0,0 +1,114 @@
+"""Measured comparison of the final-temperature models.
+
+:func:`leaderboard` evaluates every model under the same CV splits and the
+same train/test split and records, besides accuracy, what the model costs:
+
+* ``cv_mae`` / ``test_mae`` - mean CV fold MAE and MAE on the test set;
+* ``fit_seconds`` - wall time of one fit on the whole training set;
+* ``predict_1_ms`` / ``predict_10k_ms`` - median latency of predicting one
+  row and 10 000 rows, through the same call the prediction service uses;
+* ``model_bytes`` - size of the model as written by :func:`save_model`;
+* ``peak_rss_mb`` - peak resident memory growth while fitting and
+  predicting, measured like the stages of :mod:`steelworks.trace`.
+
+Each model is measured in its own fresh process so that peak memory of one
+model does not hide behind another.  The result is a plain DataFrame; write it
+with :func:`write_leaderboard` as CSV or JSON.
+"""
+
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from .models import CATBOOST_SUFFIX, predictor, save_model
+from .search import fit_and_score
+from .trace import PeakRss
+
+
+COLUMNS = ['model', 'cv_mae', 'test_mae', 'fit_seconds', 'predict_1_ms',
+           'predict_10k_ms', 'model_bytes', 'peak_rss_mb']
+
+LATENCY_REPEATS = 50
+
+
+def _latency_ms(predict, rows, repeats):
+    predict(rows)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(rows)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def _model_bytes(model):
+    suffix = CATBOOST_SUFFIX if type(model).__name__ == 'CatBoostRegressor' else '.pkl'
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'model' + suffix)
+        save_model(model, path)
+        return os.path.getsize(path)
+
+
+def measure_model(name, estimator, X_train, y_train, X_test, y_test, folds):
+    """One leaderboard row for ``estimator`` (measured in this process)."""
+    with PeakRss() as rss:
+        X_values = np.asarray(X_train, dtype=np.float64)
+        y_values = np.asarray(y_train, dtype=np.float64)
+        cv_mae = np.mean([fit_and_score(estimator, {}, X_values, y_values, train, test)[0]
+                          for train, test in folds])
+
+        start = time.perf_counter()
+        model = clone(estimator).fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+
+        predict = predictor(model)
+        test_rows = np.asarray(X_test, dtype=np.float64)
+        test_mae = float(np.mean(np.abs(np.asarray(y_test) - predict(test_rows))))
+        batch = np.resize(test_rows, (10_000, test_rows.shape[1]))
+        row = {
+            'model': name,
+            'cv_mae': float(cv_mae),
+            'test_mae': test_mae,
+            'fit_seconds': fit_seconds,
+            'predict_1_ms': _latency_ms(predict, test_rows[:1], LATENCY_REPEATS),
+            'predict_10k_ms': _latency_ms(predict, batch, max(LATENCY_REPEATS // 10, 3)),
+            'model_bytes': _model_bytes(model),
+        }
+    row['peak_rss_mb'] = rss.rss_mb
+    return row
+
+
+def leaderboard(models, X_train, y_train, X_test, y_test, cv, isolate=True):
+    """Measure ``models``, a mapping of name to estimator; every estimator is
+    cloned, so fitted search results (``best_estimator_``) can be passed as is.
+
+    With ``isolate=False`` everything runs in the current process, which is
+    faster to start but makes ``peak_rss_mb`` a lower bound only.
+    """
+    folds = list(cv.split(np.asarray(X_train)))
+    rows = []
+    for name, estimator in models.items():
+        args = (name, estimator, X_train, y_train, X_test, y_test, folds)
+        if isolate:
+            with multiprocessing.get_context('spawn').Pool(1) as pool:
+                rows.append(pool.apply(measure_model, args))
+        else:
+            rows.append(measure_model(*args))
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def write_leaderboard(table, path):
+    """Write the leaderboard as JSON (``.json``) or CSV (anything else)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if path.endswith('.json'):
+        table.to_json(path, orient='records', indent=2, force_ascii=False)
+    else:
+        table.to_csv(path, index=False)
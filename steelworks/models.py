@@ -0,0 +1,75 @@
+"""Saving and loading of trained final-temperature models.
+
+CatBoost models are stored in CatBoost's own ``.cbm`` format; every other
+model (LGBMRegressor, RandomForestRegressor, DecisionTreeRegressor,
+LinearRegression) is pickled.  Model libraries are imported only when a model
+of their kind is loaded.
+
+A tree model saved under a ``.trees`` name is exported to the NumPy format of
+:mod:`steelworks.trees` instead; loading it then needs neither the model
+library nor pickle.
+"""
+
+import os
+import pickle
+import warnings
+
+
+CATBOOST_SUFFIX = '.cbm'
+TREES_SUFFIX = '.trees'
+
+
+def save_model(model, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if path.endswith(TREES_SUFFIX):
+        from .trees import export_model
+
+        export_model(model).save(path)
+    elif type(model).__name__ == 'CatBoostRegressor':
+        if not path.endswith(CATBOOST_SUFFIX):
+            raise ValueError(f'CatBoost models are saved as {CATBOOST_SUFFIX} files')
+        model.save_model(path)
+    else:
+        with open(path, 'wb') as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_model(path):
+    if path.endswith(TREES_SUFFIX):
+        from .trees import TreeEnsemble
+
+        return TreeEnsemble.load(path)
+    if path.endswith(CATBOOST_SUFFIX):
+        from catboost import CatBoostRegressor
+
+        model = CatBoostRegressor()
+        model.load_model(path)
+        return model
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def predictor(model, threads=None):
+    """Fastest ``predict`` of ``model`` that accepts a plain 2-D float array.
+
+    ``threads`` caps the threads of one call for the models that predict on
+    several (LightGBM and CatBoost use every core by default).
+    """
+    booster = getattr(model, 'booster_', None)
+    if booster is not None:
+        # LGBMRegressor: the Booster skips the sklearn wrapper's checks.
+        if threads is None:
+            return booster.predict
+        return lambda rows: booster.predict(rows, num_threads=threads)
+    if threads is not None and type(model).__name__ == 'CatBoostRegressor':
+        return lambda rows: model.predict(rows, thread_count=threads)
+    if hasattr(model, 'feature_names_in_'):
+        # sklearn models fitted on a DataFrame warn on every unnamed array.
+        def predict(rows):
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)
+                return model.predict(rows)
+        return predict
+    return model.predict
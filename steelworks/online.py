@@ -0,0 +1,129 @@
+"""Incremental per-heat features for live data.
+
+:class:`FeatureEngine` keeps running aggregates for every open heat and
+updates them in O(1) per incoming event, so the current feature vector of a
+heat is available at any moment without rebuilding ``final_df``.  Vectors are
+laid out in :data:`steelworks.features.FEATURE_COLUMNS` order, i.e. exactly
+like ``x = final_df.drop(['key', 'Температура_y'], axis=1)``.
+
+Events can be passed either through the typed ``add_*`` methods or as rows of
+the source tables with :meth:`FeatureEngine.update`.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from .features import FEATURE_COLUMNS
+from .schema import BULK_COLUMNS, WIRE_COLUMNS
+
+
+class _HeatState:
+    __slots__ = ('values', 'first_time', 'last_time', 'last_temp')
+
+    def __init__(self, size, first_temp_index):
+        self.values = [0.0] * size
+        self.values[first_temp_index] = math.nan
+        self.first_time = None
+        self.last_time = None
+        self.last_temp = math.nan
+
+
+class FeatureEngine:
+    """Running feature vectors of heats, keyed by ``key``.
+
+    Materials start at 0 (like ``fillna(0.0)`` in the batch table), the
+    first temperature at NaN until the heat's first measurement arrives.
+    """
+
+    def __init__(self, columns=FEATURE_COLUMNS):
+        self.columns = list(columns)
+        self._position = {c: i for i, c in enumerate(self.columns)}
+        self._electricity = self._position['electricity']
+        self._first_temp = self._position['Температура_x']
+        self._gas = self._position['Газ 1']
+        self._heats = {}
+
+    def _state(self, key):
+        state = self._heats.get(key)
+        if state is None:
+            state = self._heats[key] = _HeatState(len(self.columns), self._first_temp)
+        return state
+
+    def add_arc(self, key, start, end, active_power, reactive_power):
+        seconds = (pd.Timestamp(end) - pd.Timestamp(start)).total_seconds()
+        energy = math.hypot(active_power, reactive_power) * seconds
+        self._state(key).values[self._electricity] += energy
+
+    def _add_material(self, key, material, volume, known):
+        if material not in known:
+            raise KeyError(f'unknown material {material!r}')
+        position = self._position.get(material)
+        # Materials dropped from the training table (Wire 5) are ignored.
+        if position is not None:
+            self._state(key).values[position] += volume
+
+    def add_bulk(self, key, material, volume):
+        self._add_material(key, material, volume, BULK_COLUMNS)
+
+    def add_wire(self, key, material, volume):
+        self._add_material(key, material, volume, WIRE_COLUMNS)
+
+    def add_gas(self, key, volume):
+        self._state(key).values[self._gas] += volume
+
+    def add_temperature(self, key, time, temperature):
+        """Record a measurement; measurements may arrive out of order."""
+        time = pd.Timestamp(time)
+        state = self._state(key)
+        if state.first_time is None or time < state.first_time:
+            state.first_time = time
+            state.values[self._first_temp] = temperature
+        if state.last_time is None or time > state.last_time:
+            state.last_time = time
+            state.last_temp = temperature
+
+    def update(self, table, row):
+        """Apply one row (a mapping) of source table ``table``."""
+        key = row['key']
+        if table == 'data_arc':
+            self.add_arc(key, row['Начало нагрева дугой'], row['Конец нагрева дугой'],
+                         row['Активная мощность'], row['Реактивная мощность'])
+        elif table == 'data_temp':
+            self.add_temperature(key, row['Время замера'], row['Температура'])
+        elif table == 'data_gas':
+            self.add_gas(key, row['Газ 1'])
+        elif table in ('data_bulk', 'data_wire'):
+            known = BULK_COLUMNS if table == 'data_bulk' else WIRE_COLUMNS
+            for material in known:
+                volume = row.get(material)
+                if volume is not None and not pd.isna(volume):
+                    self._add_material(key, material, volume, known)
+        elif table not in ('data_bulk_time', 'data_wire_time'):
+            raise ValueError(f'unknown table {table!r}')
+
+    def __contains__(self, key):
+        return key in self._heats
+
+    def __len__(self):
+        return len(self._heats)
+
+    def features(self, key):
+        """Current feature vector of heat ``key``."""
+        return np.array(self._heats[key].values, dtype=np.float64)
+
+    def last_temperature(self, key):
+        """Latest measured temperature of heat ``key`` (the training target)."""
+        return self._heats[key].last_temp
+
+    def frame(self, keys=None):
+        """Feature vectors of ``keys`` (default: all open heats) as a DataFrame."""
+        if keys is None:
+            keys = list(self._heats)
+        data = [self._heats[key].values for key in keys]
+        return pd.DataFrame(data, columns=self.columns, index=pd.Index(keys, name='key'))
+
+    def close(self, key):
+        """Forget heat ``key`` and return its final feature vector."""
+        return np.array(self._heats.pop(key).values, dtype=np.float64)
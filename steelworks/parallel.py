@@ -0,0 +1,49 @@
+"""Thread and process-count helpers shared by the process pools.
+
+Every pool in this package runs ``n_jobs`` worker processes, and each of them
+would otherwise start as many OpenMP/BLAS threads as there are cores.  These
+helpers cap those threads and resolve ``n_jobs`` the way scikit-learn does.
+They import nothing heavy, so that spawned workers start quickly.
+"""
+
+import contextlib
+import os
+
+
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                   'VECLIB_MAXIMUM_FRAMEWORK_THREADS', 'NUMEXPR_NUM_THREADS')
+
+# Estimator parameters that control the number of threads of one fit.
+THREAD_PARAMS = ('n_jobs', 'thread_count', 'num_threads')
+
+
+def cap_threads(estimator, threads):
+    """Set every thread-count parameter ``estimator`` has to ``threads``."""
+    params = estimator.get_params()
+    estimator.set_params(**{name: threads for name in THREAD_PARAMS if name in params})
+    return estimator
+
+
+@contextlib.contextmanager
+def limited_thread_env(threads):
+    """Temporarily set the OpenMP/BLAS thread variables, so that processes
+    started inside the block pick them up before importing numpy & co."""
+    saved = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    os.environ.update({name: str(threads) for name in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def effective_n_jobs(n_jobs):
+    cpus = os.cpu_count() or 1
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(cpus + 1 + n_jobs, 1)
+    return n_jobs
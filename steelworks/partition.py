@@ -0,0 +1,230 @@
+"""Out-of-core, key-partitioned processing of the plant history.
+
+:func:`load_tables` keeps the whole history in memory, which stops working
+once the history no longer fits in RAM.  Every cleaning rule and every
+per-heat aggregation only ever looks at the rows of one key, so the tables can
+instead be split into key ranges and processed one range at a time:
+
+* :func:`write_partitions` streams the seven CSVs in chunks of ``chunk_rows``
+  rows and appends each chunk to the Arrow IPC file of its partition, ``key //
+  keys_per_partition``.  Like the table cache of :mod:`steelworks.io` the
+  partitions are kept in ``<data_dir>/.cache`` and are rebuilt only when one
+  of the CSVs changes;
+* :func:`iter_training_table` loads one partition at a time (memory-mapped),
+  applies the quality rules and builds its part of the training table;
+* :func:`partitioned_training_table` concatenates those parts, and
+  :func:`write_training_table` streams them to a Feather file instead, so
+  that not even the result has to fit in memory.
+
+Peak memory is bounded by ``chunk_rows`` and ``keys_per_partition``, not by
+the length of the history.  The training table equals the one built by
+:func:`steelworks.features.build_training_table` from the full tables.
+
+Heats are independent, so both steps also run on a process pool with
+``n_jobs``: the split takes one table per worker, and the partitions are
+processed by workers that map their partition files themselves, so only the
+finished per-partition tables travel between processes.  Results are
+collected in partition order, which makes the output identical to the serial
+run whatever the number of workers.
+
+Partitioning needs pyarrow.
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .features import build_training_table
+from .io import (CACHE_DIRNAME, CACHE_VERSION, DATA_DIR, TABLES, _fingerprint, _read_cache,
+                 _source_path)
+from .quality import accepted_keys, check_quality, rejection_reasons
+from .schema import DATETIME, SCHEMAS, read_typed_csv
+from .parallel import effective_n_jobs, limited_thread_env
+from .summary import HeatSummary
+
+
+PARTITIONS_DIRNAME = 'partitions'
+MANIFEST = 'manifest.json'
+
+KEYS_PER_PARTITION = 25_000
+CHUNK_ROWS = 250_000
+
+
+def _partitions_dir(data_dir, out_dir):
+    if out_dir is None:
+        out_dir = os.path.join(data_dir, CACHE_DIRNAME, PARTITIONS_DIRNAME)
+    return out_dir
+
+
+def _partition_path(out_dir, partition, name):
+    return os.path.join(out_dir, f'part-{partition:06d}', name + '.arrow')
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pool(n_jobs, mp_context):
+    # Workers do single-threaded pandas work; keep BLAS/OpenMP to one thread.
+    with limited_thread_env(1):
+        return multiprocessing.get_context(mp_context).Pool(n_jobs)
+
+
+def _split_table(task):
+    """Append the chunks of one CSV to its partition files; returns the
+    partitions that received rows."""
+    name, source, out_dir, keys_per_partition, chunk_rows = task
+    writers = {}
+    try:
+        for chunk in read_typed_csv(source, name, chunksize=chunk_rows):
+            partition_of = chunk['key'].to_numpy() // keys_per_partition
+            for partition in np.unique(partition_of):
+                part = pa.Table.from_pandas(chunk[partition_of == partition],
+                                            preserve_index=False)
+                if partition not in writers:
+                    path = _partition_path(out_dir, int(partition), name)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    sink = pa.OSFile(path, 'wb')
+                    writers[partition] = (sink, pa.ipc.new_file(sink, part.schema), part.schema)
+                _, writer, schema = writers[partition]
+                writer.write_table(part.cast(schema))
+    finally:
+        for sink, writer, _ in writers.values():
+            writer.close()
+            sink.close()
+    return {int(partition) for partition in writers}
+
+
+def write_partitions(data_dir=DATA_DIR, out_dir=None, keys_per_partition=KEYS_PER_PARTITION,
+                     chunk_rows=CHUNK_ROWS, n_jobs=1, mp_context='spawn'):
+    """Split the seven tables into key-range partitions; returns the sorted
+    partition numbers.  Does nothing if the partitions are up to date."""
+    out_dir = _partitions_dir(data_dir, out_dir)
+    sources = {name: _fingerprint(_source_path(name, data_dir)) for name in TABLES}
+    settings = {'version': CACHE_VERSION, 'keys_per_partition': keys_per_partition,
+                'sources': sources}
+    manifest = _read_manifest(out_dir)
+    if manifest is not None and manifest['settings'] == settings:
+        return manifest['partitions']
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    tasks = [(name, _source_path(name, data_dir), out_dir, keys_per_partition, chunk_rows)
+             for name in TABLES]
+    n_jobs = min(effective_n_jobs(n_jobs), len(tasks))
+    if n_jobs > 1:
+        with _pool(n_jobs, mp_context) as pool:
+            split = pool.map(_split_table, tasks, chunksize=1)
+    else:
+        split = map(_split_table, tasks)
+    partitions = set().union(*split)
+    # The manifest is written last, so an interrupted split is redone.
+    manifest = {'settings': settings, 'partitions': sorted(partitions)}
+    with open(os.path.join(out_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return manifest['partitions']
+
+
+def _empty_table(name):
+    return pd.DataFrame({column: pd.Series(dtype='datetime64[ns]' if kind == DATETIME else kind)
+                         for column, kind in SCHEMAS[name].items()})
+
+
+def load_partition(partition, data_dir=DATA_DIR, out_dir=None):
+    """The seven tables restricted to one partition, keyed by name."""
+    out_dir = _partitions_dir(data_dir, out_dir)
+    tables = {}
+    for name in TABLES:
+        path = _partition_path(out_dir, partition, name)
+        if os.path.exists(path):
+            tables[name] = _read_cache(path, memory_map=True)
+        else:
+            tables[name] = _empty_table(name)
+    return tables
+
+
+def process_partition(tables):
+    """(training table, rejection reasons) of the heats in ``tables``."""
+    heats = HeatSummary.from_measurements(tables['data_temp'])
+    violations = check_quality(tables, heats)
+    final_df = build_training_table(tables, heats, accepted_keys(violations))
+    return final_df, rejection_reasons(violations)
+
+
+def _no_heats():
+    # The tables of no heats give a training table with all of its columns.
+    return process_partition({name: _empty_table(name) for name in TABLES})
+
+
+def _process_stored_partition(task):
+    partition, data_dir, out_dir = task
+    return process_partition(load_partition(partition, data_dir, out_dir))
+
+
+def iter_training_table(data_dir=DATA_DIR, out_dir=None, keys_per_partition=KEYS_PER_PARTITION,
+                        chunk_rows=CHUNK_ROWS, n_jobs=1, mp_context='spawn'):
+    """Yield (training table, rejection reasons) per partition, in key order.
+
+    With ``n_jobs`` other than 1 the partitions are processed by a process
+    pool (``-1`` uses every core); the order of the results stays the same.
+    """
+    partitions = write_partitions(data_dir, out_dir, keys_per_partition, chunk_rows,
+                                  n_jobs, mp_context)
+    tasks = [(partition, data_dir, out_dir) for partition in partitions]
+    n_jobs = min(effective_n_jobs(n_jobs), len(tasks))
+    if n_jobs <= 1:
+        yield from map(_process_stored_partition, tasks)
+        return
+    with _pool(n_jobs, mp_context) as pool:
+        # imap hands results back in task order, however the workers finish.
+        yield from pool.imap(_process_stored_partition, tasks, chunksize=1)
+
+
+def partitioned_training_table(data_dir=DATA_DIR, out_dir=None,
+                               keys_per_partition=KEYS_PER_PARTITION, chunk_rows=CHUNK_ROWS,
+                               n_jobs=1, mp_context='spawn'):
+    """(final_df, rejection reasons) built partition by partition; both
+    empty, with their usual columns, when the tables have no rows."""
+    results = list(iter_training_table(data_dir, out_dir, keys_per_partition, chunk_rows,
+                                       n_jobs, mp_context))
+    parts, reasons = zip(*(results or [_no_heats()]))
+    return (pd.concat(parts, ignore_index=True), pd.concat(reasons, ignore_index=True))
+
+
+def write_training_table(path, data_dir=DATA_DIR, out_dir=None,
+                         keys_per_partition=KEYS_PER_PARTITION, chunk_rows=CHUNK_ROWS,
+                         n_jobs=1, mp_context='spawn'):
+    """Stream the training table to the Feather file ``path``; returns the
+    number of rows written.  Without any rows the file holds an empty table
+    with the usual columns."""
+    rows = 0
+    sink = writer = None
+    try:
+        for final_df, _ in iter_training_table(data_dir, out_dir, keys_per_partition, chunk_rows,
+                                               n_jobs, mp_context):
+            part = pa.Table.from_pandas(final_df, preserve_index=False)
+            if writer is None:
+                sink = pa.OSFile(path, 'wb')
+                schema = part.schema
+                writer = pa.ipc.new_file(sink, schema)
+            writer.write_table(part.cast(schema))
+            rows += len(final_df)
+        if writer is None:
+            sink = pa.OSFile(path, 'wb')
+            empty = pa.Table.from_pandas(_no_heats()[0], preserve_index=False)
+            writer = pa.ipc.new_file(sink, empty.schema)
+            writer.write_table(empty)
+    finally:
+        if writer is not None:
+            writer.close()
+            sink.close()
+    return rows
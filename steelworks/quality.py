@@ -0,0 +1,107 @@
+"""Data-quality rules for heats (keys).
+
+All rules are evaluated together over one per-key table of facts:
+
+* a boolean key-by-table coverage matrix (does the key appear in
+  ``data_arc``, ``data_bulk_time``, ...), one row per distinct key, filled
+  by looking up every table's keys in the sorted set of all keys;
+* the per-heat temperature summary (:class:`steelworks.summary.HeatSummary`);
+* per-key minimum arc power.
+
+Each :class:`Rule` is a vectorized predicate over those facts.  Rules with
+``reject=False`` are only reported, not used to drop keys.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .io import TABLES
+from .trace import stage
+
+
+Rule = namedtuple('Rule', ['name', 'description', 'predicate', 'reject'])
+
+MAX_DURATION_SECONDS = 4500
+
+RULES = [
+    Rule('missing_final_temperature',
+         'нет значения последнего замера температуры',
+         lambda f: f['last_temp'].isna(), True),
+    Rule('no_additions',
+         'не добавлялись ни сыпучие, ни проволочные материалы',
+         lambda f: f['data_arc'] & ~f['data_bulk_time'] & ~f['data_wire_time'], True),
+    Rule('negative_power',
+         'отрицательная активная или реактивная мощность',
+         lambda f: f['min_power'] < 0, True),
+    Rule('long_duration',
+         f'между первым и последним замером больше {MAX_DURATION_SECONDS} с',
+         lambda f: f['duration'] > MAX_DURATION_SECONDS, False),
+]
+
+
+def _distinct(keys):
+    """Sorted distinct values; O(n) for the usual key-ordered table."""
+    if len(keys) and np.all(keys[1:] >= keys[:-1]):
+        return keys[np.r_[True, keys[1:] != keys[:-1]]]
+    return np.unique(keys)
+
+
+def key_coverage(tables):
+    """Boolean DataFrame indexed by every key seen in any table, with one
+    column per table telling whether the key occurs in it."""
+    names = [name for name in TABLES if name in tables]
+    keys = [_distinct(tables[name]['key'].to_numpy(dtype=np.int64)) for name in names]
+    # Rows are the sorted union of the keys, so sparse or huge key values
+    # cost nothing extra; the stable sort merges the already sorted runs.
+    index = (_distinct(np.sort(np.concatenate(keys), kind='stable')) if keys
+             else np.empty(0, dtype=np.int64))
+    matrix = np.zeros((len(index), len(names)), dtype=bool)
+    for j, k in enumerate(keys):
+        matrix[np.searchsorted(index, k), j] = True
+    return pd.DataFrame(matrix, index=pd.Index(index, name='key'), columns=names)
+
+
+def heat_facts(tables, heats):
+    """Per-key facts the rules are written against: the coverage matrix, the
+    heat summary and the minimum of active/reactive power."""
+    arc = tables['data_arc']
+    min_power = (arc[['Активная мощность', 'Реактивная мощность']].min(axis=1)
+                 .groupby(arc['key']).min().rename('min_power'))
+    facts = key_coverage(tables).join(heats.frame).join(min_power)
+    facts['duration'] = heats.duration_seconds().reindex(facts.index)
+    return facts
+
+
+def evaluate(facts, rules=RULES):
+    """Key-by-rule boolean matrix: True where the key violates the rule."""
+    return pd.DataFrame({rule.name: rule.predicate(facts).fillna(False).astype(bool)
+                         for rule in rules}, index=facts.index)
+
+
+def rejection_reasons(violations, rules=RULES):
+    """Long table with one row per (key, violated rule)."""
+    keys, columns = np.nonzero(violations.to_numpy())
+    by_name = {rule.name: rule for rule in rules}
+    names = violations.columns[columns]
+    return pd.DataFrame({
+        'key': violations.index[keys],
+        'rule': names,
+        'description': [by_name[name].description for name in names],
+        'reject': [by_name[name].reject for name in names],
+    })
+
+
+def accepted_keys(violations, rules=RULES):
+    """Keys that violate none of the rejecting rules."""
+    rejecting = [rule.name for rule in rules if rule.reject and rule.name in violations]
+    return violations.index[~violations[rejecting].any(axis=1).to_numpy()]
+
+
+def check_quality(tables, heats, rules=RULES):
+    """Evaluate ``rules`` for every key; see :func:`evaluate`."""
+    with stage('check_quality', rows_in=len(heats.frame)) as span:
+        violations = evaluate(heat_facts(tables, heats), rules)
+        span.rows_out = len(violations)
+    return violations
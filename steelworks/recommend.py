@@ -0,0 +1,138 @@
+"""Arc-energy recommendations from a trained final-temperature model.
+
+The point of the project is to spend less electricity, but a model of
+``Температура_y`` only says what a heat will end up at.  :class:`ArcRecommender`
+turns it around: for the current feature vector of a heat (for example from
+:class:`steelworks.online.FeatureEngine`) it tries a grid of additional arc
+energies, predicts the final temperature for all of them in one batch and
+returns the smallest addition that lands the prediction inside the target
+band.  Tree models are not monotonic in ``electricity``, so the grid is
+searched exhaustively instead of by bisection; for a few hundred candidates
+this is a single ``predict`` call of a few milliseconds.
+
+:meth:`ArcRecommender.savings` does the same for every heat of a historical
+training table (starting from zero energy) and compares the recommended total
+with what was actually spent.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .features import FEATURE_COLUMNS, TARGET
+from .models import predictor
+
+
+# Roughly the middle half of the final temperatures in the notebook data.
+TARGET_BAND = (1585.0, 1600.0)
+
+MAX_EXTRA_ENERGY = 4000.0
+N_CANDIDATES = 201
+
+# Upper bound on the rows of one predict call in bulk mode.
+BATCH_ROWS = 262_144
+
+Recommendation = namedtuple('Recommendation', ['extra_energy', 'arc_seconds',
+                                               'predicted_temperature', 'in_band'])
+
+
+class ArcRecommender:
+    """Smallest additional arc energy that brings the predicted final
+    temperature into ``band``.
+
+    The candidates are ``n_candidates`` evenly spaced additions between 0 and
+    ``max_extra_energy`` (in the units of the ``electricity`` feature).  When
+    no candidate reaches the band the one whose prediction is closest to it is
+    returned, with ``in_band=False``.
+    """
+
+    def __init__(self, model, band=TARGET_BAND, max_extra_energy=MAX_EXTRA_ENERGY,
+                 n_candidates=N_CANDIDATES, columns=FEATURE_COLUMNS):
+        self.model = model
+        self._predict = predictor(model)
+        self.band = band
+        self.candidates = np.linspace(0.0, max_extra_energy, n_candidates)
+        self.columns = list(columns)
+        self._electricity = self.columns.index('electricity')
+
+    def _choose(self, predictions):
+        """Index of the chosen candidate for every row of ``predictions``
+        (heats × candidates) and whether it is inside the band."""
+        low, high = self.band
+        inside = (predictions >= low) & (predictions <= high)
+        in_band = inside.any(axis=1)
+        distance = np.maximum(low - predictions, predictions - high)
+        choice = np.where(in_band, inside.argmax(axis=1), distance.argmin(axis=1))
+        return choice, in_band
+
+    def predict_grid(self, rows, energy):
+        """Final temperatures (len(rows) × candidates) when the heats of
+        ``rows`` end with ``energy`` plus each candidate addition."""
+        rows = np.asarray(rows, dtype=np.float64)
+        n, k = len(rows), len(self.candidates)
+        batch = np.repeat(rows, k, axis=0)
+        batch[:, self._electricity] = (np.asarray(energy, dtype=np.float64)[:, None]
+                                       + self.candidates).ravel()
+        return np.asarray(self._predict(batch), dtype=np.float64).reshape(n, k)
+
+    def recommend(self, features, apparent_power=None):
+        """:class:`Recommendation` for one heat.
+
+        ``features`` is its current feature vector in ``columns`` order;
+        with the arc's ``apparent_power`` (sqrt(P² + Q²)) the energy is also
+        converted to seconds of arc time.
+        """
+        row = np.asarray(features, dtype=np.float64).reshape(1, -1)
+        predictions = self.predict_grid(row, row[:, self._electricity])
+        choice, in_band = self._choose(predictions)
+        extra = float(self.candidates[choice[0]])
+        seconds = extra / apparent_power if apparent_power else float('nan')
+        return Recommendation(extra, seconds, float(predictions[0, choice[0]]), bool(in_band[0]))
+
+    def recommend_batch(self, rows):
+        """Recommendations for many heats at once, as a DataFrame with
+        ``extra_energy``, ``predicted_temperature`` and ``in_band``."""
+        rows = np.asarray(rows, dtype=np.float64)
+        return self._search(rows, rows[:, self._electricity])
+
+    def _search(self, rows, energy):
+        step = max(BATCH_ROWS // len(self.candidates), 1)
+        parts = []
+        for start in range(0, len(rows), step):
+            predictions = self.predict_grid(rows[start:start + step], energy[start:start + step])
+            choice, in_band = self._choose(predictions)
+            parts.append(pd.DataFrame({
+                'extra_energy': self.candidates[choice],
+                'predicted_temperature': predictions[np.arange(len(choice)), choice],
+                'in_band': in_band,
+            }))
+        return pd.concat(parts, ignore_index=True)
+
+    def savings(self, final_df):
+        """Recommended against actual arc energy for every heat of a
+        training table; returns (per-heat DataFrame, summary dict).
+
+        Each heat is searched from zero energy with the materials, gas and
+        first temperature it actually had.  The summary counts only heats
+        whose band is reachable.
+        """
+        rows = final_df[self.columns].to_numpy(dtype=np.float64)
+        result = self._search(rows, np.zeros(len(rows)))
+        result.insert(0, 'key', final_df['key'].to_numpy())
+        result = result.rename(columns={'extra_energy': 'recommended_energy'})
+        result.insert(2, 'actual_energy', rows[:, self._electricity])
+        result['actual_temperature'] = final_df[TARGET].to_numpy(dtype=np.float64)
+        result['saved_energy'] = result['actual_energy'] - result['recommended_energy']
+
+        reachable = result[result['in_band']]
+        actual = reachable['actual_energy'].sum()
+        summary = {
+            'heats': len(result),
+            'reachable_heats': len(reachable),
+            'actual_energy': float(actual),
+            'recommended_energy': float(reachable['recommended_energy'].sum()),
+            'saved_energy': float(reachable['saved_energy'].sum()),
+            'saved_fraction': float(reachable['saved_energy'].sum() / actual) if actual else 0.0,
+        }
+        return result, summary
@@ -0,0 +1,160 @@
+"""Nightly refresh of a trained model with the heats completed since.
+
+Retraining from scratch means rebuilding the training table and running
+every search again.  :func:`update_model` only looks at the heats whose key
+is above the last key the model was trained on (heat keys grow with time)
+and, in that order:
+
+1. holds out the most recent ``holdout`` of them - a rolling holdout that
+   moves forward with every refresh; the heats held out now are trained on
+   at the next one;
+2. measures the holdout MAE of the current model.  When it is more than
+   ``max_drift`` (relative) above the MAE recorded at the last full training
+   the data has drifted and the model is retrained on every heat but the
+   holdout, with its original parameters;
+3. otherwise it adds trees fitted on the new heats only: LightGBM and
+   CatBoost continue boosting from the current model (``init_model``),
+   RandomForest grows new trees next to the old ones (``warm_start``).  The
+   number of new trees is proportional to the share of new heats, at least
+   ``MIN_NEW_TREES``.  Linear models and single trees cannot be extended and
+   are retrained instead.  If the new model is worse on the holdout the
+   current one is kept, and so is the last trained key: the next refresh
+   sees these heats again.
+
+The state between refreshes (model name and parameters, last trained key,
+reference MAE and a history of the refreshes) is a JSON file next to the
+model, written by ``steelworks train`` and ``steelworks update``.
+"""
+
+import copy
+import json
+import os
+import time
+
+import numpy as np
+from sklearn.base import clone
+
+from .columns import FEATURE_COLUMNS, KEY, TARGET
+from .models import predictor
+
+
+META_SUFFIX = '.json'
+
+HOLDOUT_HEATS = 500
+MAX_DRIFT = 0.1
+MIN_NEW_TREES = 10
+
+
+def meta_path(model_path):
+    return os.path.splitext(model_path)[0] + META_SUFFIX
+
+
+def read_meta(model_path):
+    with open(meta_path(model_path), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_meta(meta, model_path):
+    """Save ``meta`` as JSON; raises TypeError, before touching the file, if
+    a value (an estimator parameter, say) has no JSON form that
+    :func:`read_meta` would give back."""
+    text = json.dumps(meta, indent=1, ensure_ascii=False)
+    with open(meta_path(model_path), 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def training_meta(name, estimator, last_key, heats, holdout_mae=None):
+    """State of a model fitted from scratch on ``heats`` heats up to the key
+    ``last_key``; ``name`` is its key in :data:`steelworks.cli.MODELS`."""
+    return {'model': name, 'params': estimator.get_params(), 'last_key': int(last_key),
+            'heats': int(heats), 'holdout_mae': holdout_mae, 'history': []}
+
+
+def _mae(model, X, y):
+    return float(np.mean(np.abs(y.to_numpy() - predictor(model)(X.to_numpy(dtype=np.float64)))))
+
+
+def _n_trees(model):
+    kind = type(model).__name__
+    if kind == 'LGBMRegressor':
+        return model.booster_.num_trees()
+    if kind == 'CatBoostRegressor':
+        return model.tree_count_
+    if kind == 'RandomForestRegressor':
+        return len(model.estimators_)
+    return None
+
+
+def add_trees(model, estimator, X, y, n_trees):
+    """``model`` with ``n_trees`` more trees fitted on ``X``, ``y``, or None
+    if its kind cannot be extended."""
+    kind = type(model).__name__
+    if kind == 'LGBMRegressor':
+        total = model.booster_.num_trees()
+        updated = clone(estimator).set_params(n_estimators=n_trees)
+        updated.fit(X, y, init_model=model.booster_)
+        return updated.set_params(n_estimators=total + n_trees)
+    if kind == 'CatBoostRegressor':
+        updated = clone(estimator).set_params(iterations=n_trees)
+        if updated.get_params().get('learning_rate') is None:
+            # CatBoost derives it from the number of iterations; keep the model's.
+            updated.set_params(learning_rate=model.learning_rate_)
+        return updated.fit(X, y, init_model=model)
+    if kind == 'RandomForestRegressor':
+        updated = copy.deepcopy(model).set_params(warm_start=True,
+                                                  n_estimators=len(model.estimators_) + n_trees)
+        return updated.fit(X, y).set_params(warm_start=False)
+    return None
+
+
+def update_model(model, estimator, meta, final_df, holdout=HOLDOUT_HEATS, max_drift=MAX_DRIFT,
+                 n_trees=None):
+    """Refresh ``model`` with the heats of ``final_df`` newer than
+    ``meta['last_key']``; returns (model, meta) - the model may be the same
+    object - with the refresh appended to ``meta['history']``.
+
+    ``estimator`` is the unfitted model with the original parameters, used
+    for retraining and for continued boosting.
+    """
+    started = time.perf_counter()
+    new = final_df[final_df[KEY] > meta['last_key']].sort_values(KEY)
+    record = {'new_heats': len(new), 'mode': 'unchanged'}
+    meta = {**meta, 'history': [*meta.get('history', []), record]}
+    if len(new) < 2:
+        record['seconds'] = time.perf_counter() - started
+        return model, meta
+
+    n_holdout = min(holdout, len(new) // 2)
+    fit, test = new.iloc[:-n_holdout], new.iloc[-n_holdout:]
+    X_test, y_test = test[FEATURE_COLUMNS], test[TARGET]
+    before = _mae(model, X_test, y_test)
+    reference = meta.get('holdout_mae') or before
+    record.update(holdout_heats=len(test), holdout_mae_before=before,
+                  drift=before / reference - 1)
+
+    drifted = record['drift'] > max_drift
+    updated = None
+    if not drifted:
+        current = _n_trees(model)
+        if current is not None:
+            extra = n_trees or max(MIN_NEW_TREES, round(current * len(fit) / max(meta['heats'], 1)))
+            updated = add_trees(model, estimator, fit[FEATURE_COLUMNS], fit[TARGET], extra)
+            record['new_trees'] = extra
+    if updated is None:
+        train = final_df[final_df[KEY] < test[KEY].min()]
+        updated = clone(estimator).fit(train[FEATURE_COLUMNS], train[TARGET])
+        record['mode'] = 'retrain'
+    after = _mae(updated, X_test, y_test)
+    record['holdout_mae'] = after
+    if after > before and not drifted:
+        # Nothing was learned from the new heats: they stay new for the next
+        # refresh.
+        record['mode'] = 'kept'
+        updated = model
+    elif record['mode'] == 'retrain':
+        meta.update(heats=len(train), holdout_mae=after, last_key=int(fit[KEY].max()))
+    else:
+        record['mode'] = 'incremental'
+        meta.update(heats=meta['heats'] + len(fit), last_key=int(fit[KEY].max()))
+    record['seconds'] = time.perf_counter() - started
+    return updated, meta
@@ -0,0 +1,315 @@
+"""Several hyperparameter searches at once on one budget of cores.
+
+The notebook used to select its model with five searches (linear
+regression, decision tree, random forest, LightGBM, CatBoost) run one after
+another: each one had the whole machine, and the last few fits of every
+search left most of the cores idle.  It now hands the four searches with a
+grid to the scheduler; the linear regression has no parameters to search
+and is still fitted on its own.  :meth:`SearchScheduler.fit` runs them at the same
+time.  Every search's ``fit`` runs in a thread of this process and sends its
+candidate × fold fits (or learning curves) to one pool of ``cpus`` worker
+processes shared by all searches; ``X`` and ``y`` of every search are in
+shared memory, as with :class:`steelworks.search.FitPool`.
+
+The scheduler hands out the cores:
+
+* a fit starts only when a core is free, and the threads of all running fits
+  (and refits) never add up to more than ``cpus``;
+* the searches take turns, so all of them make progress and a quick search
+  is not stuck behind a slow one;
+* while at least as many fits are waiting as cores are free every fit gets
+  one thread.  Once the queue gets short - the quick searches are done and
+  the slowest one is in its last fits - the free cores are split among the
+  waiting fits as threads of the estimators that have a thread parameter
+  (LightGBM ``n_jobs``, CatBoost ``thread_count``, RandomForest ``n_jobs``).
+  The refit of a search's best candidate on all of ``X`` takes its cores the
+  same way and keeps that number as its thread parameter (a fitted CatBoost
+  model cannot change it).
+
+The searches' own ``n_jobs`` and ``threads_per_job`` are ignored while the
+scheduler runs them; their caches and results are the same as when they run
+alone.  ``timings_`` has the wall-clock seconds of every search.
+
+When :meth:`SearchScheduler.fit` is interrupted (Ctrl-C) the pool is stopped
+and the searches waiting for fits or cores get a ``CancelledError``; their
+threads are joined, for at most ``STOP_SECONDS``, before the interrupt
+propagates.  A search busy refitting in this process cannot be stopped that
+way: its thread is left behind, and as a daemon thread it does not keep the
+interpreter from exiting.
+"""
+
+import collections
+import itertools
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError
+from contextlib import contextmanager
+
+import numpy as np
+from sklearn.base import clone
+
+from . import trace
+from .binned import FoldDatasets
+from .parallel import THREAD_PARAMS, cap_threads, effective_n_jobs, limited_thread_env
+from .search import FitPool, SharedArray, _traced_curve, _traced_fit
+
+
+# How long an interrupted fit() waits for the search threads to stop.
+STOP_SECONDS = 5.0
+
+# Shared-memory state of the searches a worker process has seen, by job id.
+_jobs = {}
+
+# Stands in the queue for a refit waiting for its cores.
+_Reservation = collections.namedtuple('_Reservation', ['threaded'])
+
+
+def _init_worker(traced=False):
+    if traced:
+        trace.enable()
+
+
+def _forget(live):
+    for job in set(_jobs) - set(live):
+        state = _jobs.pop(job)
+        del state['datasets'], state['X'], state['y'], state['folds']
+        for shm in state['handles']:
+            try:
+                shm.close()
+            except BufferError:
+                # Still viewed by a fitted object; it goes with the process.
+                pass
+
+
+def _attach(job, spec):
+    if job not in _jobs:
+        estimator_bytes, x_spec, y_spec, folds_spec, bounds = spec
+        X, x_shm = SharedArray.attach(x_spec)
+        y, y_shm = SharedArray.attach(y_spec)
+        indices, folds_shm = SharedArray.attach(folds_spec)
+        folds = [(indices[a:b], indices[b:c]) for a, b, c in bounds]
+        _jobs[job] = {'estimator': pickle.loads(estimator_bytes), 'X': X, 'y': y, 'folds': folds,
+                      'datasets': FoldDatasets(X, y, folds),
+                      'handles': (x_shm, y_shm, folds_shm)}
+    return _jobs[job]
+
+
+def _run_task(task):
+    job, spec, live, kind, payload, threads = task
+    _forget(live)
+    state = _attach(job, spec)
+    estimator = cap_threads(clone(state['estimator']), threads)
+    if kind == 'fit':
+        candidate, fold, params, n_train = payload
+        mae, fit_time = _traced_fit(estimator, params, state['datasets'], fold, n_train, candidate)
+        result = candidate, fold, mae, fit_time
+    else:
+        cell, fold, params, patience = payload
+        curve, fit_time = _traced_curve(estimator, params, state['datasets'], patience, cell, fold)
+        result = cell, fold, curve, fit_time
+    return result, trace.collect()
+
+
+class ScheduledFitPool(FitPool):
+    """A :class:`steelworks.search.FitPool` whose tasks run on the workers of
+    a :class:`SearchScheduler`."""
+
+    def __init__(self, scheduler, job, estimator, X, y, folds, cache=None):
+        super().__init__(estimator, X, y, folds, n_jobs=1, threads_per_job=1, cache=cache)
+        self.scheduler = scheduler
+        self.job = job
+        params = self.estimator.get_params()
+        self.threaded = any(name in params for name in THREAD_PARAMS)
+        self.spec = None
+
+    def _start(self):
+        folds = [part for fold in self.folds for part in fold]
+        ends = np.cumsum([len(part) for part in folds])
+        bounds = [(0 if k == 0 else int(ends[k - 1]), int(ends[k]), int(ends[k + 1]))
+                  for k in range(0, len(folds), 2)]
+        self._shared = [SharedArray(self.X), SharedArray(self.y),
+                        SharedArray(np.concatenate(folds).astype(np.intp))]
+        self.spec = (pickle.dumps(self.estimator), self._shared[0].spec, self._shared[1].spec,
+                     self._shared[2].spec, bounds)
+
+    def __exit__(self, *exc):
+        self.scheduler._finish(self.job)
+        super().__exit__(*exc)
+
+    def _submit(self, kind, tasks):
+        if not tasks:
+            return
+        if self.spec is None:
+            self._start()
+        results = queue.Queue()
+        self.scheduler._submit(self, kind, tasks, results)
+        for _ in tasks:
+            item = results.get()
+            if isinstance(item, BaseException):
+                raise item
+            result, spans = item
+            trace.add_spans(spans)
+            yield result
+
+    def _fit(self, tasks):
+        yield from self._submit('fit', tasks)
+
+    def _fit_curves(self, tasks):
+        yield from self._submit('curve', tasks)
+
+
+class SearchScheduler:
+    """Runs several searches at the same time on ``cpus`` cores (default: all
+    of them); see the module docstring."""
+
+    def __init__(self, cpus=None, mp_context='spawn'):
+        self.cpus = effective_n_jobs(-1 if cpus is None else cpus)
+        self.mp_context = mp_context
+        self._pool = None
+        self._jobs = itertools.count()
+
+    def fit(self, searches, X, y):
+        """Fit every search of the dict ``searches`` (name: search) on ``X``,
+        ``y``; returns ``searches``.  The first error of a search is raised
+        once all of them have stopped."""
+        self.timings_ = {}
+        self._condition = threading.Condition()
+        self._pending = collections.OrderedDict()
+        self._n_pending = 0
+        self._busy = 0
+        self._live = set()
+        self._results = {}
+        self._stopped = False
+        errors = {}
+        threads = []
+        context = multiprocessing.get_context(self.mp_context)
+        with limited_thread_env(1):
+            self._pool = context.Pool(self.cpus, _init_worker, (trace.enabled(),))
+        try:
+            with trace.stage('scheduled_searches', 'search', cpus=self.cpus,
+                             searches=list(searches)):
+                threads = [threading.Thread(target=self._run_search,
+                                            args=(name, search, X, y, errors), name=name,
+                                            daemon=True)
+                           for name, search in searches.items()]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            self._stop()
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            deadline = time.monotonic() + STOP_SECONDS
+            for thread in threads:
+                thread.join(max(deadline - time.monotonic(), 0))
+        for name in searches:
+            if name in errors:
+                raise errors[name]
+        return searches
+
+    def _run_search(self, name, search, X, y, errors):
+        started = time.monotonic()
+        search.scheduler = self
+        try:
+            search.fit(X, y)
+        except BaseException as error:
+            errors[name] = error
+        finally:
+            search.scheduler = None
+            self.timings_[name] = time.monotonic() - started
+
+    def fit_pool(self, estimator, X, y, folds, cache=None):
+        """The :class:`ScheduledFitPool` a search uses instead of its own pool."""
+        job = next(self._jobs)
+        with self._condition:
+            self._live.add(job)
+        return ScheduledFitPool(self, job, estimator, X, y, folds, cache)
+
+    def _threads(self, threaded):
+        free = self.cpus - self._busy
+        return max(1, free // (self._n_pending + 1)) if threaded else 1
+
+    def _stop(self):
+        # Drop the waiting fits and wake every search blocked on a result or
+        # on cores; their fits in the pool are never answered.
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._n_pending = 0
+            for results in self._results.values():
+                results.put(CancelledError('the scheduler was stopped'))
+            self._condition.notify_all()
+
+    def _submit(self, pool, kind, tasks, results):
+        with self._condition:
+            if self._stopped:
+                raise CancelledError('the scheduler was stopped')
+            self._results[pool.job] = results
+            waiting = self._pending.setdefault(pool.job, collections.deque())
+            waiting.extend((pool, kind, task, results) for task in tasks)
+            self._n_pending += len(tasks)
+            self._dispatch()
+
+    def _dispatch(self):
+        # Called with the condition held: start waiting items, the searches
+        # taking turns, while there are free cores.
+        while self._busy < self.cpus and self._pending:
+            job, waiting = next(iter(self._pending.items()))
+            pool, kind, task, results = waiting.popleft()
+            self._n_pending -= 1
+            self._pending.move_to_end(job)
+            if not waiting:
+                del self._pending[job]
+            threads = self._threads(pool.threaded)
+            self._busy += threads
+            if kind == 'reserve':
+                task.append(threads)
+                self._condition.notify_all()
+                continue
+            payload = (job, pool.spec, tuple(self._live), kind, task, threads)
+            self._pool.apply_async(_run_task, (payload,),
+                                   callback=lambda item, r=results, t=threads: self._done(r, t, item),
+                                   error_callback=lambda e, r=results, t=threads: self._done(r, t, e))
+
+    def _done(self, results, threads, item):
+        with self._condition:
+            self._busy -= threads
+            self._dispatch()
+        results.put(item)
+
+    def _finish(self, job):
+        with self._condition:
+            self._live.discard(job)
+            self._results.pop(job, None)
+            waiting = self._pending.pop(job, ())
+            self._n_pending -= len(waiting)
+
+    @contextmanager
+    def reserve(self, estimator):
+        """Block until cores are free for one fit of ``estimator`` in this
+        process; yields the number of threads it may use."""
+        granted = []
+        threaded = any(name in estimator.get_params() for name in THREAD_PARAMS)
+        job = ('reserve', next(self._jobs))
+        with self._condition:
+            if self._stopped:
+                raise CancelledError('the scheduler was stopped')
+            self._pending[job] = collections.deque(
+                [(_Reservation(threaded), 'reserve', granted, None)])
+            self._n_pending += 1
+            self._dispatch()
+            while not granted:
+                if self._stopped:
+                    raise CancelledError('the scheduler was stopped')
+                self._condition.wait()
+        try:
+            yield granted[0]
+        finally:
+            with self._condition:
+                self._busy -= granted[0]
+                self._dispatch()
@@ -0,0 +1,58 @@
+"""Column types of the seven ``final_steel`` tables.
+
+Each table is read with an explicit schema: ``int32`` keys, ``float32``
+measurements, nullable ``Float32`` for the sparse Bulk/Wire volume columns and
+``datetime64`` for every timestamp.  Timestamps are parsed once here, at read
+time, instead of being loaded as strings and converted later.
+"""
+
+import pandas as pd
+
+from .columns import BULK_COLUMNS, WIRE_COLUMNS
+
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Marker for columns stored as text in the CSV and parsed with TIME_FORMAT.
+DATETIME = 'datetime'
+
+SCHEMAS = {
+    'data_arc': {
+        'key': 'int32',
+        'Начало нагрева дугой': DATETIME,
+        'Конец нагрева дугой': DATETIME,
+        'Активная мощность': 'float32',
+        'Реактивная мощность': 'float32',
+    },
+    'data_bulk': {'key': 'int32', **{c: 'Float32' for c in BULK_COLUMNS}},
+    'data_bulk_time': {'key': 'int32', **{c: DATETIME for c in BULK_COLUMNS}},
+    'data_gas': {'key': 'int32', 'Газ 1': 'float32'},
+    'data_temp': {
+        'key': 'int32',
+        'Время замера': DATETIME,
+        'Температура': 'float32',
+    },
+    'data_wire': {'key': 'int32', **{c: 'Float32' for c in WIRE_COLUMNS}},
+    'data_wire_time': {'key': 'int32', **{c: DATETIME for c in WIRE_COLUMNS}},
+}
+
+
+def _apply_types(df, schema):
+    for column, kind in schema.items():
+        if kind == DATETIME:
+            df[column] = pd.to_datetime(df[column], format=TIME_FORMAT)
+    return df[list(schema)]
+
+
+def read_typed_csv(path, name, chunksize=None):
+    """Read the CSV of table ``name`` at ``path`` using its schema.
+
+    With ``chunksize`` an iterator of typed DataFrames of at most that many
+    rows is returned instead.
+    """
+    schema = SCHEMAS[name]
+    dtype = {c: (str if t == DATETIME else t) for c, t in schema.items()}
+    if chunksize is not None:
+        reader = pd.read_csv(path, usecols=list(schema), dtype=dtype, chunksize=chunksize)
+        return (_apply_types(chunk, schema) for chunk in reader)
+    return _apply_types(pd.read_csv(path, usecols=list(schema), dtype=dtype), schema)
@@ -0,0 +1,167 @@
+"""On-disk memo of cross-validation fold scores.
+
+Every fit of a search is identified by the model (class, library version and
+all of its parameters except thread counts), the fold, the number of training
+rows and a fingerprint of the data: the bytes of ``X``, ``y`` and the fold
+indices.  :class:`ScoreCache` stores the MAE and fit time of each such fit in a
+SQLite file, so re-running a search only fits the cells that are not known yet
+and an interrupted search continues where it stopped.  A changed feature table
+has a new fingerprint and therefore never hits old entries; those age out of
+the cache, which keeps at most ``max_entries`` rows and drops the least
+recently used ones first.
+
+Parameter values are fingerprinted by content: estimators (anything with
+``get_params``) by their class and parameters, arrays by their bytes.  A value
+that has no such identity - its repr shows an object address, which differs
+between runs - makes the fit uncacheable; it is fitted every time instead of
+being stored under a key that can never be hit again.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .io import CACHE_DIRNAME, DATA_DIR
+
+
+DEFAULT_PATH = os.path.join(DATA_DIR, CACHE_DIRNAME, 'cv_scores.sqlite')
+
+# Bump whenever the way a fold is fitted and scored changes, so that scores
+# stored by an older version are not reused.
+SCORES_VERSION = 2
+
+# Parameters that change how fast a model is fitted, not what it learns.
+IGNORED_PARAMS = ('n_jobs', 'thread_count', 'num_threads', 'verbose', 'verbosity')
+
+
+def dataset_fingerprint(X, y, folds):
+    digest = hashlib.blake2b(digest_size=16)
+    for array in (X, y, *(part for fold in folds for part in fold)):
+        array = np.ascontiguousarray(array)
+        digest.update(f'{array.dtype.str}{array.shape}'.encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def _class_name(cls):
+    return f'{cls.__module__}.{cls.__qualname__}'
+
+
+def _canonical(value):
+    """JSON-serialisable form of a parameter value that is the same in every
+    run; raises TypeError for values without one."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {str(name): _canonical(item) for name, item in value.items()}
+    if isinstance(value, range):
+        return {'range': [value.start, value.stop, value.step]}
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        return {'array': f'{array.dtype.str}{array.shape}',
+                'blake2b': hashlib.blake2b(array.data, digest_size=16).hexdigest()}
+    if hasattr(value, 'get_params') and not isinstance(value, type):
+        return {'class': _class_name(type(value)),
+                'params': _canonical(value.get_params(deep=False))}
+    text = repr(value)
+    if ' at 0x' in text:
+        raise TypeError(f'{_class_name(type(value))} has no stable fingerprint')
+    return {'class': _class_name(type(value)), 'repr': text}
+
+
+def model_fingerprint(estimator, params):
+    """(model, params) strings identifying ``estimator`` fitted with ``params``,
+    or None when some parameter value has no stable fingerprint."""
+    cls = type(estimator)
+    library = sys.modules.get(cls.__module__.split('.')[0])
+    model = f'{_class_name(cls)}=={getattr(library, "__version__", "")}/{SCORES_VERSION}'
+    merged = {**estimator.get_params(deep=False), **params}
+    merged = {name: value for name, value in merged.items() if name not in IGNORED_PARAMS}
+    try:
+        return model, json.dumps(_canonical(merged), sort_keys=True)
+    except TypeError:
+        return None
+
+
+class ScoreCache:
+    """SQLite-backed (MAE, fit time) store with an LRU size bound.
+
+    One cache can be shared by searches running in several threads
+    (:class:`steelworks.scheduler.SearchScheduler`).
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=200_000):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                dataset TEXT, model TEXT, params TEXT, fold INTEGER, n_train INTEGER,
+                mae REAL, fit_time REAL, used REAL,
+                PRIMARY KEY (dataset, model, params, fold, n_train))""")
+        self._db.execute('CREATE INDEX IF NOT EXISTS scores_used ON scores (used)')
+        self._db.commit()
+
+    @staticmethod
+    def key(dataset, model, params, fold, n_train=None):
+        return dataset, model, params, int(fold), -1 if n_train is None else int(n_train)
+
+    def lookup(self, keys):
+        """{key: (mae, fit_time)} for the ``keys`` that are stored."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                row = self._db.execute(
+                    'SELECT mae, fit_time FROM scores WHERE dataset=? AND model=? AND params=? '
+                    'AND fold=? AND n_train=?', key).fetchone()
+                if row is not None:
+                    found[key] = row
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    'UPDATE scores SET used=? WHERE dataset=? AND model=? AND params=? '
+                    'AND fold=? AND n_train=?', [(now, *key) for key in found])
+                self._db.commit()
+        return found
+
+    def store(self, key, mae, fit_time):
+        """Save one result right away, so an interrupted search keeps it."""
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             (*key, mae, fit_time, time.time()))
+            self._db.commit()
+            self._evict()
+
+    def _evict(self):
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._db.execute('DELETE FROM scores WHERE rowid IN '
+                             '(SELECT rowid FROM scores ORDER BY used LIMIT ?)', (excess,))
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM scores')
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,579 @@
+"""Hyperparameter search over a process pool.
+
+:class:`ParallelGridSearch` is a drop-in for the ``GridSearchCV(...,
+scoring='neg_mean_absolute_error')`` calls of the notebook.  Every
+candidate × fold fit is a separate task for a pool of worker processes.  The
+training matrix is copied once into shared memory and every worker maps it
+zero-copy, so only parameter dicts and fold numbers travel between processes.
+
+Threads inside the estimators (LightGBM ``n_jobs``, CatBoost
+``thread_count``, RandomForest ``n_jobs``) and the BLAS/OpenMP pools of the
+workers are capped at ``threads_per_job`` so that ``n_jobs`` workers never
+oversubscribe the cores.
+
+:class:`EarlyStoppingSearch` scores the length axis of the boosting grids
+(``n_estimators`` / ``iterations``) from one learning curve per cell and
+fold instead of one fit per length.  LightGBM and CatBoost candidates train
+on the binned Dataset / quantized Pool of their fold, which every process
+builds once (:mod:`steelworks.binned`).
+
+With :mod:`steelworks.trace` on, every search, rung and candidate × fold fit
+is traced; workers trace their fits and send the spans back with the scores.
+"""
+
+import multiprocessing
+import pickle
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid
+
+from . import trace
+from .binned import FoldDatasets, library
+from .parallel import cap_threads, effective_n_jobs, limited_thread_env
+from .scorecache import dataset_fingerprint, model_fingerprint
+
+
+class SharedArray:
+    """A numpy array copied into a named shared-memory block."""
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.spec = (self._shm.name, array.shape, array.dtype.str)
+        np.ndarray(array.shape, array.dtype, buffer=self._shm.buf)[...] = array
+
+    def release(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    @staticmethod
+    def attach(spec):
+        """Map a block created by another process; returns (array, handle).
+
+        Pool workers share the resource tracker of the process that created
+        the block, so attaching does not hand its cleanup over to them.
+        """
+        name, shape, dtype = spec
+        shm = shared_memory.SharedMemory(name=name)
+        return np.ndarray(shape, np.dtype(dtype), buffer=shm.buf), shm
+
+
+# State of a worker process, set once by _init_worker.
+_worker = {}
+
+
+def _init_worker(estimator_bytes, x_spec, y_spec, folds, traced=False):
+    _worker['X'], _worker['x_shm'] = SharedArray.attach(x_spec)
+    _worker['y'], _worker['y_shm'] = SharedArray.attach(y_spec)
+    _worker['estimator'] = pickle.loads(estimator_bytes)
+    _worker['folds'] = folds
+    _worker['datasets'] = FoldDatasets(_worker['X'], _worker['y'], folds)
+    if traced:
+        trace.enable()
+
+
+def fit_and_score(estimator, params, X, y, train, test):
+    """Fit a clone of ``estimator`` with ``params`` on ``train`` rows and
+    return (test MAE, fit seconds)."""
+    model = clone(estimator).set_params(**params)
+    start = time.perf_counter()
+    model.fit(X[train], y[train])
+    fit_time = time.perf_counter() - start
+    mae = float(np.mean(np.abs(y[test] - model.predict(X[test]))))
+    return mae, fit_time
+
+
+def _curve_resource(estimator):
+    """The length parameter of a boosting estimator whose learning curve
+    :func:`learning_curve` can record."""
+    resource = {'lightgbm': 'n_estimators', 'catboost': 'iterations'}.get(library(estimator))
+    if resource is None:
+        raise ValueError(f'no learning curve for {type(estimator).__name__}: '
+                         'expected a LightGBM or CatBoost estimator')
+    return resource
+
+
+def learning_curve(estimator, params, X, y, train, test, patience=None):
+    """Fit a clone of a LightGBM or CatBoost ``estimator`` once with ``params``
+    and the ``test`` rows as eval set; returns (test MAE after every boosting
+    iteration, fit seconds).
+
+    With ``patience`` training stops once the MAE has not improved for that
+    many iterations, so the curve can be shorter than the length parameter.
+    The MAE after ``k`` iterations is the test MAE of the same model fitted
+    with length ``k``: boosting adds its trees one after another.
+    """
+    _curve_resource(estimator)
+    return FoldDatasets(X, y, [(train, test)]).learning_curve(estimator, params, 0, patience)
+
+
+def _traced_curve(estimator, params, datasets, patience, cell, fold):
+    train, _ = datasets.folds[fold]
+    with trace.stage('curve', 'search', rows_in=len(train), estimator=type(estimator).__name__,
+                     cell=cell, fold=fold, params=params) as span:
+        curve, fit_time = datasets.learning_curve(estimator, params, fold, patience)
+        span.rows_out = len(curve)
+    return curve, fit_time
+
+
+def _run_curve_task(task):
+    cell, fold, params, patience = task
+    curve, fit_time = _traced_curve(_worker['estimator'], params, _worker['datasets'], patience,
+                                    cell, fold)
+    return cell, fold, curve, fit_time, trace.collect()
+
+
+def _traced_fit(estimator, params, datasets, fold, n_train, candidate):
+    train, test = datasets.folds[fold]
+    train = train[:n_train]
+    with trace.stage('fit', 'search', rows_in=len(train), estimator=type(estimator).__name__,
+                     candidate=candidate, fold=fold, params=params) as span:
+        if n_train is None and datasets.supports(estimator):
+            mae, fit_time = datasets.fit_and_score(estimator, params, fold)
+        else:
+            mae, fit_time = fit_and_score(estimator, params, datasets.X, datasets.y, train, test)
+        span.rows_out = len(test)
+    return mae, fit_time
+
+
+def _run_task(task):
+    candidate, fold, params, n_train = task
+    mae, fit_time = _traced_fit(_worker['estimator'], params, _worker['datasets'], fold, n_train,
+                                candidate)
+    return candidate, fold, mae, fit_time, trace.collect()
+
+
+class FitPool:
+    """Runs fit tasks against one training matrix, serially or on a pool of
+    worker processes that map the matrix from shared memory.
+
+    A task is ``(candidate, fold, params, n_train)``: fit with ``params`` on
+    the first ``n_train`` rows (``None`` for all) of the fold's training part
+    and score on its test part.  Use as a context manager; the pool and the
+    shared memory live until the block ends.
+
+    With a :class:`steelworks.scorecache.ScoreCache` known results are read
+    from it and only the remaining tasks are fitted; each new result is
+    stored as soon as it arrives.  LightGBM and CatBoost tasks on whole folds
+    reuse the fold's :class:`steelworks.binned.FoldDatasets`.
+    """
+
+    def __init__(self, estimator, X, y, folds, n_jobs=-1, threads_per_job=1,
+                 mp_context='spawn', cache=None):
+        self.estimator = cap_threads(clone(estimator), threads_per_job)
+        self.X, self.y, self.folds = X, y, folds
+        self.datasets = FoldDatasets(X, y, folds)
+        self.n_jobs = effective_n_jobs(n_jobs)
+        self.threads_per_job = threads_per_job
+        self.mp_context = mp_context
+        self.cache = cache
+        self._dataset = dataset_fingerprint(X, y, folds) if cache is not None else None
+        self._pool = None
+        self._shared = []
+
+    def __enter__(self):
+        return self
+
+    def _start(self):
+        # Started on the first fit, so a fully cached search spawns nothing.
+        self._shared = [SharedArray(self.X), SharedArray(self.y)]
+        context = multiprocessing.get_context(self.mp_context)
+        initargs = (pickle.dumps(self.estimator), self._shared[0].spec,
+                    self._shared[1].spec, self.folds, trace.enabled())
+        with limited_thread_env(self.threads_per_job):
+            self._pool = context.Pool(self.n_jobs, _init_worker, initargs)
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        for shared in self._shared:
+            shared.release()
+        self._shared = []
+
+    def run(self, tasks):
+        """Yield ``(candidate, fold, mae, fit_time)`` as tasks finish."""
+        if self.cache is None:
+            yield from self._fit(tasks)
+            return
+        keys = {}
+        for candidate, fold, params, n_train in tasks:
+            fingerprint = model_fingerprint(self.estimator, params)
+            if fingerprint is not None:
+                keys[candidate, fold] = self.cache.key(self._dataset, *fingerprint, fold, n_train)
+        known = self.cache.lookup(keys.values())
+        for (candidate, fold), key in keys.items():
+            if key in known:
+                yield (candidate, fold, *known[key])
+        missing = [task for task in tasks if keys.get(task[:2]) not in known]
+        for candidate, fold, mae, fit_time in self._fit(missing):
+            if (candidate, fold) in keys:
+                self.cache.store(keys[candidate, fold], mae, fit_time)
+            yield candidate, fold, mae, fit_time
+
+    def _fit(self, tasks):
+        if not tasks:
+            return
+        if self._pool is None and self.n_jobs > 1:
+            self._start()
+        if self._pool is None:
+            for candidate, fold, params, n_train in tasks:
+                mae, fit_time = _traced_fit(self.estimator, params, self.datasets, fold, n_train,
+                                            candidate)
+                yield candidate, fold, mae, fit_time
+            return
+        chunksize = max(1, len(tasks) // (self.n_jobs * 8))
+        for candidate, fold, mae, fit_time, spans in self._pool.imap_unordered(_run_task, tasks,
+                                                                                chunksize):
+            trace.add_spans(spans)
+            yield candidate, fold, mae, fit_time
+
+    def scores(self, candidates, n_train=None):
+        """(MAE, fit time) arrays of shape (n_candidates, n_folds)."""
+        n_folds = len(self.folds)
+        tasks = [(i, j, params, n_train) for i, params in enumerate(candidates)
+                 for j in range(n_folds)]
+        scores = np.empty((len(candidates), n_folds))
+        fit_times = np.empty_like(scores)
+        for i, j, mae, fit_time in self.run(tasks):
+            scores[i, j], fit_times[i, j] = mae, fit_time
+        return scores, fit_times
+
+    def _fit_curves(self, tasks):
+        if self._pool is None and self.n_jobs > 1 and tasks:
+            self._start()
+        if self._pool is None:
+            for cell, fold, params, patience in tasks:
+                curve, fit_time = _traced_curve(self.estimator, params, self.datasets, patience,
+                                                cell, fold)
+                yield cell, fold, curve, fit_time
+            return
+        for cell, fold, curve, fit_time, spans in self._pool.imap_unordered(_run_curve_task, tasks):
+            trace.add_spans(spans)
+            yield cell, fold, curve, fit_time
+
+    def curve_scores(self, cells, resource, lengths, patience=None):
+        """MAE of every cell (parameters without ``resource``) at every length
+        in ``lengths``, from one :func:`learning_curve` fit per cell × fold.
+
+        Returns scores, fit times and ``reached`` of shape (n_cells,
+        n_lengths, n_folds) and the iterations every fit ran, of shape
+        (n_cells, n_folds; NaN where everything came from the cache).  A
+        length past an early stop is not reached and scores the last MAE of
+        the curve.  Fit times are the curve's fit time pro-rated to the
+        length.  With a cache, reached lengths are stored under the keys of
+        ordinary fits with that length, and a cell × fold is only fitted when
+        some of its lengths are missing.
+        """
+        n_folds = len(self.folds)
+        shape = (len(cells), len(lengths), n_folds)
+        scores, fit_times = np.full(shape, np.nan), np.full(shape, np.nan)
+        reached = np.zeros(shape, dtype=bool)
+        iterations = np.full((len(cells), n_folds), np.nan)
+        keys = {}
+        if self.cache is not None:
+            for i, cell in enumerate(cells):
+                for k, length in enumerate(lengths):
+                    fingerprint = model_fingerprint(self.estimator, {**cell, resource: length})
+                    if fingerprint is None:
+                        continue
+                    for j in range(n_folds):
+                        keys[i, k, j] = self.cache.key(self._dataset, *fingerprint, j, None)
+            known = self.cache.lookup(keys.values())
+            for (i, k, j), key in keys.items():
+                if key in known:
+                    scores[i, k, j], fit_times[i, k, j] = known[key]
+                    reached[i, k, j] = True
+
+        tasks = []
+        for i, cell in enumerate(cells):
+            for j in range(n_folds):
+                missing = [length for k, length in enumerate(lengths) if not reached[i, k, j]]
+                if missing:
+                    tasks.append((i, j, {**cell, resource: max(missing)}, patience))
+        for i, j, curve, fit_time in self._fit_curves(tasks):
+            iterations[i, j] = len(curve)
+            for k, length in enumerate(lengths):
+                if reached[i, k, j]:
+                    continue
+                n = min(length, len(curve))
+                scores[i, k, j], fit_times[i, k, j] = curve[n - 1], fit_time * n / len(curve)
+                reached[i, k, j] = length <= len(curve)
+                if reached[i, k, j] and (i, k, j) in keys:
+                    self.cache.store(keys[i, k, j], scores[i, k, j], fit_times[i, k, j])
+        return scores, fit_times, reached, iterations
+
+
+class ParallelGridSearch:
+    """Exhaustive MAE grid search with candidate × fold fits in parallel.
+
+    Attributes after :meth:`fit` follow ``GridSearchCV``: ``best_params_``,
+    ``best_score_`` (negative MAE), ``best_estimator_`` (refit on all of
+    ``X``) and ``cv_results_``.  Pass a ``ScoreCache`` as ``cache`` to reuse
+    fold scores across runs.
+    """
+
+    def __init__(self, estimator, param_grid, cv, n_jobs=-1, threads_per_job=1,
+                 refit=True, mp_context='spawn', cache=None):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.threads_per_job = threads_per_job
+        self.refit = refit
+        self.mp_context = mp_context
+        self.cache = cache
+        # Set by steelworks.scheduler.SearchScheduler while it runs the search.
+        self.scheduler = None
+
+    def candidates(self):
+        return list(ParameterGrid(self.param_grid))
+
+    def _fit_pool(self, X, y, folds, n_tasks):
+        if self.scheduler is not None:
+            return self.scheduler.fit_pool(self.estimator, X, y, folds, self.cache)
+        n_jobs = min(effective_n_jobs(self.n_jobs), n_tasks)
+        return FitPool(self.estimator, X, y, folds, n_jobs, self.threads_per_job,
+                       self.mp_context, self.cache)
+
+    def _split(self, X, y):
+        X_values = np.asarray(X, dtype=np.float64)
+        y_values = np.asarray(y, dtype=np.float64)
+        folds = [(np.asarray(train), np.asarray(test)) for train, test in self.cv.split(X_values)]
+        return X_values, y_values, folds
+
+    def _refit(self, X, y):
+        if self.refit:
+            with trace.stage('refit', 'search', rows_in=len(X),
+                             estimator=type(self.estimator).__name__, params=self.best_params_):
+                self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+                if self.scheduler is None:
+                    self.best_estimator_.fit(X, y)
+                    return
+                with self.scheduler.reserve(self.best_estimator_) as threads:
+                    cap_threads(self.best_estimator_, threads).fit(X, y)
+
+    def _stage(self, name, X, n_candidates):
+        return trace.stage(name, 'search', rows_in=len(X), estimator=type(self.estimator).__name__,
+                           candidates=n_candidates)
+
+    def fit(self, X, y):
+        candidates = self.candidates()
+        with self._stage('grid_search', X, len(candidates)):
+            X_values, y_values, folds = self._split(X, y)
+            with self._fit_pool(X_values, y_values, folds, len(candidates) * len(folds)) as pool:
+                scores, fit_times = pool.scores(candidates)
+            self._store_results(candidates, scores, fit_times)
+            self._refit(X, y)
+        return self
+
+    def _store_results(self, candidates, scores, fit_times):
+        mean = scores.mean(axis=1)
+        results = {'params': candidates,
+                   'mean_test_score': -mean,
+                   'std_test_score': scores.std(axis=1),
+                   'mean_fit_time': fit_times.mean(axis=1),
+                   'rank_test_score': mean.argsort(kind='stable').argsort() + 1}
+        for j in range(scores.shape[1]):
+            results[f'split{j}_test_score'] = -scores[:, j]
+        for name in {name for params in candidates for name in params}:
+            results[f'param_{name}'] = [params.get(name) for params in candidates]
+        self.cv_results_ = results
+        self.best_index_ = int(mean.argmin())
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = float(-mean[self.best_index_])
+
+
+class SuccessiveHalvingSearch(ParallelGridSearch):
+    """Budget-aware search over the same parameter grids.
+
+    All candidates are first scored with a small budget of ``resource``, then
+    only the best ``1/factor`` of them go on to a ``factor`` times larger
+    budget, until the survivors are scored with the full budget.  The
+    resource is either ``'n_samples'`` (training rows of every fold) or an
+    estimator parameter such as ``'n_estimators'`` (LGBM, RandomForest) or
+    ``'iterations'`` (CatBoost); a resource parameter that is also in the
+    grid is taken off it and its largest value becomes the full budget.
+
+    With ``time_budget`` (seconds of wall-clock time) the search stops before
+    a rung that would not fit into the budget and keeps the best candidate
+    of the last finished rung.  ``cv_results_`` holds one row per candidate
+    and rung; ``best_resource_`` is the budget ``best_score_`` was measured at
+    (for a parameter resource it is also the value in ``best_params_``).
+    """
+
+    MIN_SAMPLES = 30
+
+    def __init__(self, estimator, param_grid, cv, resource='n_samples', factor=3,
+                 min_resource=None, max_resource=None, time_budget=None, n_jobs=-1,
+                 threads_per_job=1, refit=True, mp_context='spawn', random_state=0, cache=None):
+        super().__init__(estimator, param_grid, cv, n_jobs, threads_per_job, refit, mp_context, cache)
+        self.resource = resource
+        self.factor = factor
+        self.min_resource = min_resource
+        self.max_resource = max_resource
+        self.time_budget = time_budget
+        self.random_state = random_state
+
+    def candidates(self):
+        grid = {name: values for name, values in self.param_grid.items() if name != self.resource}
+        return list(ParameterGrid(grid))
+
+    def _schedule(self, n_candidates, n_train):
+        """Budgets of the rungs, smallest first, the last one being the full budget."""
+        if self.resource == 'n_samples':
+            max_resource, floor = self.max_resource or n_train, self.MIN_SAMPLES
+        else:
+            max_resource = self.max_resource or max(self.param_grid[self.resource])
+            floor = 1
+        n_rungs = 1 + int(np.ceil(np.log(max(n_candidates, 1)) / np.log(self.factor)))
+        min_resource = self.min_resource or max(floor, max_resource / self.factor ** (n_rungs - 1))
+        n_rungs = min(n_rungs, 1 + int(np.log(max_resource / min_resource) / np.log(self.factor)))
+        return [int(min_resource * self.factor ** k) for k in range(n_rungs - 1)] + [int(max_resource)]
+
+    def _rung_candidates(self, candidates, alive, budget):
+        if self.resource == 'n_samples':
+            return [candidates[i] for i in alive], budget
+        return [{**candidates[i], self.resource: budget} for i in alive], None
+
+    def fit(self, X, y):
+        with self._stage('halving_search', X, len(self.candidates())):
+            return self._fit(X, y)
+
+    def _fit(self, X, y):
+        started = time.monotonic()
+        X_values, y_values, folds = self._split(X, y)
+        if self.resource == 'n_samples':
+            # Smaller budgets use a prefix of every fold's training rows, so
+            # the rows have to be in random order.
+            rng = np.random.default_rng(self.random_state)
+            folds = [(rng.permutation(train), test) for train, test in folds]
+        candidates = self.candidates()
+        schedule = self._schedule(len(candidates), min(len(train) for train, _ in folds))
+
+        alive = list(range(len(candidates)))
+        history = []
+        self.budget_exhausted_ = False
+        with self._fit_pool(X_values, y_values, folds, len(candidates) * len(folds)) as pool:
+            rung = 0
+            while True:
+                budget = schedule[rung]
+                rung_started = time.monotonic()
+                params, n_train = self._rung_candidates(candidates, alive, budget)
+                with trace.stage('rung', 'search', rung=rung, resource=budget,
+                                 candidates=len(params)):
+                    scores, fit_times = pool.scores(params, n_train)
+                mean = scores.mean(axis=1)
+                history.extend({'rung': rung, 'resource': budget, 'candidate': i,
+                                'params': candidates[i], 'mean_test_score': -m,
+                                'std_test_score': s, 'mean_fit_time': t}
+                               for i, m, s, t in zip(alive, mean, scores.std(axis=1),
+                                                     fit_times.mean(axis=1)))
+                order = np.argsort(mean, kind='stable')
+                best, best_mae = alive[order[0]], mean[order[0]]
+                if rung == len(schedule) - 1:
+                    break
+
+                alive = [alive[k] for k in order[:max(1, int(np.ceil(len(alive) / self.factor)))]]
+                # A single survivor goes straight to the full budget.
+                rung = len(schedule) - 1 if len(alive) == 1 else rung + 1
+                if self.time_budget is not None:
+                    elapsed = time.monotonic() - started
+                    # Cost grows with the budget and the number of candidates.
+                    estimate = ((time.monotonic() - rung_started) * len(alive) / len(mean)
+                                * schedule[rung] / budget)
+                    if elapsed + estimate > self.time_budget:
+                        self.budget_exhausted_ = True
+                        break
+
+        self.cv_results_ = {name: [row[name] for row in history] for name in history[0]}
+        self.best_index_ = best
+        self.best_resource_ = budget
+        self.best_score_ = float(-best_mae)
+        self.best_params_ = dict(candidates[best])
+        if self.resource != 'n_samples':
+            self.best_params_[self.resource] = budget
+        self.elapsed_ = time.monotonic() - started
+        self._refit(X, y)
+        return self
+
+
+class EarlyStoppingSearch(ParallelGridSearch):
+    """Grid search of LightGBM / CatBoost models that fits every cell of the
+    grid without the length parameter once per fold.
+
+    The length ``resource`` (``n_estimators`` for LightGBM, ``iterations`` for
+    CatBoost, found from the estimator when not given) is taken off the
+    grid; each remaining cell is trained up to the largest length with the
+    fold's test rows as eval set, and the score of every length is read off
+    the learning curve (see :func:`learning_curve`), which is exactly the
+    score of a separate fit with that length.  A 4-value length axis costs
+    one fit instead of four, and with ``patience`` a fit stops once the MAE
+    has stopped improving for that many iterations (``None`` trains to the
+    full length).
+
+    The attributes after :meth:`fit` are those of :class:`ParallelGridSearch`,
+    over the whole grid; ``cv_results_['mean_fitted_iterations']`` is the
+    number of iterations the fits of a cell ran before stopping and
+    ``cv_results_['reached']`` whether every fold's fit reached the
+    candidate's length.  A length past an early stop is scored with the
+    plateau MAE of its curve, which is not the MAE of that length, so the best
+    candidate is chosen among the reached ones.
+    """
+
+    def __init__(self, estimator, param_grid, cv, resource=None, patience=200, n_jobs=-1,
+                 threads_per_job=1, refit=True, mp_context='spawn', cache=None):
+        super().__init__(estimator, param_grid, cv, n_jobs, threads_per_job, refit, mp_context, cache)
+        self.resource = resource
+        self.patience = patience
+
+    def _resource(self):
+        return self.resource or _curve_resource(self.estimator)
+
+    def _lengths(self, resource):
+        if resource in self.param_grid:
+            return sorted(set(self.param_grid[resource]))
+        length = self.estimator.get_params()[resource]
+        if length is None:
+            raise ValueError(f'put {resource} in the grid or set it on the estimator')
+        return [length]
+
+    def fit(self, X, y):
+        resource = self._resource()
+        lengths = self._lengths(resource)
+        grid = {name: values for name, values in self.param_grid.items() if name != resource}
+        cells = list(ParameterGrid(grid))
+        candidates = self.candidates()
+        with self._stage('early_stopping_search', X, len(candidates)):
+            X_values, y_values, folds = self._split(X, y)
+            with self._fit_pool(X_values, y_values, folds, len(cells) * len(folds)) as pool:
+                scores, fit_times, reached, iterations = pool.curve_scores(
+                    cells, resource, lengths, self.patience)
+
+            cell_index = {tuple(sorted(cell.items())): i for i, cell in enumerate(cells)}
+            rows = np.empty(len(candidates), dtype=np.intp)
+            columns = np.empty(len(candidates), dtype=np.intp)
+            for c, params in enumerate(candidates):
+                cell = {name: value for name, value in params.items() if name != resource}
+                rows[c] = cell_index[tuple(sorted(cell.items()))]
+                columns[c] = lengths.index(params.get(resource, lengths[0]))
+            self._store_results(candidates, scores[rows, columns], fit_times[rows, columns])
+            self._choose_reached(candidates, reached[rows, columns].all(axis=1))
+            self.cv_results_['mean_fitted_iterations'] = iterations[rows].mean(axis=1)
+            self._refit(X, y)
+        return self
+
+    def _choose_reached(self, candidates, reached):
+        """Pick the best candidate among those every fold's fit reached: past
+        an early stop the score is that of the plateau, not of the length."""
+        self.cv_results_['reached'] = reached
+        if reached.all() or not reached.any():
+            return
+        mae = np.where(reached, -self.cv_results_['mean_test_score'], np.inf)
+        self.best_index_ = int(mae.argmin())
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = float(-mae[self.best_index_])
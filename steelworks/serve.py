@@ -0,0 +1,219 @@
+"""Local prediction service for the final temperature (``Температура_y``).
+
+The model is loaded once.  Requests are served over HTTP on a TCP port or on a
+Unix socket::
+
+    python -m steelworks.serve --model models/catboost.cbm --port 8765
+    python -m steelworks.serve --model models/lgbm.pkl --unix-socket /run/steel.sock
+
+``POST /predict`` takes a JSON body with either one heat, ``{"features": ...}``,
+or a batch, ``{"instances": [...]}``.  A heat is a list of values in
+:data:`steelworks.columns.FEATURE_COLUMNS` order or an object keyed by those
+column names.  The answer is ``{"predictions": [...]}``; a malformed or empty
+request gets a 400 and a failing model a 500, both with ``{"error": ...}``.
+
+Concurrent requests are micro-batched into a single ``predict`` call by
+:class:`MicroBatcher`: everything that queued up while the previous batch was
+being predicted goes into the next one, optionally waiting up to
+``max_delay`` seconds for more.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .columns import FEATURE_COLUMNS
+from .models import load_model, predictor
+
+
+class MicroBatcher:
+    """Collects feature rows from many threads and predicts them together.
+
+    A batch takes every request already queued, waits at most ``max_delay``
+    seconds after its first row for more, and never exceeds ``max_batch``
+    rows.  With the default ``max_delay=0`` an idle service adds no delay,
+    while under load requests that arrive during a ``predict`` call are
+    batched into the next one.
+    """
+
+    def __init__(self, model, max_delay=0.0, max_batch=1024):
+        self.model = model
+        self._predict = predictor(model)
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        """Queue a 2-D array of rows; returns a Future of their predictions."""
+        future = Future()
+        self._queue.put((rows, future))
+        return future
+
+    def predict(self, rows, timeout=None):
+        return self.submit(rows).result(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        batch, size = [first], len(first[0])
+        deadline = time.monotonic() + self.max_delay
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Leave the stop marker for _run once this batch is done.
+                self._queue.put(None)
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            rows = np.concatenate([item[0] for item in batch]) if len(batch) > 1 else batch[0][0]
+            try:
+                predictions = np.asarray(self._predict(rows), dtype=np.float64)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for item_rows, future in batch:
+                future.set_result(predictions[start:start + len(item_rows)])
+                start += len(item_rows)
+
+
+def parse_rows(payload, columns=FEATURE_COLUMNS):
+    """Turn a request body into a 2-D float array in ``columns`` order."""
+    if 'instances' in payload:
+        instances = payload['instances']
+    elif 'features' in payload:
+        instances = [payload['features']]
+    else:
+        raise ValueError('expected "features" or "instances"')
+    if not instances:
+        raise ValueError('no instances to predict')
+
+    rows = np.empty((len(instances), len(columns)), dtype=np.float64)
+    for i, instance in enumerate(instances):
+        if isinstance(instance, dict):
+            missing = [c for c in columns if c not in instance]
+            if missing:
+                raise ValueError(f'missing features: {missing}')
+            instance = [instance[c] for c in columns]
+        if len(instance) != len(columns):
+            raise ValueError(f'expected {len(columns)} features, got {len(instance)}')
+        rows[i] = instance
+    return rows
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Small JSON answers on kept-alive connections must not wait for Nagle.
+    disable_nagle_algorithm = True
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok', 'features': FEATURE_COLUMNS})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            rows = parse_rows(json.loads(self.rfile.read(length)))
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        try:
+            predictions = self.server.batcher.predict(rows)
+        except Exception as e:
+            self._send(500, {'error': f'{type(e).__name__}: {e}'})
+            return
+        self._send(200, {'predictions': predictions.tolist()})
+
+    def address_string(self):
+        # Unix-socket clients have no (host, port) address.
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class UnixPredictionHandler(PredictionHandler):
+    disable_nagle_algorithm = False  # TCP_NODELAY does not exist for Unix sockets
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(batcher, port=None, host='127.0.0.1', unix_socket=None, verbose=False):
+    """HTTP server on ``host:port`` or on the Unix socket ``unix_socket``."""
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = UnixHTTPServer(unix_socket, UnixPredictionHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), PredictionHandler)
+    server.batcher = batcher
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', required=True, help='.cbm CatBoost model or pickled model')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', help='serve on this Unix socket instead of TCP')
+    parser.add_argument('--max-delay-ms', type=float, default=0.0,
+                        help='how long a batch may wait for more requests')
+    parser.add_argument('--max-batch', type=int, default=1024)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    batcher = MicroBatcher(load_model(args.model), args.max_delay_ms / 1000, args.max_batch)
+    server = make_server(batcher, args.port, args.host, args.unix_socket, args.verbose)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,453 @@
+"""Streaming statistics of the monitored quantities, per time window.
+
+The notebook looks at its distributions with ``.describe()`` and
+``.plot.box()`` over whole columns - first and last temperature, heat
+duration (``diff_time``), summed arc time per heat, the active / reactive
+``proportion`` of every arc and ``Реактивная мощность`` - and every call
+scans the data again.  Here every quantity has a sketch per time window
+instead:
+
+* :class:`RunningMoments` - count, mean, variance (Welford), min and max;
+* :class:`TDigest` - quantiles with a bounded number of centroids.  Values
+  go into a buffer that is merged into the centroids when it is full, so an
+  update costs O(1) amortized and the sketch stays small;
+* :class:`FeatureSketch` - both of them, with :meth:`FeatureSketch.describe`
+  (the rows of ``Series.describe()``) and :meth:`FeatureSketch.box` (the
+  statistics ``Axes.bxp`` draws a box plot from).
+
+All three merge: the sketch of two sets of values is the merge of their
+sketches.  :class:`SketchMonitor` keeps one sketch per quantity and window
+(``window`` wide, aligned to the epoch) and answers for any range of windows
+by merging them; monitors built on different data merge the same way.
+
+:class:`HeatMonitor` feeds a monitor from live events, like
+:class:`steelworks.online.FeatureEngine`: arc quantities are added at every
+arc, per-heat quantities when the heat is closed, in the window of the
+heat's last event.  :func:`table_sketches` builds the same monitor from the
+tables at once, and :func:`history_sketches` from the key partitions of
+:mod:`steelworks.partition` on a process pool, merging the partitions'
+monitors.
+
+NaN and infinite values are skipped, as ``describe`` skips NaN.  Count,
+mean, std, min and max are exact; quantiles are approximate: at the default
+compression within about 5e-4 of the requested rank for values added in
+arrays or merged, 2e-3 for values streamed one by one.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+
+COMPRESSION = 200
+WINDOW = '1D'
+
+ARC_START = 'Начало нагрева дугой'
+ARC_END = 'Конец нагрева дугой'
+ACTIVE_POWER = 'Активная мощность'
+REACTIVE_POWER = 'Реактивная мощность'
+
+# Quantities of every arc and of every heat.
+ARC_METRICS = ['proportion', REACTIVE_POWER]
+HEAT_METRICS = ['first_temp', 'last_temp', 'diff_time', 'arc_seconds']
+
+DESCRIBE_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+def _finite(values):
+    values = np.asarray(values, dtype=np.float64).ravel()
+    return values[np.isfinite(values)]
+
+
+class RunningMoments:
+    """Count, mean, sum of squared deviations, min and max of a stream."""
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def _combine(self, count, mean, m2, low, high):
+        # Chan et al.: moments of the union of two sets from theirs.
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def update_many(self, values):
+        if len(values):
+            mean = float(values.mean())
+            self._combine(len(values), mean, float(((values - mean) ** 2).sum()),
+                          float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    @property
+    def var(self):
+        """Sample variance (``ddof=1``, like pandas)."""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+
+class TDigest:
+    """Quantile sketch of a stream (Dunning's merging t-digest).
+
+    Centroids are formed with the arcsine scale function: a centroid may
+    only hold the values of a narrow quantile range near 0 and 1 and of a
+    wide one near the median, so there are about ``compression / 2`` of
+    them whatever the length of the stream.
+    """
+
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = []
+        self._buffer_size = 5 * compression
+
+    @property
+    def count(self):
+        return float(self.weights.sum()) + len(self._buffer)
+
+    def update(self, value):
+        self._buffer.append(value)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self._buffer) >= self._buffer_size:
+            self._compress()
+
+    def update_many(self, values):
+        if len(values):
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._compress(values, np.ones(len(values)))
+
+    def merge(self, *others):
+        """Add the centroids of ``others``, compressing once for all of them."""
+        if not others:
+            return self
+        for other in others:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            other._compress()
+        self._compress(np.concatenate([other.means for other in others]),
+                       np.concatenate([other.weights for other in others]))
+        return self
+
+    def _compress(self, means=None, weights=None):
+        if means is None and not self._buffer:
+            return
+        parts = [self.means, np.asarray(self._buffer, dtype=np.float64)]
+        weight_parts = [self.weights, np.ones(len(self._buffer))]
+        if means is not None:
+            parts.append(means)
+            weight_parts.append(weights)
+        self._buffer = []
+        means, weights = np.concatenate(parts), np.concatenate(weight_parts)
+        if not len(means):
+            return
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        middle = (cumulative - weights / 2) / cumulative[-1]
+        # k(q) = compression / (2 pi) * asin(2q - 1): one unit of k per centroid.
+        k = self.compression / (2 * math.pi) * np.arcsin(np.clip(2 * middle - 1, -1, 1))
+        _, cluster = np.unique(np.floor(k), return_inverse=True)
+        self.weights = np.bincount(cluster, weights)
+        self.means = np.bincount(cluster, weights * means) / self.weights
+
+    def quantile(self, q):
+        """Estimated quantile(s) ``q`` in [0, 1]; NaN for an empty digest."""
+        self._compress()
+        if not len(self.means):
+            return np.full(np.shape(q), math.nan) if np.ndim(q) else math.nan
+        cumulative = np.cumsum(self.weights)
+        positions = (cumulative - self.weights / 2) / cumulative[-1]
+        result = np.interp(q, np.r_[0.0, positions, 1.0], np.r_[self.min, self.means, self.max])
+        return result if np.ndim(q) else float(result)
+
+
+class FeatureSketch:
+    """:class:`RunningMoments` and :class:`TDigest` of one quantity."""
+
+    def __init__(self, compression=COMPRESSION):
+        self.moments = RunningMoments()
+        self.digest = TDigest(compression)
+
+    def update(self, value):
+        if math.isfinite(value):
+            self.moments.update(value)
+            self.digest.update(value)
+
+    def update_many(self, values):
+        values = _finite(values)
+        self.moments.update_many(values)
+        self.digest.update_many(values)
+
+    def merge(self, *others):
+        for other in others:
+            self.moments.merge(other.moments)
+        self.digest.merge(*(other.digest for other in others))
+        return self
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    def quantile(self, q):
+        return self.digest.quantile(q)
+
+    def describe(self, name=None):
+        """Like ``Series.describe()`` of the values seen."""
+        m = self.moments
+        if m.count == 0:
+            values = [0, math.nan, math.nan, math.nan, math.nan, math.nan, math.nan, math.nan]
+        else:
+            q1, median, q3 = self.digest.quantile([0.25, 0.5, 0.75])
+            values = [m.count, m.mean, m.std, m.min, q1, median, q3, m.max]
+        return pd.Series(values, index=DESCRIBE_INDEX, name=name, dtype=np.float64)
+
+    def box(self, label=None, whis=1.5):
+        """Box-plot statistics for ``Axes.bxp``: quartiles and whiskers at
+        ``whis`` times the interquartile range, cut to the min and max seen.
+        The sketch keeps no outliers, so ``fliers`` is empty."""
+        q1, median, q3 = self.digest.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        stats = {'med': median, 'q1': q1, 'q3': q3, 'mean': self.moments.mean,
+                 'whislo': max(self.moments.min, q1 - whis * iqr),
+                 'whishi': min(self.moments.max, q3 + whis * iqr), 'fliers': []}
+        if label is not None:
+            stats['label'] = label
+        return stats
+
+
+def _window_start(time, window_ns):
+    return pd.Timestamp(time).value // window_ns * window_ns
+
+
+class SketchMonitor:
+    """One :class:`FeatureSketch` per quantity and time window."""
+
+    def __init__(self, window=WINDOW, compression=COMPRESSION):
+        self.window = pd.Timedelta(window)
+        self.compression = compression
+        self._window_ns = self.window.value
+        self._sketches = {}
+
+    def _sketch(self, metric, window):
+        sketch = self._sketches.get((metric, window))
+        if sketch is None:
+            sketch = self._sketches[metric, window] = FeatureSketch(self.compression)
+        return sketch
+
+    def add(self, metric, time, value):
+        """Add one value of ``metric`` observed at ``time``."""
+        self._sketch(metric, _window_start(time, self._window_ns)).update(value)
+
+    def add_many(self, metric, times, values):
+        """Add arrays of values and of their times (datetime64)."""
+        times = np.asarray(times, dtype='datetime64[ns]').astype(np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        windows = times // self._window_ns * self._window_ns
+        order = np.argsort(windows, kind='stable')
+        windows, values = windows[order], values[order]
+        starts = np.flatnonzero(np.r_[True, windows[1:] != windows[:-1]]) if len(windows) else []
+        for start, end in zip(starts, [*starts[1:], len(windows)]):
+            self._sketch(metric, int(windows[start])).update_many(values[start:end])
+
+    def merge(self, other):
+        """Add the sketches of ``other`` (same window) to this monitor."""
+        if other.window != self.window:
+            raise ValueError(f'cannot merge {other.window} windows into {self.window} windows')
+        for (metric, window), sketch in other._sketches.items():
+            self._sketch(metric, window).merge(sketch)
+        return self
+
+    @property
+    def metrics(self):
+        return sorted({metric for metric, _ in self._sketches})
+
+    def _windows(self, metric, start=None, end=None):
+        start = -math.inf if start is None else pd.Timestamp(start).value
+        end = math.inf if end is None else pd.Timestamp(end).value
+        return sorted((window, sketch) for (name, window), sketch in self._sketches.items()
+                      if name == metric and start <= window < end)
+
+    def sketch(self, metric, start=None, end=None):
+        """Merged sketch of ``metric`` over the windows starting in
+        [``start``, ``end``) (default: all of them)."""
+        return FeatureSketch(self.compression).merge(
+            *(sketch for _, sketch in self._windows(metric, start, end)))
+
+    def describe(self, metrics=None, start=None, end=None):
+        """``describe()`` of every metric, one column each, like
+        ``DataFrame.describe()``."""
+        metrics = self.metrics if metrics is None else metrics
+        return pd.concat([self.sketch(metric, start, end).describe(metric) for metric in metrics],
+                         axis=1)
+
+    def box(self, metric, start=None, end=None):
+        return self.sketch(metric, start, end).box(label=metric)
+
+    def windows(self, metric):
+        """``describe()`` of ``metric`` per window, indexed by window start."""
+        rows = self._windows(metric)
+        return pd.DataFrame([sketch.describe() for _, sketch in rows],
+                            index=pd.DatetimeIndex([window for window, _ in rows], name='window'),
+                            columns=DESCRIBE_INDEX)
+
+
+class _OpenHeat:
+    __slots__ = ('first_time', 'first_temp', 'last_time', 'last_temp', 'arc_seconds', 'end')
+
+    def __init__(self):
+        self.first_time = self.last_time = self.end = None
+        self.first_temp = self.last_temp = math.nan
+        self.arc_seconds = 0.0
+
+
+class HeatMonitor(SketchMonitor):
+    """A :class:`SketchMonitor` fed with live arc and temperature events."""
+
+    def __init__(self, window=WINDOW, compression=COMPRESSION):
+        super().__init__(window, compression)
+        self._heats = {}
+
+    def _heat(self, key, time):
+        heat = self._heats.get(key)
+        if heat is None:
+            heat = self._heats[key] = _OpenHeat()
+        if heat.end is None or time > heat.end:
+            heat.end = time
+        return heat
+
+    def add_arc(self, key, start, end, active_power, reactive_power):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        heat = self._heat(key, end)
+        heat.arc_seconds += (end - start).total_seconds()
+        window = _window_start(start, self._window_ns)
+        if reactive_power != 0:
+            self._sketch('proportion', window).update(active_power / reactive_power)
+        self._sketch(REACTIVE_POWER, window).update(reactive_power)
+
+    def add_temperature(self, key, time, temperature):
+        """Record a measurement; measurements may arrive out of order."""
+        time = pd.Timestamp(time)
+        heat = self._heat(key, time)
+        if heat.first_time is None or time < heat.first_time:
+            heat.first_time, heat.first_temp = time, temperature
+        if heat.last_time is None or time > heat.last_time:
+            heat.last_time, heat.last_temp = time, temperature
+
+    def update(self, table, row):
+        """Apply one row (a mapping) of ``data_arc`` or ``data_temp``; rows of
+        the other tables are ignored."""
+        if table == 'data_arc':
+            self.add_arc(row['key'], row[ARC_START], row[ARC_END], row[ACTIVE_POWER],
+                         row[REACTIVE_POWER])
+        elif table == 'data_temp':
+            self.add_temperature(row['key'], row['Время замера'], row['Температура'])
+
+    def __contains__(self, key):
+        return key in self._heats
+
+    def close(self, key):
+        """Add the per-heat quantities of heat ``key`` and forget it."""
+        heat = self._heats.pop(key)
+        window = _window_start(heat.end, self._window_ns)
+        if heat.first_time is not None:
+            self._sketch('first_temp', window).update(heat.first_temp)
+            self._sketch('last_temp', window).update(heat.last_temp)
+            self._sketch('diff_time', window).update(
+                (heat.last_time - heat.first_time).total_seconds())
+        self._sketch('arc_seconds', window).update(heat.arc_seconds)
+
+
+def table_sketches(tables, window=WINDOW, compression=COMPRESSION):
+    """:class:`SketchMonitor` of the arcs and of the heats of ``tables``
+    (``data_arc`` and ``data_temp``), as if every heat had been streamed
+    through a :class:`HeatMonitor` and closed."""
+    from .summary import HeatSummary
+
+    monitor = SketchMonitor(window, compression)
+    arcs = tables['data_arc']
+    reactive = arcs[REACTIVE_POWER].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        proportion = arcs[ACTIVE_POWER].to_numpy(dtype=np.float64) / reactive
+    monitor.add_many('proportion', arcs[ARC_START], proportion)
+    monitor.add_many(REACTIVE_POWER, arcs[ARC_START], reactive)
+
+    heats = HeatSummary.from_measurements(tables['data_temp']).frame
+    arc_heats = (arcs.assign(seconds=(arcs[ARC_END] - arcs[ARC_START]).dt.total_seconds())
+                 .groupby('key').agg(arc_seconds=('seconds', 'sum'), end=(ARC_END, 'max')))
+    per_heat = heats.join(arc_heats, how='outer')
+    if per_heat.empty:
+        return monitor
+    # A heat ends with its last event, arc or measurement.
+    end = per_heat[['last_time', 'end']].max(axis=1)
+    measured = per_heat['first_time'].notna()
+    for metric in ('first_temp', 'last_temp'):
+        monitor.add_many(metric, end[measured], per_heat.loc[measured, metric])
+    monitor.add_many('diff_time', end[measured],
+                     (per_heat['last_time'] - per_heat['first_time'])[measured].dt.total_seconds())
+    monitor.add_many('arc_seconds', end, per_heat['arc_seconds'].fillna(0.0))
+    return monitor
+
+
+def _partition_sketches(task):
+    from .partition import load_partition
+
+    partition, data_dir, out_dir, window, compression = task
+    return table_sketches(load_partition(partition, data_dir, out_dir), window, compression)
+
+
+def history_sketches(data_dir=None, out_dir=None, window=WINDOW, compression=COMPRESSION,
+                     n_jobs=1, mp_context='spawn'):
+    """Merged :func:`table_sketches` of every key partition of the history,
+    computed on ``n_jobs`` processes (``-1`` uses every core)."""
+    from .io import DATA_DIR
+    from .parallel import effective_n_jobs
+    from .partition import _pool, write_partitions
+
+    data_dir = DATA_DIR if data_dir is None else data_dir
+    partitions = write_partitions(data_dir, out_dir, n_jobs=n_jobs, mp_context=mp_context)
+    tasks = [(partition, data_dir, out_dir, window, compression) for partition in partitions]
+    monitor = SketchMonitor(window, compression)
+    n_jobs = min(effective_n_jobs(n_jobs), len(tasks))
+    if n_jobs <= 1:
+        for part in map(_partition_sketches, tasks):
+            monitor.merge(part)
+        return monitor
+    with _pool(n_jobs, mp_context) as pool:
+        for part in pool.imap_unordered(_partition_sketches, tasks):
+            monitor.merge(part)
+    return monitor
@@ -0,0 +1,105 @@
+"""Per-heat summary of the temperature measurements.
+
+The notebook used to select the first and the last measurement of every heat
+with ``groupby('key')['Время замера'].idxmin()`` / ``idxmax()`` again for
+every plot, filter and merge.  :class:`HeatSummary` computes all of that once,
+with a single sort and a single pass over ``data_temp``.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .trace import stage
+
+
+KEY = 'key'
+TIME = 'Время замера'
+TEMPERATURE = 'Температура'
+
+SUMMARY_COLUMNS = ['first_time', 'last_time', 'first_temp', 'last_temp',
+                   'n_measurements', 'n_missing']
+
+
+class HeatSummary:
+    """First/last measurement time and temperature, measurement count and
+    NaN count of every heat, indexed by ``key`` in ascending order.
+
+    The first and last rows are picked exactly like ``idxmin`` / ``idxmax``
+    of the measurement time: on equal times the earlier row of the source
+    table wins.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    @classmethod
+    def from_measurements(cls, temperature_data):
+        with stage('heat_summary', rows_in=len(temperature_data)) as span:
+            heats = cls._from_measurements(temperature_data)
+            span.rows_out = len(heats.frame)
+        return heats
+
+    @classmethod
+    def _from_measurements(cls, temperature_data):
+        keys = temperature_data[KEY].to_numpy()
+        times = temperature_data[TIME].to_numpy()
+        temps = temperature_data[TEMPERATURE].to_numpy()
+        n = len(keys)
+        if n == 0:
+            # Same dtypes as below, so that e.g. duration_seconds() works.
+            counts = np.empty(0, dtype=np.int32)
+            empty = pd.DataFrame({'first_time': times, 'last_time': times, 'first_temp': temps,
+                                  'last_temp': temps, 'n_measurements': counts,
+                                  'n_missing': counts}, index=pd.Index(keys, name=KEY))
+            return cls(empty)
+
+        # lexsort is stable, so rows with the same key and time keep their
+        # original order and the first of them is the idxmin/idxmax row.
+        order = np.lexsort((times, keys))
+        keys, times, temps = keys[order], times[order], temps[order]
+
+        new_key = np.r_[True, keys[1:] != keys[:-1]]
+        group_start = np.flatnonzero(new_key)
+        counts = np.diff(np.r_[group_start, n])
+
+        # The last measurement is the start of the last run of equal times
+        # inside the group.
+        run_start = new_key | np.r_[True, times[1:] != times[:-1]]
+        last = np.maximum.reduceat(np.where(run_start, np.arange(n), 0), group_start)
+        missing = np.add.reduceat(np.isnan(temps).astype(np.int64), group_start)
+
+        frame = pd.DataFrame({
+            'first_time': times[group_start],
+            'last_time': times[last],
+            'first_temp': temps[group_start],
+            'last_temp': temps[last],
+            'n_measurements': counts.astype(np.int32),
+            'n_missing': missing.astype(np.int32),
+        }, index=pd.Index(keys[group_start], name=KEY))
+        return cls(frame)
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def keys(self):
+        return self.frame.index
+
+    def subset(self, keys):
+        """Summary restricted to ``keys`` (no rescan of the measurements)."""
+        return HeatSummary(self.frame[self.frame.index.isin(keys)])
+
+    def duration_seconds(self):
+        """Seconds between the first and the last measurement of each heat."""
+        return (self.frame['last_time'] - self.frame['first_time']).dt.total_seconds()
+
+    def temperature_gain(self):
+        """Last minus first temperature of each heat."""
+        return self.frame['last_temp'] - self.frame['first_temp']
+
+    def temperature_columns(self):
+        """``key``, first (``Температура_x``) and last (``Температура_y``)
+        temperature in the layout used by the training table."""
+        return (self.frame[['first_temp', 'last_temp']]
+                .rename(columns={'first_temp': 'Температура_x', 'last_temp': 'Температура_y'})
+                .reset_index())
@@ -0,0 +1,198 @@
+"""Synthetic ``final_steel`` tables of any size.
+
+:func:`generate_tables` builds the seven tables for ``n_heats`` heats with the
+shapes and rough statistics of the real data (about 3 200 heats):
+
+* several arc sessions per heat (1-16, about 4.6 on average) with gamma
+  distributed active power and a reactive power of 60-90 % of it;
+* about five temperature measurements per heat; the first one is taken before
+  the first arc session, the others after arc sessions, and the temperature
+  follows the arc energy, the heat duration and the added materials;
+* sparse Bulk 1-15 / Wire 1-9 volumes: every material is added to a heat with
+  its own probability, taken from the non-null counts of the real tables, so
+  most heats get one to four materials;
+* the anomalies the notebook filters: heats whose measurements after the
+  first one are all NaN, heats with neither bulk nor wire additions, heats
+  missing from only one of the material tables, negative reactive power,
+  implausibly cold first measurements, unusually long heats and gaps in the
+  key sequence.
+
+The tables carry the dtypes of :mod:`steelworks.schema`, so they can be used
+directly in place of :func:`steelworks.io.load_tables`, or written as CSV with
+:func:`write_tables` to exercise the loading step as well.  Everything is
+vectorized; 1M heats take well under a minute to generate.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .schema import BULK_COLUMNS, DATETIME, SCHEMAS, TIME_FORMAT, WIRE_COLUMNS
+
+
+START_TIME = pd.Timestamp('2019-05-03 11:02:14')
+
+# Probability that a heat gets the material, from the non-null counts of the
+# real data_bulk (3 129 heats) and data_wire (3 081 heats).
+BULK_PROBABILITY = np.array([252, 22, 1298, 1014, 77, 576, 25, 1, 19, 176, 177,
+                             2450, 18, 2806, 2248]) / 3129
+WIRE_PROBABILITY = np.array([3055, 1079, 63, 14, 1, 73, 11, 19, 29]) / 3081
+BULK_MEAN_VOLUME = np.array([39, 253, 113, 104, 107, 119, 305, 49, 76, 83, 76,
+                             260, 181, 171, 160], dtype=np.float64)
+WIRE_MEAN_VOLUME = np.array([100, 50, 189, 57, 15, 48, 10, 53, 34], dtype=np.float64)
+
+# Anomalies, as a fraction of the heats.
+NAN_TAIL_FRACTION = 0.23
+NO_ADDITIONS_FRACTION = 0.002
+NO_BULK_FRACTION = 0.025
+NO_WIRE_FRACTION = 0.04
+COLD_START_FRACTION = 0.001
+LONG_HEAT_FRACTION = 0.01
+NEGATIVE_POWER_FRACTION = 0.0002
+KEY_GAP_FRACTION = 0.005
+
+NEGATIVE_REACTIVE_POWER = -715.479924
+
+
+def _position_in_group(counts):
+    """0, 1, ... inside every group of ``counts`` consecutive rows."""
+    starts = np.cumsum(counts) - counts
+    return np.arange(counts.sum()) - np.repeat(starts, counts)
+
+
+def _group_cumsum(values, counts):
+    """Cumulative sum of ``values`` restarting at every group."""
+    total = np.cumsum(values)
+    starts = np.cumsum(counts) - counts
+    return total - np.repeat(total[starts] - values[starts], counts)
+
+
+def _seconds(values):
+    return values.astype('timedelta64[s]')
+
+
+def _materials(rng, probability, mean_volume, n_heats, start, span):
+    """Volume and time matrices of one material table (NaN / NaT where the
+    material was not added)."""
+    added = rng.random((n_heats, len(probability))) < probability
+    # Every heat in the material tables has at least one material.
+    empty = ~added.any(axis=1)
+    added[empty, np.argmax(probability)] = True
+    volume = np.round(rng.gamma(2.0, mean_volume / 2.0, added.shape)) + 1
+    volume[~added] = np.nan
+    offset = _seconds(rng.random(added.shape) * span[:, None])
+    times = start[:, None] + offset
+    times[~added] = np.datetime64('NaT')
+    return volume, times, added
+
+
+def _table(name, columns):
+    schema = SCHEMAS[name]
+    return pd.DataFrame({c: columns[c] if kind == DATETIME else pd.array(columns[c], dtype=kind)
+                         for c, kind in schema.items()})
+
+
+def generate_tables(n_heats, seed=0):
+    """The seven tables for ``n_heats`` heats, keyed by table name."""
+    rng = np.random.default_rng(seed)
+    keys = np.arange(1, n_heats + 1) + np.cumsum(rng.random(n_heats) < KEY_GAP_FRACTION)
+
+    # Arc sessions: a pause before every session, then the session itself.
+    n_arc = np.clip(1 + rng.poisson(3.6, n_heats), 1, 16)
+    arc_key = np.repeat(keys, n_arc)
+    n_rows = len(arc_key)
+    long_heat = rng.random(n_heats) < LONG_HEAT_FRACTION
+    pause = rng.gamma(2.0, 100.0, n_rows) + 30
+    pause += np.repeat(np.where(long_heat, 4000.0 / n_arc, 0.0), n_arc)
+    duration = np.clip(np.round(rng.gamma(3.0, 57.0, n_rows)), 11, 907)
+    end_offset = _group_cumsum(pause + duration, n_arc)
+    begin_offset = end_offset - duration
+
+    last_row = np.cumsum(n_arc) - 1
+    span = end_offset[last_row] + 120
+    gaps = np.r_[0.0, span[:-1]] + rng.gamma(2.0, 300.0, n_heats)
+    start = np.datetime64(START_TIME, 's') + _seconds(np.cumsum(gaps))
+    heat_start = np.repeat(start, n_arc)
+
+    active = np.clip(rng.gamma(3.0, 0.22, n_rows), 0.03, 3.8)
+    reactive = active * rng.uniform(0.6, 0.9, n_rows)
+    negative = rng.random(n_heats) < NEGATIVE_POWER_FRACTION
+    reactive[np.cumsum(n_arc)[negative] - 1] = NEGATIVE_REACTIVE_POWER
+    energy = np.sqrt(active ** 2 + reactive ** 2) * duration
+
+    # Which heats appear in which material table.
+    coverage = rng.random(n_heats)
+    no_additions = coverage < NO_ADDITIONS_FRACTION
+    no_bulk = no_additions | (coverage > 1 - NO_BULK_FRACTION)
+    no_wire = no_additions | ((coverage >= NO_ADDITIONS_FRACTION)
+                              & (coverage < NO_ADDITIONS_FRACTION + NO_WIRE_FRACTION))
+    bulk, bulk_time, bulk_added = _materials(rng, BULK_PROBABILITY, BULK_MEAN_VOLUME,
+                                             n_heats, start, span)
+    wire, wire_time, wire_added = _materials(rng, WIRE_PROBABILITY, WIRE_MEAN_VOLUME,
+                                             n_heats, start, span)
+    added_volume = (np.where(bulk_added, bulk, 0).sum(axis=1) * ~no_bulk
+                    + np.where(wire_added, wire, 0).sum(axis=1) * ~no_wire)
+
+    # Temperature: one measurement at the start of the heat, then one after
+    # most arc sessions and always one after the last session.
+    measured = rng.random(n_rows) < 0.85
+    measured[last_row] = True
+    n_temp = 1 + np.add.reduceat(measured, np.cumsum(n_arc) - n_arc)
+    first_temp = rng.normal(1587.0, 20.0, n_heats)
+    cold = rng.random(n_heats) < COLD_START_FRACTION
+    first_temp[cold] = rng.uniform(1190.0, 1230.0, cold.sum())
+
+    # Rows after the first follow the measured arc sessions in order.
+    temp_heat = np.repeat(np.arange(n_heats), n_temp)
+    first_row = _position_in_group(n_temp) == 0
+    heat = temp_heat[~first_row]
+    elapsed = end_offset[measured]
+    temperature = first_temp[temp_heat]
+    temperature[~first_row] += (0.1 * _group_cumsum(energy, n_arc)[measured]
+                                - 0.025 * elapsed
+                                - 0.02 * elapsed / span[heat] * added_volume[heat]
+                                + rng.normal(0.0, 6.0, len(heat)))
+    temperature = np.round(temperature)
+    temp_offset = np.zeros(len(temp_heat))
+    temp_offset[~first_row] = elapsed + rng.gamma(2.0, 15.0, len(heat))
+    nan_tail = rng.random(n_heats) < NAN_TAIL_FRACTION
+    temperature[nan_tail[temp_heat] & ~first_row] = np.nan
+    temp_time = np.repeat(start, n_temp) + _seconds(temp_offset)
+
+    arc_begin = heat_start + _seconds(begin_offset)
+    tables = {
+        'data_arc': _table('data_arc', {
+            'key': arc_key,
+            'Начало нагрева дугой': arc_begin,
+            'Конец нагрева дугой': arc_begin + _seconds(duration),
+            'Активная мощность': active,
+            'Реактивная мощность': reactive,
+        }),
+        'data_temp': _table('data_temp', {
+            'key': keys[temp_heat],
+            'Время замера': temp_time,
+            'Температура': temperature,
+        }),
+        'data_gas': _table('data_gas', {
+            'key': keys,
+            'Газ 1': rng.gamma(3.2, 3.45, n_heats),
+        }),
+    }
+    for name, columns, volume, times, missing in (
+            ('bulk', BULK_COLUMNS, bulk, bulk_time, no_bulk),
+            ('wire', WIRE_COLUMNS, wire, wire_time, no_wire)):
+        present = ~missing
+        tables[f'data_{name}'] = _table(f'data_{name}', {
+            'key': keys[present], **dict(zip(columns, volume[present].T))})
+        tables[f'data_{name}_time'] = _table(f'data_{name}_time', {
+            'key': keys[present], **dict(zip(columns, times[present].T))})
+    return tables
+
+
+def write_tables(tables, data_dir):
+    """Write ``tables`` as ``<data_dir>/<name>.csv`` in the source format."""
+    os.makedirs(data_dir, exist_ok=True)
+    for name, df in tables.items():
+        df.to_csv(os.path.join(data_dir, name + '.csv'), index=False,
+                  date_format=TIME_FORMAT, float_format='%.6f')
@@ -0,0 +1,329 @@
+"""Timing and memory trace of the pipeline stages.
+
+The slow steps of the pipeline (reading every table, the heat summary, the
+quality rules, the training-table merges, every search and each of its
+candidate × fold fits) are wrapped in :func:`stage`::
+
+    with stage('build_training_table', rows_in=len(heats.keys)) as span:
+        final_df = ...
+        span.rows_out = len(final_df)
+
+While tracing is off :func:`stage` returns a shared do-nothing object, which
+costs one global lookup and a function call per stage.  When it is on every
+stage records a span with
+
+* ``wall_s`` / ``cpu_s`` - wall-clock time and CPU time of the whole process
+  (CPU above wall means the stage ran on several threads);
+* ``rss_mb`` - peak resident memory above the memory at the start of the
+  stage.  The kernel's high-water mark is process-wide, so on Linux it is
+  reset at a stage start only when no stage is open in another thread
+  (nested stages pass their peak up to the enclosing ones) and
+  ``rss_exact`` is true.  Stages that overlap stages of other threads (the
+  search threads of :mod:`steelworks.scheduler`, the scoring threads of
+  :mod:`steelworks.backfill`) leave it alone and sample the resident
+  memory at their start and end: ``rss_exact`` is false and ``rss_mb`` a
+  lower bound, as it is everywhere on other systems and where the reset is
+  not allowed;
+* ``rows_in`` / ``rows_out`` and stage-specific ``args``.
+
+Turn it on for a block, a script or a notebook::
+
+    with tracing('trace.json'):
+        ...
+
+    STEELWORKS_TRACE=trace.json jupyter nbconvert --execute ...
+    python -m steelworks --trace trace.json features ...
+
+At the end ``trace.json`` holds the spans and ``trace.chrome.json`` the same
+spans as Chrome trace events, to be opened in ``chrome://tracing`` or
+Perfetto.  Search fits that run in worker processes are traced there and
+sent back with their results, so they show up under the worker's pid.
+"""
+
+import atexit
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+TRACE_ENV = 'STEELWORKS_TRACE'
+
+_CLEAR_REFS = '/proc/self/clear_refs'
+_STATUS = '/proc/self/status'
+
+
+def _status_kb(field):
+    with open(_STATUS) as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+# Stages and PeakRss blocks open in any thread; resetting the high-water
+# mark is only safe while the ones of the current thread are all there is.
+_open_lock = threading.Lock()
+_open = 0
+
+
+def _open_block(own):
+    """Count a new open block; True if the high-water mark was reset for it,
+    which happens only if the ``own`` enclosing blocks of this thread are
+    the only open ones."""
+    global _open
+    with _open_lock:
+        _open += 1
+        if _open != own + 1 or not os.path.exists(_CLEAR_REFS):
+            return False
+        # Writing 5 resets the VmHWM high-water mark to the current RSS.  It
+        # is refused in some containers and under ptrace restrictions.
+        try:
+            with open(_CLEAR_REFS, 'w') as f:
+                f.write('5')
+        except OSError:
+            return False
+        return True
+
+
+def _close_block():
+    global _open
+    with _open_lock:
+        _open -= 1
+
+
+def _current_kb(exact):
+    """High-water mark since the reset, or else a sample that is a lower
+    bound of it: the current RSS on Linux, the never-reset peak elsewhere."""
+    if exact:
+        return _status_kb('VmHWM')
+    return _status_kb('VmRSS') if os.path.exists(_STATUS) else _maxrss_kb()
+
+
+def _maxrss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak / 1024 if sys.platform == 'darwin' else peak
+
+
+class PeakRss:
+    """Peak resident memory (MiB) of a block above the memory at its start;
+    a lower bound unless ``exact`` (see ``rss_mb`` in the module docstring).
+    Measures whether tracing is on or not::
+
+        with PeakRss() as rss:
+            ...
+        rss.rss_mb
+    """
+
+    def __enter__(self):
+        self.exact = _open_block(0)
+        self._start = _current_kb(False)
+        self.rss_mb = float('nan')
+        return self
+
+    def __exit__(self, *exc):
+        peak = max(self._start, _current_kb(self.exact))
+        _close_block()
+        self.rss_mb = max(peak - self._start, 0) / 1024
+
+
+class _NullSpan:
+    """What :func:`stage` returns while tracing is off."""
+
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One running stage; set ``rows_out`` (or more ``args``) before it ends."""
+
+    def __init__(self, tracer, name, category, rows_in, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.args = args
+
+    def __enter__(self):
+        self._stack = self.tracer._stack()
+        if self._stack and self.tracer.exact_rss:
+            # The peak so far belongs to the enclosing stages, before a reset.
+            high, current = _current_kb(True), _current_kb(False)
+            for parent in self._stack:
+                parent._peak = max(parent._peak, high if parent.exact else current)
+        self.exact = _open_block(len(self._stack))
+        self._start_rss = self._peak = _current_kb(False)
+        self._stack.append(self)
+        self._cpu = time.process_time()
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        end = time.perf_counter_ns()
+        cpu = time.process_time() - self._cpu
+        peak = max(self._peak, _current_kb(self.exact))
+        _close_block()
+        self._stack.pop()
+        for parent in self._stack:
+            parent._peak = max(parent._peak, peak)
+        record = {
+            'name': self.name,
+            'category': self.category,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'depth': len(self._stack),
+            'start_ns': self._start,
+            'wall_s': (end - self._start) / 1e9,
+            'cpu_s': cpu,
+            'rss_mb': max(peak - self._start_rss, 0) / 1024,
+            'rss_exact': self.exact,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'args': self.args,
+        }
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        self.tracer.record(record)
+        return False
+
+
+class Tracer:
+    """Collects the spans of this process."""
+
+    def __init__(self):
+        self.spans = []
+        self.exact_rss = os.path.exists(_CLEAR_REFS)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def extend(self, spans):
+        with self._lock:
+            self.spans.extend(spans)
+
+    def drain(self):
+        """Remove and return the spans recorded so far."""
+        with self._lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+
+_tracer = None
+
+
+def stage(name, category='stage', rows_in=None, **args):
+    """Context manager that traces the block as a stage named ``name``."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return Span(_tracer, name, category, rows_in, args)
+
+
+def enabled():
+    return _tracer is not None
+
+
+def enable():
+    """Start tracing (a no-op if it is already on); returns the tracer."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def disable():
+    """Stop tracing; returns the spans recorded."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer.spans if tracer is not None else []
+
+
+def collect():
+    """Spans recorded since the last call, for sending them to another process."""
+    return _tracer.drain() if _tracer is not None else []
+
+
+def add_spans(spans):
+    """Add spans recorded in another process."""
+    if _tracer is not None and spans:
+        _tracer.extend(spans)
+
+
+def chrome_trace(spans):
+    """Chrome trace event document ("X" complete events, times in µs)."""
+    origin = min((span['start_ns'] for span in spans), default=0)
+    events = []
+    for span in spans:
+        args = {'cpu_s': span['cpu_s'], 'rss_mb': span['rss_mb'], 'rss_exact': span.get('rss_exact'),
+                'rows_in': span['rows_in'], 'rows_out': span['rows_out'], **span['args']}
+        events.append({'name': span['name'], 'cat': span['category'], 'ph': 'X',
+                       'ts': (span['start_ns'] - origin) / 1000, 'dur': span['wall_s'] * 1e6,
+                       'pid': span['pid'], 'tid': span['tid'], 'args': args})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def chrome_path(path):
+    root, ext = os.path.splitext(path)
+    return root + '.chrome' + (ext or '.json')
+
+
+def write_trace(spans, path, chrome=None):
+    """Write ``spans`` as JSON to ``path`` and as a Chrome trace to ``chrome``
+    (default: ``path`` with ``.chrome`` before the extension)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    spans = sorted(spans, key=lambda span: span['start_ns'])
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'spans': spans}, f, indent=1, ensure_ascii=False, default=str)
+    with open(chrome or chrome_path(path), 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(spans), f, ensure_ascii=False, default=str)
+
+
+@contextmanager
+def tracing(path=None, chrome=None):
+    """Trace the block; with ``path`` the trace is written when it ends.
+    Yields the :class:`Tracer`."""
+    was_enabled = enabled()
+    tracer = enable()
+    try:
+        yield tracer
+    finally:
+        if not was_enabled:
+            disable()
+        if path is not None:
+            write_trace(tracer.spans, path, chrome)
+
+
+def _trace_from_environment():
+    path = os.environ.get(TRACE_ENV)
+    # Worker processes inherit the variable but send their spans back instead.
+    if not path or multiprocessing.parent_process() is not None:
+        return
+    tracer = enable()
+    atexit.register(lambda: write_trace(tracer.spans, path))
+
+
+_trace_from_environment()
@@ -0,0 +1,361 @@
+"""Tree ensembles as plain NumPy arrays.
+
+:func:`export_model` turns a fitted ``DecisionTreeRegressor``,
+``RandomForestRegressor``, ``LGBMRegressor`` or ``CatBoostRegressor`` into a
+:class:`TreeEnsemble`: a handful of flat arrays and a vectorized ``predict``
+that needs nothing but NumPy.  Its predictions match the library's to within
+floating-point summation order (well below 1e-6).
+
+Two layouts are used:
+
+* ``nodes`` (scikit-learn, LightGBM): one array entry per node with feature,
+  threshold, first child (the second one follows it), the direction of
+  missing values and the leaf value.  Leaves point to themselves, so all
+  trees are walked together, one level per step, for every row of the batch;
+* ``oblivious`` (CatBoost): every level of a tree uses one split for all its
+  nodes, so the leaf index of a row is just the bits of its ``depth``
+  comparisons.  Each feature is bucketed against its sorted borders once per
+  batch and every comparison becomes an integer one.
+
+:meth:`TreeEnsemble.save` writes one file: a JSON header followed by the raw,
+64-byte aligned arrays.  :meth:`TreeEnsemble.load` memory-maps it, so loading
+costs one ``open`` and no parsing of the trees.  The exporters only read
+attributes of the fitted models; no model library is imported here.
+
+::
+
+    python -m steelworks.trees --model models/catboost.cbm --output models/catboost.trees
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+
+
+MAGIC = b'STEELTREES\x00\x01'
+ALIGNMENT = 64
+
+# Missing-value handling of a node.
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+# LightGBM treats |x| <= kZeroThreshold as zero for missing_type=Zero.
+ZERO_THRESHOLD = 1e-35
+
+# Rows x trees handled per step of the vectorized walk.
+BATCH_CELLS = 1 << 21
+
+
+class TreeEnsemble:
+    """``bias + scale * sum of the leaf values of all trees``.
+
+    ``arrays`` holds the trees in the layout named by ``kind``; ``dtype`` is
+    the precision the library compares features in (float32 for
+    scikit-learn and CatBoost, float64 for LightGBM).
+    """
+
+    def __init__(self, kind, arrays, n_features, dtype, scale=1.0, bias=0.0, source=''):
+        if kind not in ('nodes', 'oblivious'):
+            raise ValueError(f'unknown tree layout {kind!r}')
+        self.kind = kind
+        self.arrays = arrays
+        self.n_features = n_features
+        self.dtype = np.dtype(dtype)
+        self.scale = scale
+        self.bias = bias
+        self.source = source
+
+    @property
+    def n_trees(self):
+        return len(self.arrays['roots'] if self.kind == 'nodes' else self.arrays['tree_feature'])
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=self.dtype)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'expected a 2-D array with {self.n_features} columns')
+        walk = self._predict_nodes if self.kind == 'nodes' else self._predict_oblivious
+        step = max(BATCH_CELLS // max(self.n_trees, 1), 1)
+        total = np.zeros(len(X))
+        for start in range(0, len(X), step):
+            total[start:start + step] = walk(X[start:start + step])
+        return self.bias + self.scale * total
+
+    def _predict_nodes(self, X):
+        a = self.arrays
+        flat = X.ravel()
+        offsets = np.arange(0, X.size, X.shape[1])[:, None]
+        nodes = np.tile(a['roots'].astype(np.intp), (len(X), 1))
+        has_nan = np.isnan(flat).any()
+        has_zero_missing = a['zero_missing'].any()
+        # Trees are sorted by depth, so level d only walks the first active[d].
+        for active in a['active']:
+            current = nodes[:, :active]
+            x = flat.take(offsets + a['feature'].take(current))
+            left = x <= a['threshold'].take(current)
+            if has_nan:
+                left |= np.isnan(x) & a['nan_left'].take(current)
+            if has_zero_missing:
+                zero = (np.abs(x) <= ZERO_THRESHOLD) & a['zero_missing'].take(current)
+                left = np.where(zero, a['default_left'].take(current), left)
+            # The right child always follows the left one.
+            nodes[:, :active] = a['first_child'].take(current) + ~left
+        return a['value'].take(nodes).sum(axis=1)
+
+    def _predict_oblivious(self, X):
+        a = self.arrays
+        # Bucket of every value among the sorted borders of its feature: a
+        # split "x > border" is true exactly when the bucket exceeds the rank
+        # of the border.  NaN sorts after every border.
+        bucket = np.zeros((X.shape[1], len(X)), dtype=np.uint16)
+        start = a['border_start']
+        for feature in np.flatnonzero(np.diff(start)):
+            column = X[:, feature]
+            bucket[feature] = np.searchsorted(a['borders'][start[feature]:start[feature + 1]],
+                                              column)
+            if not a['nan_true'][feature]:
+                bucket[feature, np.isnan(column)] = 0
+        tree_feature, tree_rank = a['tree_feature'], a['tree_rank']
+        index = np.zeros((len(tree_feature), len(X)), dtype=np.uint16)
+        for depth in range(tree_feature.shape[1]):
+            bit = bucket[tree_feature[:, depth]] > tree_rank[:, depth, None]
+            index |= bit.astype(np.uint16) << np.uint16(depth)
+        return np.take_along_axis(a['leaf_values'], index, axis=1).sum(axis=0)
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays, offset = {}, 0
+        for name, array in self.arrays.items():
+            array = np.ascontiguousarray(array)
+            arrays[name] = [array.dtype.str, list(array.shape), offset]
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header = json.dumps({
+            'kind': self.kind, 'n_features': self.n_features, 'dtype': self.dtype.str,
+            'scale': self.scale, 'bias': self.bias, 'source': self.source, 'arrays': arrays,
+        }).encode()
+        start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+        with open(path, 'wb') as f:
+            f.write(MAGIC + len(header).to_bytes(8, 'little') + header)
+            for name, array in self.arrays.items():
+                f.seek(start + arrays[name][2])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(start + offset)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Read a file written by :meth:`save`; with ``mmap`` the arrays are
+        views of the memory-mapped file."""
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a tree ensemble file')
+            size = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(size))
+        start = -(-(len(MAGIC) + 8 + size) // ALIGNMENT) * ALIGNMENT
+        if mmap:
+            data = np.memmap(path, dtype=np.uint8, mode='r')
+        else:
+            data = np.fromfile(path, dtype=np.uint8)
+        arrays = {name: np.ndarray(tuple(shape), np.dtype(dtype), buffer=data,
+                                   offset=start + offset)
+                  for name, (dtype, shape, offset) in header['arrays'].items()}
+        return cls(header['kind'], arrays, header['n_features'], header['dtype'],
+                   header['scale'], header['bias'], header['source'])
+
+
+def _node_arrays(trees):
+    """Concatenate per-tree node arrays into the ``nodes`` layout.
+
+    Every tree is a dict of equally long arrays: feature (-1 for leaves),
+    threshold, left, right (tree-local indices), default_left, missing_type
+    and value.  Nodes are renumbered breadth first so that the two children
+    of a node are adjacent, and the trees are sorted by depth.
+    """
+    parts, depths = [], []
+    for tree in trees:
+        tree = {name: np.asarray(values) for name, values in tree.items()}
+        leaf = tree['feature'] < 0
+        order, level, depth = [0], [0], 0
+        while True:
+            level = [child for node in level if not leaf[node]
+                     for child in (tree['left'][node], tree['right'][node])]
+            if not level:
+                break
+            order.extend(level)
+            depth += 1
+        order = np.asarray(order)
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        parts.append((tree, order, position))
+        depths.append(depth)
+
+    depths = np.asarray(depths)
+    by_depth = np.argsort(-depths, kind='stable')
+    columns = {name: [] for name in ('feature', 'threshold', 'first_child', 'nan_left',
+                                     'zero_missing', 'default_left', 'value')}
+    roots, offset = [], 0
+    for t in by_depth:
+        tree, order, position = parts[t]
+        leaf = tree['feature'][order] < 0
+        missing_type = tree['missing_type'][order]
+        threshold = tree['threshold'][order].astype(np.float64)
+        default_left = tree['default_left'][order].astype(bool)
+        # A NaN is treated as zero unless the node has missing_type NaN; zero
+        # is itself missing for missing_type Zero.
+        nan_left = np.where(missing_type == MISSING_NONE, threshold >= 0, default_left)
+        # Leaves loop back to themselves: they always go "left", into themselves.
+        first_child = np.where(leaf, np.arange(len(order)),
+                               position[np.where(leaf, 0, tree['left'][order])])
+        columns['feature'].append(np.where(leaf, 0, tree['feature'][order]).astype(np.int32))
+        columns['threshold'].append(np.where(leaf, np.inf, threshold))
+        columns['first_child'].append((first_child + offset).astype(np.int32))
+        columns['nan_left'].append(nan_left | leaf)
+        columns['zero_missing'].append((missing_type == MISSING_ZERO) & ~leaf)
+        columns['default_left'].append(default_left)
+        columns['value'].append(np.where(leaf, tree['value'][order], 0.0).astype(np.float64))
+        roots.append(offset)
+        offset += len(order)
+    arrays = {name: np.concatenate(values) for name, values in columns.items()}
+    arrays['roots'] = np.asarray(roots, dtype=np.int32)
+    arrays['active'] = np.asarray([(depths > level).sum() for level in range(depths.max())],
+                                  dtype=np.int32)
+    return arrays
+
+
+def _sklearn_tree(tree):
+    t = tree.tree_
+    missing_left = getattr(t, 'missing_go_to_left', np.zeros(t.node_count, dtype=bool))
+    return {
+        'feature': np.where(t.children_left < 0, -1, t.feature),
+        'threshold': t.threshold,
+        'left': t.children_left,
+        'right': t.children_right,
+        'default_left': np.asarray(missing_left, dtype=bool),
+        'missing_type': np.full(t.node_count, MISSING_NAN),
+        'value': t.value[:, 0, 0],
+    }
+
+
+def _lightgbm_tree(structure):
+    tree = {name: [] for name in ('feature', 'threshold', 'left', 'right', 'default_left',
+                                  'missing_type', 'value')}
+    missing_types = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+
+    def add(node):
+        index = len(tree['feature'])
+        for values in tree.values():
+            values.append(0)
+        if 'leaf_value' in node:
+            tree['feature'][index] = -1
+            tree['value'][index] = node['leaf_value']
+            return index
+        if node['decision_type'] != '<=':
+            raise ValueError('categorical LightGBM splits are not supported')
+        tree['feature'][index] = node['split_feature']
+        tree['threshold'][index] = node['threshold']
+        tree['default_left'][index] = node['default_left']
+        tree['missing_type'][index] = missing_types[node['missing_type']]
+        tree['left'][index] = add(node['left_child'])
+        tree['right'][index] = add(node['right_child'])
+        return index
+
+    add(structure)
+    return tree
+
+
+def _export_lightgbm(model):
+    booster = getattr(model, 'booster_', model)
+    dump = booster.dump_model()
+    objective = dump['objective'].split()[0]
+    if objective not in ('regression', 'regression_l1', 'huber', 'fair', 'quantile'):
+        raise ValueError(f'LightGBM objective {objective!r} has an output transform')
+    trees = [_lightgbm_tree(info['tree_structure']) for info in dump['tree_info']]
+    scale = 1.0 / len(trees) if dump.get('average_output') else 1.0
+    return TreeEnsemble('nodes', _node_arrays(trees), dump['max_feature_idx'] + 1, np.float64,
+                        scale=scale, source='lightgbm')
+
+
+def _export_catboost(model):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'model.json')
+        model.save_model(path, format='json')
+        with open(path, encoding='utf-8') as f:
+            dump = json.load(f)
+    if 'oblivious_trees' not in dump:
+        raise ValueError('only symmetric (oblivious) CatBoost trees are supported')
+    float_features = dump['features_info']['float_features']
+    column = {f['feature_index']: f['flat_feature_index'] for f in float_features}
+    as_true = {f['feature_index'] for f in float_features
+               if f.get('nan_value_treatment') == 'AsTrue'}
+    trees = dump['oblivious_trees']
+    depth = max(len(tree['splits']) for tree in trees)
+    if depth > 16:
+        raise ValueError('CatBoost trees deeper than 16 are not supported')
+    n_features = max(f['flat_feature_index'] for f in float_features) + 1
+
+    borders = {}
+    for tree in trees:
+        for split in tree['splits']:
+            if split['split_type'] != 'FloatFeature':
+                raise ValueError(f'CatBoost split type {split["split_type"]} is not supported')
+            borders.setdefault(column[split['float_feature_index']], set()).add(
+                np.float32(split['border']))
+    borders = {feature: sorted(values) for feature, values in borders.items()}
+    start = np.cumsum([0] + [len(borders.get(f, ())) for f in range(n_features)])
+
+    # Shallower trees are padded with a rank no bucket can exceed.
+    tree_feature = np.zeros((len(trees), depth), dtype=np.int32)
+    tree_rank = np.full((len(trees), depth), np.iinfo(np.uint16).max, dtype=np.uint16)
+    leaf_values = np.zeros((len(trees), 2 ** depth))
+    for t, tree in enumerate(trees):
+        for d, split in enumerate(tree['splits']):
+            feature = column[split['float_feature_index']]
+            tree_feature[t, d] = feature
+            tree_rank[t, d] = borders[feature].index(np.float32(split['border']))
+        leaf_values[t, :len(tree['leaf_values'])] = tree['leaf_values']
+    nan_true = np.zeros(n_features, dtype=bool)
+    nan_true[[column[f] for f in as_true]] = True
+    arrays = {
+        'borders': np.asarray([b for f in range(n_features) for b in borders.get(f, ())],
+                              dtype=np.float32),
+        'border_start': start.astype(np.int64),
+        'nan_true': nan_true,
+        'tree_feature': tree_feature,
+        'tree_rank': tree_rank,
+        'leaf_values': leaf_values,
+    }
+    scale, bias = dump['scale_and_bias']
+    return TreeEnsemble('oblivious', arrays, n_features, np.float32, scale=scale,
+                        bias=bias[0], source='catboost')
+
+
+def export_model(model):
+    """:class:`TreeEnsemble` equivalent to the fitted ``model``."""
+    name = type(model).__name__
+    if name == 'DecisionTreeRegressor':
+        return TreeEnsemble('nodes', _node_arrays([_sklearn_tree(model)]), model.n_features_in_,
+                            np.float32, source='sklearn')
+    if name == 'RandomForestRegressor':
+        trees = [_sklearn_tree(tree) for tree in model.estimators_]
+        return TreeEnsemble('nodes', _node_arrays(trees), model.n_features_in_, np.float32,
+                            scale=1.0 / len(trees), source='sklearn')
+    if name in ('LGBMRegressor', 'Booster'):
+        return _export_lightgbm(model)
+    if name == 'CatBoostRegressor':
+        return _export_catboost(model)
+    raise TypeError(f'cannot export {name}')
+
+
+def main(argv=None):
+    from .models import load_model
+
+    parser = argparse.ArgumentParser(description='Export a tree model to a NumPy tree file.')
+    parser.add_argument('--model', required=True, help='.cbm CatBoost model or pickled model')
+    parser.add_argument('--output', required=True, help='tree file to write (.trees)')
+    args = parser.parse_args(argv)
+    export_model(load_model(args.model)).save(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import pytest
+
+from steelworks.features import build_training_table
+from steelworks.quality import accepted_keys, check_quality
+from steelworks.summary import HeatSummary
+from steelworks.synthetic import generate_tables
+
+
+@pytest.fixture(scope='session')
+def tables():
+    return generate_tables(1500, seed=0)
+
+
+@pytest.fixture(scope='session')
+def final_df(tables):
+    heats = HeatSummary.from_measurements(tables['data_temp'])
+    violations = check_quality(tables, heats)
+    return build_training_table(tables, heats, accepted_keys(violations))
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeRegressor
+
+pytest.importorskip('pyarrow')
+
+from steelworks import backfill
+from steelworks.backfill import PARTS_SUFFIX, score_table
+from steelworks.columns import FEATURE_COLUMNS, KEY, TARGET
+from steelworks.models import save_model
+
+CHUNK_ROWS = 150
+
+
+@pytest.fixture(scope='module')
+def inputs(final_df, tmp_path_factory):
+    directory = tmp_path_factory.mktemp('backfill')
+    model = DecisionTreeRegressor(max_depth=6, random_state=0)
+    model.fit(final_df[FEATURE_COLUMNS].to_numpy(), final_df[TARGET])
+    model_path = str(directory / 'model.pkl')
+    save_model(model, model_path)
+    path = str(directory / 'final.feather')
+    final_df.reset_index(drop=True).to_feather(path)
+    expected = model.predict(final_df[FEATURE_COLUMNS].to_numpy())
+    return model_path, path, expected
+
+
+@pytest.fixture()
+def predicted(monkeypatch):
+    chunks = []
+    predict_chunk = backfill._predict_chunk
+
+    def counting(predict, keys, rows):
+        chunks.append(keys[0])
+        return predict_chunk(predict, keys, rows)
+
+    monkeypatch.setattr(backfill, '_predict_chunk', counting)
+    return chunks
+
+
+def test_scores_every_row_in_order(final_df, inputs, tmp_path):
+    model_path, path, expected = inputs
+    output = str(tmp_path / 'scores.feather')
+    summary = score_table(model_path, path, output, chunk_rows=CHUNK_ROWS, threads=2)
+    scores = pd.read_feather(output)
+    assert summary['heats'] == len(final_df)
+    assert summary['chunks'] == -(-len(final_df) // CHUNK_ROWS)
+    np.testing.assert_array_equal(scores[KEY], final_df[KEY])
+    np.testing.assert_allclose(scores['prediction'], expected)
+    assert not os.path.exists(output + PARTS_SUFFIX)
+
+
+def test_an_interrupted_run_is_resumed(final_df, inputs, tmp_path, monkeypatch, predicted):
+    model_path, path, expected = inputs
+    output = str(tmp_path / 'scores.feather')
+    predict_chunk = backfill._predict_chunk
+    stop_at = final_df[KEY].iloc[4 * CHUNK_ROWS]
+
+    def failing(predict, keys, rows):
+        if keys[0] == stop_at:
+            raise RuntimeError('interrupted')
+        return predict_chunk(predict, keys, rows)
+
+    monkeypatch.setattr(backfill, '_predict_chunk', failing)
+    with pytest.raises(RuntimeError):
+        score_table(model_path, path, output, chunk_rows=CHUNK_ROWS, threads=1)
+    assert not os.path.exists(output)
+
+    predicted.clear()
+    monkeypatch.setattr(backfill, '_predict_chunk', predict_chunk)
+    summary = score_table(model_path, path, output, chunk_rows=CHUNK_ROWS, threads=1)
+    assert summary['resumed_chunks'] == 4
+    assert predicted[0] == stop_at
+    assert summary['heats'] == len(final_df) - 4 * CHUNK_ROWS
+    np.testing.assert_allclose(pd.read_feather(output)['prediction'], expected)
+
+
+def test_other_settings_start_over(inputs, tmp_path, predicted):
+    model_path, path, _ = inputs
+    output = str(tmp_path / 'scores.feather')
+    parts_dir = output + PARTS_SUFFIX
+    os.makedirs(parts_dir)
+    open(backfill._chunk_path(parts_dir, 0), 'w').close()
+    summary = score_table(model_path, path, output, chunk_rows=CHUNK_ROWS, threads=1)
+    assert summary['resumed_chunks'] == 0
+    assert len(predicted) == summary['chunks']
+
+
+def test_an_empty_input_writes_an_empty_file(final_df, inputs, tmp_path):
+    model_path, _, _ = inputs
+    path = str(tmp_path / 'empty.feather')
+    final_df.iloc[:0].reset_index(drop=True).to_feather(path)
+    output = str(tmp_path / 'scores.feather')
+    summary = score_table(model_path, path, output, chunk_rows=CHUNK_ROWS, threads=1)
+    assert summary['heats'] == summary['chunks'] == 0
+    assert len(pd.read_feather(output)) == 0
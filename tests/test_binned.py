@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from sklearn.model_selection import KFold, ParameterGrid
+
+from steelworks.binned import FoldDatasets
+from steelworks.columns import FEATURE_COLUMNS, TARGET
+from steelworks.search import fit_and_score, learning_curve
+
+lightgbm = pytest.importorskip('lightgbm')
+
+# Dataset-level parameters between default candidates; ``max_bins`` is an
+# alias FoldDatasets does not key on, so LightGBM rebuilds the Dataset.
+GRID = [{'max_depth': [3], 'max_bin': [255, 15], 'min_child_samples': [20, 5]},
+        {'max_depth': [3]}, {'max_depth': [3], 'max_bins': [15]}, {'max_depth': [3]}]
+
+
+@pytest.fixture(scope='module')
+def data(final_df):
+    X = final_df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    y = final_df[TARGET].to_numpy(dtype=np.float64)
+    return X, y, list(KFold(3).split(X))
+
+
+def test_lightgbm_scores_equal_raw_fits(data):
+    X, y, folds = data
+    estimator = lightgbm.LGBMRegressor(n_estimators=40, random_state=0, verbose=-1)
+    datasets = FoldDatasets(X, y, folds)
+    for params in ParameterGrid(GRID):
+        for fold, (train, test) in enumerate(folds):
+            mae, _ = datasets.fit_and_score(estimator, params, fold)
+            expected, _ = fit_and_score(estimator, params, X, y, train, test)
+            assert mae == pytest.approx(expected, rel=1e-9), (params, fold)
+
+
+def test_lightgbm_curves_equal_raw_fits(data):
+    X, y, folds = data
+    estimator = lightgbm.LGBMRegressor(n_estimators=20, random_state=0, verbose=-1)
+    datasets = FoldDatasets(X, y, folds)
+    train, test = folds[0]
+    for params in ParameterGrid(GRID):
+        curve, _ = datasets.learning_curve(estimator, params, 0)
+        expected, _ = fit_and_score(estimator, params, X, y, train, test)
+        assert curve[-1] == pytest.approx(expected, rel=1e-6), params
+        single, _ = learning_curve(estimator, params, X, y, train, test)
+        np.testing.assert_allclose(curve, single)
+
+
+@pytest.mark.parametrize('params', [{}, {'border_count': 32}])
+def test_catboost_scores_equal_raw_fits(data, params):
+    catboost = pytest.importorskip('catboost')
+    X, y, folds = data
+    estimator = catboost.CatBoostRegressor(iterations=30, depth=4, random_seed=0, verbose=False,
+                                           allow_writing_files=False)
+    datasets = FoldDatasets(X, y, folds)
+    for fold, (train, test) in enumerate(folds[:2]):
+        mae, _ = datasets.fit_and_score(estimator, params, fold)
+        expected, _ = fit_and_score(estimator, params, X, y, train, test)
+        assert mae == pytest.approx(expected, rel=1e-9), fold
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from sklearn.model_selection import KFold
+
+from steelworks import search
+from steelworks.columns import FEATURE_COLUMNS, TARGET
+from steelworks.scorecache import ScoreCache
+from steelworks.search import EarlyStoppingSearch, ParallelGridSearch
+
+lightgbm = pytest.importorskip('lightgbm')
+
+GRID = {'n_estimators': [10, 40, 25], 'learning_rate': [0.05, 0.2], 'max_depth': [3]}
+
+
+@pytest.fixture(scope='module')
+def Xy(final_df):
+    return final_df[FEATURE_COLUMNS], final_df[TARGET]
+
+
+def _estimator():
+    return lightgbm.LGBMRegressor(random_state=0, verbose=-1)
+
+
+def test_curves_score_like_separate_fits(Xy):
+    X, y = Xy
+    curves = EarlyStoppingSearch(_estimator(), GRID, KFold(3), patience=None, n_jobs=1).fit(X, y)
+    fits = ParallelGridSearch(_estimator(), GRID, KFold(3), n_jobs=1).fit(X, y)
+    assert curves.cv_results_['params'] == fits.cv_results_['params']
+    for j in range(3):
+        np.testing.assert_allclose(curves.cv_results_[f'split{j}_test_score'],
+                                   fits.cv_results_[f'split{j}_test_score'], rtol=1e-6)
+    assert curves.best_params_ == fits.best_params_
+    assert curves.cv_results_['reached'].all()
+    np.testing.assert_array_equal(curves.cv_results_['mean_fitted_iterations'], 40)
+
+
+def test_curves_fill_the_cache_of_separate_fits(Xy, tmp_path, monkeypatch):
+    X, y = Xy
+    cache = ScoreCache(str(tmp_path / 'scores.sqlite'))
+    EarlyStoppingSearch(_estimator(), GRID, KFold(3), patience=None, n_jobs=1,
+                        cache=cache).fit(X, y)
+    assert len(cache) == 6 * 3
+    monkeypatch.setattr(search, '_traced_fit', lambda *args: pytest.fail('fitted again'))
+    ParallelGridSearch(_estimator(), GRID, KFold(3), n_jobs=1, refit=False, cache=cache).fit(X, y)
+
+
+def test_lengths_past_an_early_stop_are_not_chosen(Xy):
+    X, y = Xy
+    grid = {'n_estimators': [5, 2000], 'learning_rate': [0.5], 'max_depth': [3]}
+    result = EarlyStoppingSearch(_estimator(), grid, KFold(3), patience=5, n_jobs=1,
+                                 refit=False).fit(X, y)
+    reached = dict(zip([p['n_estimators'] for p in result.cv_results_['params']],
+                       result.cv_results_['reached']))
+    assert reached == {5: True, 2000: False}
+    assert result.best_params_['n_estimators'] == 5
+    assert (result.cv_results_['mean_fitted_iterations'] < 2000).all()
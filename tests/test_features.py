@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from steelworks.columns import FEATURE_COLUMNS, TARGET
+from steelworks.features import build_training_table, feature_matrix
+from steelworks.quality import accepted_keys, check_quality
+from steelworks.summary import HeatSummary
+
+
+def _sparse_table(tables):
+    heats = HeatSummary.from_measurements(tables['data_temp'])
+    keys = accepted_keys(check_quality(tables, heats))
+    return build_training_table(tables, heats, keys, sparse=True)
+
+
+def test_sparse_table_has_the_dense_values(tables, final_df):
+    sparse = _sparse_table(tables)
+    assert list(sparse.columns) == list(final_df.columns)
+    assert isinstance(sparse['Bulk 1'].array, pd.arrays.SparseArray)
+    dense = sparse.apply(lambda column: column.sparse.to_dense()
+                         if isinstance(column.array, pd.arrays.SparseArray) else column)
+    np.testing.assert_allclose(dense.to_numpy(dtype=np.float64),
+                               final_df.to_numpy(dtype=np.float64), rtol=1e-6)
+
+
+def test_feature_matrix_equals_the_dense_features(tables, final_df):
+    expected = final_df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    np.testing.assert_array_equal(feature_matrix(final_df).toarray(), expected)
+    np.testing.assert_allclose(feature_matrix(_sparse_table(tables)).toarray(), expected,
+                               rtol=1e-6)
+
+
+def test_linear_fit_on_the_sparse_matrix(tables, final_df):
+    sparse = _sparse_table(tables)
+    dense = LinearRegression().fit(final_df[FEATURE_COLUMNS].to_numpy(), final_df[TARGET])
+    fitted = LinearRegression(tol=1e-10).fit(feature_matrix(sparse), sparse[TARGET])
+    rows = final_df[FEATURE_COLUMNS].to_numpy()
+    np.testing.assert_allclose(fitted.predict(rows), dense.predict(rows), atol=1e-3)
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from steelworks.features import arc_electricity
+from steelworks.intervals import ARC_END, ARC_START, INTERVAL_COLUMNS, build_interval_table
+from steelworks.summary import KEY, TEMPERATURE, TIME
+
+
+@pytest.fixture(scope='module')
+def intervals(tables):
+    return build_interval_table(tables)
+
+
+def _naive_arc(arc, start, end):
+    """Arc energy and seconds in (start, end], sessions split pro rata."""
+    energy = seconds = 0.0
+    for begin, finish, session_energy in zip(arc[ARC_START], arc[ARC_END],
+                                             arc_electricity(arc)):
+        duration = (finish - begin).total_seconds()
+        inside = (min(finish, end) - max(begin, start)).total_seconds()
+        if duration > 0 and inside > 0:
+            energy += session_energy * inside / duration
+            seconds += inside
+    return energy, seconds
+
+
+def test_one_row_per_measurement_after_the_first(tables, intervals):
+    temp = tables['data_temp']
+    assert list(intervals.columns) == INTERVAL_COLUMNS
+    assert len(intervals) == len(temp) - temp[KEY].nunique()
+    assert (intervals['interval_seconds'] >= 0).all()
+
+
+def test_arc_energy_is_split_at_the_measurements(tables, intervals):
+    arc, temp = tables['data_arc'], tables['data_temp']
+    for key in intervals[KEY].drop_duplicates().iloc[:25]:
+        sessions = arc.loc[arc[KEY] == key, [ARC_START, ARC_END, 'Активная мощность',
+                                            'Реактивная мощность']]
+        times = temp.loc[temp[KEY] == key, TIME].sort_values().tolist()
+        rows = intervals[intervals[KEY] == key]
+        expected = [_naive_arc(sessions, a, b) for a, b in zip(times[:-1], times[1:])]
+        np.testing.assert_allclose(rows['electricity'], [e for e, _ in expected],
+                                   rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(rows['arc_seconds'], [s for _, s in expected], atol=1e-6)
+
+
+def test_materials_land_in_their_interval(tables, intervals):
+    bulk, bulk_time, temp = tables['data_bulk'], tables['data_bulk_time'], tables['data_temp']
+    span = temp.groupby(KEY)[TIME].agg(['min', 'max'])
+    added = intervals.groupby(KEY)['Bulk 14'].sum()
+    merged = bulk[[KEY, 'Bulk 14']].merge(bulk_time[[KEY, 'Bulk 14']], on=KEY,
+                                          suffixes=('', '_time')).set_index(KEY)
+    merged = merged.join(span, how='inner').loc[added.index.intersection(merged.index)]
+    inside = (merged['Bulk 14_time'] > merged['min']) & (merged['Bulk 14_time'] <= merged['max'])
+    expected = merged['Bulk 14'].where(inside, 0.0).fillna(0.0)
+    np.testing.assert_allclose(added.loc[expected.index], expected, rtol=1e-6)
+
+
+def test_sparse_materials_have_the_dense_values(tables, intervals):
+    sparse = build_interval_table(tables, sparse=True)
+    assert isinstance(sparse['Bulk 1'].array, pd.arrays.SparseArray)
+    for column in ('Bulk 1', 'Wire 1', TEMPERATURE + '_y'):
+        np.testing.assert_array_equal(np.asarray(sparse[column], dtype=np.float64),
+                                      np.asarray(intervals[column], dtype=np.float64))
@@ -0,0 +1,54 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from steelworks.io import CACHE_DIRNAME, TABLES, load_table, load_tables
+from steelworks.synthetic import write_tables
+
+
+@pytest.fixture()
+def data_dir(tables, tmp_path):
+    write_tables(tables, str(tmp_path))
+    return str(tmp_path)
+
+
+def _cache_file(data_dir, name):
+    return os.path.join(data_dir, CACHE_DIRNAME, name + '.feather')
+
+
+def test_cached_tables_equal_the_csv(data_dir):
+    parsed = load_tables(data_dir, use_cache=False)
+    first = load_tables(data_dir)
+    assert all(os.path.exists(_cache_file(data_dir, name)) for name in TABLES)
+    cached = load_tables(data_dir)
+    for name in TABLES:
+        pd.testing.assert_frame_equal(first[name], parsed[name])
+        pd.testing.assert_frame_equal(cached[name], parsed[name])
+    pd.testing.assert_frame_equal(load_table('data_temp', data_dir, memory_map=False),
+                                  parsed['data_temp'])
+
+
+def test_cache_is_reused_until_the_csv_changes(tables, data_dir):
+    load_table('data_gas', data_dir)
+    cache = _cache_file(data_dir, 'data_gas')
+    built = os.stat(cache).st_mtime_ns
+    load_table('data_gas', data_dir)
+    assert os.stat(cache).st_mtime_ns == built
+
+    write_tables({'data_gas': tables['data_gas'].iloc[:10]}, data_dir)
+    assert len(load_table('data_gas', data_dir)) == 10
+
+
+def test_cache_dir_can_be_elsewhere(data_dir, tmp_path):
+    cache_dir = str(tmp_path / 'elsewhere')
+    load_table('data_arc', data_dir, cache_dir=cache_dir)
+    assert os.listdir(cache_dir)
+    assert not os.path.exists(os.path.join(data_dir, CACHE_DIRNAME))
+
+
+def test_unknown_table_is_refused(data_dir):
+    with pytest.raises(ValueError):
+        load_table('data_steel', data_dir)
@@ -0,0 +1,24 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import KFold
+from sklearn.tree import DecisionTreeRegressor
+
+from steelworks.columns import FEATURE_COLUMNS, TARGET
+from steelworks.leaderboard import COLUMNS, leaderboard
+from steelworks.search import fit_and_score
+
+
+def test_rows_measure_every_model(final_df):
+    train, test = final_df.iloc[:800], final_df.iloc[800:]
+    models = {'linear': LinearRegression(), 'tree': DecisionTreeRegressor(max_depth=4)}
+    board = leaderboard(models, train[FEATURE_COLUMNS], train[TARGET], test[FEATURE_COLUMNS],
+                        test[TARGET], KFold(3), isolate=False)
+    assert list(board.columns) == COLUMNS
+    assert list(board['model']) == ['linear', 'tree']
+    assert (board['peak_rss_mb'] >= 0).all() and (board['model_bytes'] > 0).all()
+
+    X = train[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    y = train[TARGET].to_numpy(dtype=np.float64)
+    expected = np.mean([fit_and_score(LinearRegression(), {}, X, y, a, b)[0]
+                        for a, b in KFold(3).split(X)])
+    assert board.loc[0, 'cv_mae'] == expected
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from steelworks.columns import FEATURE_COLUMNS, KEY, TARGET
+from steelworks.io import TABLES
+from steelworks.online import FeatureEngine
+
+
+@pytest.fixture(scope='module')
+def engine(tables):
+    engine = FeatureEngine()
+    for name in TABLES:
+        for row in tables[name].to_dict('records'):
+            engine.update(name, row)
+    return engine
+
+
+def test_live_features_equal_the_training_table(engine, final_df):
+    keys = final_df[KEY].tolist()
+    np.testing.assert_allclose(engine.frame(keys).to_numpy(),
+                               final_df[FEATURE_COLUMNS].to_numpy(dtype=np.float64), rtol=1e-5)
+    np.testing.assert_allclose([engine.last_temperature(key) for key in keys],
+                               final_df[TARGET].to_numpy(dtype=np.float64), rtol=1e-6)
+
+
+def test_out_of_order_measurements():
+    engine = FeatureEngine()
+    engine.add_temperature(1, '2019-05-03 11:10:00', 1600.0)
+    engine.add_temperature(1, '2019-05-03 11:00:00', 1570.0)
+    engine.add_temperature(1, '2019-05-03 11:05:00', 1590.0)
+    assert engine.features(1)[FEATURE_COLUMNS.index('Температура_x')] == 1570.0
+    assert engine.last_temperature(1) == 1600.0
+
+
+def test_heats_are_forgotten_when_closed():
+    engine = FeatureEngine()
+    engine.add_gas(7, 2.5)
+    engine.add_bulk(7, 'Bulk 1', 10.0)
+    vector = engine.close(7)
+    assert vector[FEATURE_COLUMNS.index('Газ 1')] == 2.5
+    assert vector[FEATURE_COLUMNS.index('Bulk 1')] == 10.0
+    assert 7 not in engine and len(engine) == 0
+    with pytest.raises(KeyError):
+        engine.add_wire(8, 'Wire 99', 1.0)
+    with pytest.raises(ValueError):
+        engine.update('data_steel', {'key': 8})
@@ -0,0 +1,99 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from steelworks.features import build_training_table
+from steelworks.io import load_tables
+from steelworks.partition import (load_partition, partitioned_training_table, write_partitions,
+                                  write_training_table)
+from steelworks.quality import accepted_keys, check_quality, rejection_reasons
+from steelworks.summary import HeatSummary
+from steelworks.synthetic import write_tables
+
+KEYS_PER_PARTITION = 400
+CHUNK_ROWS = 2_000
+
+
+@pytest.fixture(scope='module')
+def data_dir(tables, tmp_path_factory):
+    path = tmp_path_factory.mktemp('final_steel')
+    write_tables(tables, str(path))
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def reference(data_dir):
+    tables = load_tables(data_dir, use_cache=False)
+    heats = HeatSummary.from_measurements(tables['data_temp'])
+    violations = check_quality(tables, heats)
+    return (build_training_table(tables, heats, accepted_keys(violations)),
+            rejection_reasons(violations))
+
+
+def partitioned(data_dir, out_dir, n_jobs=1):
+    return partitioned_training_table(data_dir, str(out_dir), KEYS_PER_PARTITION, CHUNK_ROWS,
+                                      n_jobs=n_jobs)
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_equals_the_full_training_table(data_dir, reference, tmp_path, n_jobs):
+    final_df, reasons = partitioned(data_dir, tmp_path, n_jobs)
+    expected_df, expected_reasons = reference
+    pd.testing.assert_frame_equal(final_df, expected_df.reset_index(drop=True))
+    pd.testing.assert_frame_equal(reasons.sort_values(['key', 'rule'], ignore_index=True),
+                                  expected_reasons.sort_values(['key', 'rule'],
+                                                               ignore_index=True))
+
+
+def test_partitions_hold_their_key_range(data_dir, tmp_path):
+    partitions = write_partitions(data_dir, str(tmp_path), KEYS_PER_PARTITION, CHUNK_ROWS)
+    assert len(partitions) > 1
+    for partition in partitions:
+        for name, table in load_partition(partition, data_dir, str(tmp_path)).items():
+            assert (table['key'] // KEYS_PER_PARTITION == partition).all(), name
+
+
+def test_partitions_are_reused_until_a_source_changes(data_dir, tmp_path):
+    write_partitions(data_dir, str(tmp_path), KEYS_PER_PARTITION, CHUNK_ROWS)
+    marker = tmp_path / 'part-000000' / 'marker'
+    marker.write_text('')
+    write_partitions(data_dir, str(tmp_path), KEYS_PER_PARTITION, CHUNK_ROWS)
+    assert marker.exists()
+    write_partitions(data_dir, str(tmp_path), KEYS_PER_PARTITION // 2, CHUNK_ROWS)
+    assert not marker.exists()
+
+
+def test_written_table_equals_the_full_training_table(data_dir, reference, tmp_path):
+    path = str(tmp_path / 'final.feather')
+    rows = write_training_table(path, data_dir, str(tmp_path / 'partitions'),
+                                KEYS_PER_PARTITION, CHUNK_ROWS)
+    expected_df, _ = reference
+    assert rows == len(expected_df)
+    pd.testing.assert_frame_equal(pd.read_feather(path), expected_df.reset_index(drop=True))
+
+
+def test_split_on_a_pool_writes_the_same_partitions(data_dir, tmp_path):
+    serial = write_partitions(data_dir, str(tmp_path / 'serial'), KEYS_PER_PARTITION, CHUNK_ROWS)
+    pooled = write_partitions(data_dir, str(tmp_path / 'pooled'), KEYS_PER_PARTITION, CHUNK_ROWS,
+                              n_jobs=2)
+    assert pooled == serial
+    for partition in serial:
+        expected = load_partition(partition, data_dir, str(tmp_path / 'serial'))
+        for name, table in load_partition(partition, data_dir, str(tmp_path / 'pooled')).items():
+            pd.testing.assert_frame_equal(table, expected[name])
+
+
+def test_tables_without_rows_give_an_empty_training_table(tables, reference, tmp_path):
+    data_dir = str(tmp_path / 'final_steel')
+    write_tables({name: table.iloc[:0] for name, table in tables.items()}, data_dir)
+    final_df, reasons = partitioned(data_dir, tmp_path / 'partitions')
+    expected_df, _ = reference
+    assert len(final_df) == len(reasons) == 0
+    assert list(final_df.columns) == list(expected_df.columns)
+
+    path = str(tmp_path / 'final.feather')
+    assert write_training_table(path, data_dir, str(tmp_path / 'partitions'),
+                                KEYS_PER_PARTITION, CHUNK_ROWS) == 0
+    written = pd.read_feather(path)
+    assert len(written) == 0 and list(written.columns) == list(expected_df.columns)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from steelworks.io import TABLES
+from steelworks.quality import (RULES, accepted_keys, check_quality, key_coverage,
+                                rejection_reasons)
+from steelworks.summary import HeatSummary
+
+
+def test_key_coverage_matches_isin(tables):
+    coverage = key_coverage(tables)
+    all_keys = np.unique(np.concatenate([tables[name]['key'].to_numpy() for name in TABLES]))
+    np.testing.assert_array_equal(coverage.index, all_keys)
+    for name in TABLES:
+        np.testing.assert_array_equal(coverage[name], coverage.index.isin(tables[name]['key']))
+
+
+def test_key_coverage_of_sparse_keys():
+    tables = {'data_arc': pd.DataFrame({'key': [3, 2**40, 3]}),
+              'data_temp': pd.DataFrame({'key': [2**40 + 7]})}
+    coverage = key_coverage(tables)
+    assert list(coverage.index) == [3, 2**40, 2**40 + 7]
+    assert coverage['data_arc'].tolist() == [True, True, False]
+    assert coverage['data_temp'].tolist() == [False, False, True]
+
+
+def test_key_coverage_of_empty_tables(tables):
+    empty = {name: table.iloc[:0] for name, table in tables.items()}
+    coverage = key_coverage(empty)
+    assert coverage.empty and list(coverage.columns) == list(TABLES)
+
+
+def test_rules_reject_the_anomalies(tables):
+    heats = HeatSummary.from_measurements(tables['data_temp'])
+    accepted = accepted_keys(check_quality(tables, heats))
+    arc = tables['data_arc']
+    negative = arc.loc[arc['Реактивная мощность'] < 0, 'key']
+    assert not set(negative) & set(accepted)
+    assert not set(heats.frame.index[heats.frame['last_temp'].isna()]) & set(accepted)
+
+
+def test_only_rejecting_rules_drop_keys():
+    violations = pd.DataFrame({'missing_final_temperature': [True, False, False, False],
+                               'negative_power': [False, True, False, False],
+                               'long_duration': [False, False, True, False]},
+                              index=pd.Index([10, 11, 12, 13], name='key'))
+    assert list(accepted_keys(violations)) == [12, 13]
+    reasons = rejection_reasons(violations)
+    assert list(zip(reasons['key'], reasons['rule'], reasons['reject'])) == [
+        (10, 'missing_final_temperature', True), (11, 'negative_power', True),
+        (12, 'long_duration', False)]
+
+
+def test_accepted_keys_are_the_keys_without_rejections(tables):
+    heats = HeatSummary.from_measurements(tables['data_temp'])
+    violations = check_quality(tables, heats)
+    assert list(violations.columns) == [rule.name for rule in RULES]
+    reasons = rejection_reasons(violations)
+    rejected = set(reasons.loc[reasons['reject'], 'key'])
+    assert rejected
+    assert set(accepted_keys(violations)) == set(violations.index) - rejected
+    # Keys without a final temperature never reach the training table.
+    measured = heats.frame.index[heats.frame['last_temp'].notna()]
+    assert not set(accepted_keys(violations)) - set(measured)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from steelworks import recommend
+from steelworks.columns import FEATURE_COLUMNS
+from steelworks.recommend import ArcRecommender
+
+ELECTRICITY = FEATURE_COLUMNS.index('electricity')
+FIRST_TEMP = FEATURE_COLUMNS.index('Температура_x')
+
+
+class HeatingModel:
+    """Final temperature: the first one plus 0.01 degree per unit of energy."""
+
+    def predict(self, rows):
+        return rows[:, FIRST_TEMP] + 0.01 * rows[:, ELECTRICITY]
+
+
+def _row(first_temp, energy):
+    row = np.zeros(len(FEATURE_COLUMNS))
+    row[FIRST_TEMP], row[ELECTRICITY] = first_temp, energy
+    return row
+
+
+def test_smallest_addition_in_the_band():
+    recommender = ArcRecommender(HeatingModel(), band=(1585.0, 1600.0), max_extra_energy=4000.0,
+                                 n_candidates=201)
+    result = recommender.recommend(_row(1560.0, 500.0), apparent_power=2.0)
+    # 1560 + 0.01 * (500 + extra) >= 1585 first for extra = 2000.
+    assert result.extra_energy == pytest.approx(2000.0)
+    assert result.arc_seconds == pytest.approx(1000.0)
+    assert result.predicted_temperature == pytest.approx(1585.0)
+    assert result.in_band
+
+
+def test_unreachable_band_returns_the_closest_candidate():
+    recommender = ArcRecommender(HeatingModel(), max_extra_energy=1000.0)
+    too_cold = recommender.recommend(_row(1500.0, 0.0))
+    assert not too_cold.in_band and too_cold.extra_energy == 1000.0
+    too_hot = recommender.recommend(_row(1620.0, 0.0))
+    assert not too_hot.in_band and too_hot.extra_energy == 0.0
+
+
+def test_batches_agree_with_single_heats(final_df, monkeypatch):
+    monkeypatch.setattr(recommend, 'BATCH_ROWS', 1000)
+    recommender = ArcRecommender(HeatingModel())
+    rows = final_df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)[:50]
+    batch = recommender.recommend_batch(rows)
+    for row, chosen in zip(rows, batch.itertuples()):
+        single = recommender.recommend(row)
+        assert (chosen.extra_energy, chosen.in_band) == (single.extra_energy, single.in_band)
+
+
+def test_savings_sum_over_the_reachable_heats(final_df):
+    result, summary = ArcRecommender(HeatingModel()).savings(final_df)
+    assert summary['heats'] == len(final_df) == len(result)
+    reachable = result[result['in_band']]
+    assert summary['reachable_heats'] == len(reachable) > 0
+    assert summary['saved_energy'] == pytest.approx(
+        summary['actual_energy'] - summary['recommended_energy'])
+    np.testing.assert_array_equal(result['actual_energy'], final_df['electricity'])
@@ -0,0 +1,93 @@
+import pytest
+from sklearn.dummy import DummyRegressor
+
+lightgbm = pytest.importorskip('lightgbm')
+
+from steelworks import refresh
+from steelworks.cli import main
+from steelworks.columns import FEATURE_COLUMNS, KEY, TARGET
+from steelworks.models import load_model
+from steelworks.refresh import read_meta, training_meta, update_model, write_meta
+
+
+@pytest.fixture()
+def trained(final_df):
+    old = final_df[final_df[KEY] <= final_df[KEY].quantile(0.7)]
+    estimator = lightgbm.LGBMRegressor(n_estimators=30, random_state=22, verbose=-1)
+    model = lightgbm.LGBMRegressor(**estimator.get_params()).fit(old[FEATURE_COLUMNS], old[TARGET])
+    meta = training_meta('lgbm', estimator, old[KEY].max(), len(old), holdout_mae=None)
+    return model, estimator, meta
+
+
+def test_nothing_new_leaves_the_model(final_df, trained):
+    model, estimator, meta = trained
+    meta = {**meta, 'last_key': int(final_df[KEY].max())}
+    updated, new_meta = update_model(model, estimator, meta, final_df)
+    assert updated is model
+    assert new_meta['history'][-1]['mode'] == 'unchanged'
+    assert new_meta['last_key'] == meta['last_key']
+
+
+def test_incremental_update_moves_the_last_key(final_df, trained, monkeypatch):
+    model, estimator, meta = trained
+    monkeypatch.setattr(refresh, 'add_trees', lambda model, *args: model)
+    updated, new_meta = update_model(model, estimator, meta, final_df, holdout=100)
+    record = new_meta['history'][-1]
+    assert record['mode'] == 'incremental'
+    new = final_df[final_df[KEY] > meta['last_key']].sort_values(KEY)
+    assert new_meta['last_key'] == new[KEY].iloc[-101]
+    assert new_meta['heats'] == meta['heats'] + len(new) - 100
+
+
+def test_kept_model_keeps_its_last_key(final_df, trained, monkeypatch):
+    model, estimator, meta = trained
+    worse = DummyRegressor(strategy='constant', constant=0.0).fit(
+        final_df[FEATURE_COLUMNS], final_df[TARGET])
+    monkeypatch.setattr(refresh, 'add_trees', lambda *args: worse)
+    updated, new_meta = update_model(model, estimator, meta, final_df, holdout=100)
+    assert new_meta['history'][-1]['mode'] == 'kept'
+    assert updated is model
+    assert (new_meta['last_key'], new_meta['heats']) == (meta['last_key'], meta['heats'])
+    # The skipped heats are offered again by the next refresh.
+    _, again = update_model(model, estimator, new_meta, final_df, holdout=100)
+    assert again['history'][-1]['new_heats'] == new_meta['history'][-1]['new_heats']
+
+
+def test_drift_forces_a_retrain(final_df, trained):
+    model, estimator, meta = trained
+    updated, new_meta = update_model(model, estimator, meta, final_df, holdout=100, max_drift=-1)
+    record = new_meta['history'][-1]
+    assert record['mode'] == 'retrain'
+    assert updated is not model
+    assert new_meta['holdout_mae'] == record['holdout_mae']
+    assert new_meta['heats'] == len(final_df) - 100
+
+
+def test_continued_boosting_adds_trees(final_df, trained):
+    model, estimator, _ = trained
+    new = final_df[final_df[KEY] > final_df[KEY].quantile(0.7)]
+    updated = refresh.add_trees(model, estimator, new[FEATURE_COLUMNS], new[TARGET], 5)
+    assert updated.booster_.num_trees() == model.booster_.num_trees() + 5
+
+
+def test_meta_round_trips_and_rejects_what_it_cannot_read_back(trained, tmp_path):
+    _, _, meta = trained
+    model_path = str(tmp_path / 'lgbm.pkl')
+    write_meta(meta, model_path)
+    assert read_meta(model_path) == meta
+    with pytest.raises(TypeError):
+        write_meta({**meta, 'params': {'regressor': DummyRegressor()}}, model_path)
+    assert read_meta(model_path) == meta
+
+
+def test_trained_model_covers_every_heat_up_to_its_last_key(final_df, tmp_path):
+    table = str(tmp_path / 'final.feather')
+    final_df.reset_index(drop=True).to_feather(table)
+    model_path = str(tmp_path / 'tree.pkl')
+    main(['train', '--model', 'tree', '--input', table, '--output', model_path,
+          '--param', 'max_depth=4'])
+    meta = read_meta(model_path)
+    assert meta['last_key'] == final_df[KEY].max()
+    assert meta['heats'] == len(final_df)
+    assert meta['holdout_mae'] is not None
+    assert load_model(model_path).tree_.n_node_samples[0] == len(final_df)
@@ -0,0 +1,79 @@
+import os
+import signal
+import threading
+import time
+
+import numpy as np
+import pytest
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.model_selection import KFold
+from sklearn.tree import DecisionTreeRegressor
+
+from steelworks.columns import FEATURE_COLUMNS, TARGET
+from steelworks import scheduler
+from steelworks.scheduler import SearchScheduler
+from steelworks.search import ParallelGridSearch
+
+
+class SlowRegressor(RegressorMixin, BaseEstimator):
+    """Predicts the mean, after sleeping ``seconds`` in every fit on at
+    least ``min_rows`` rows."""
+
+    def __init__(self, seconds=60.0, min_rows=0):
+        self.seconds = seconds
+        self.min_rows = min_rows
+
+    def fit(self, X, y):
+        if len(X) >= self.min_rows:
+            time.sleep(self.seconds)
+        self.mean_ = float(np.mean(y))
+        return self
+
+    def predict(self, X):
+        return np.full(len(X), self.mean_)
+
+
+@pytest.fixture(scope='module')
+def Xy(final_df):
+    return final_df[FEATURE_COLUMNS], final_df[TARGET]
+
+
+def test_scheduled_searches_match_searches_alone(Xy):
+    X, y = Xy
+    grids = {'shallow': {'max_depth': [2, 3]},
+             'deep': {'max_depth': [6, 8], 'min_samples_leaf': [1, 10]}}
+    searches = {name: ParallelGridSearch(DecisionTreeRegressor(random_state=0), grid, KFold(3))
+                for name, grid in grids.items()}
+    SearchScheduler(cpus=2).fit(searches, X, y)
+    for name, grid in grids.items():
+        alone = ParallelGridSearch(DecisionTreeRegressor(random_state=0), grid, KFold(3),
+                                   n_jobs=1).fit(X, y)
+        assert searches[name].best_params_ == alone.best_params_
+        np.testing.assert_allclose(searches[name].cv_results_['mean_test_score'],
+                                   alone.cv_results_['mean_test_score'])
+
+
+def test_an_interrupt_stops_the_searches(Xy):
+    X, y = Xy
+    searches = {'slow': ParallelGridSearch(SlowRegressor(), {'seconds': [60.0]}, KFold(2)),
+                'slower': ParallelGridSearch(SlowRegressor(), {'seconds': [90.0]}, KFold(2))}
+    threading.Timer(3.0, os.kill, (os.getpid(), signal.SIGINT)).start()
+    started = time.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        SearchScheduler(cpus=1).fit(searches, X, y)
+    assert time.monotonic() - started < 30
+    assert not {'slow', 'slower'} & {thread.name for thread in threading.enumerate()}
+
+
+def test_an_interrupted_refit_is_left_behind(Xy, monkeypatch):
+    X, y = Xy
+    monkeypatch.setattr(scheduler, 'STOP_SECONDS', 1.0)
+    # Fold fits are quick, the refit on all rows sleeps.
+    search = ParallelGridSearch(SlowRegressor(min_rows=len(X)), {'seconds': [60.0]}, KFold(2))
+    threading.Timer(5.0, os.kill, (os.getpid(), signal.SIGINT)).start()
+    started = time.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        SearchScheduler(cpus=1).fit({'refit': search}, X, y)
+    assert time.monotonic() - started < 15
+    left = [thread for thread in threading.enumerate() if thread.name == 'refit']
+    assert left and all(thread.daemon for thread in left)
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from steelworks.io import TABLES
+from steelworks.schema import DATETIME, SCHEMAS, read_typed_csv
+from steelworks.synthetic import write_tables
+
+
+def test_tables_are_read_with_their_schema(tables, tmp_path):
+    write_tables(tables, str(tmp_path))
+    for name in TABLES:
+        df = read_typed_csv(str(tmp_path / f'{name}.csv'), name)
+        assert list(df.columns) == list(SCHEMAS[name])
+        for column, kind in SCHEMAS[name].items():
+            if kind == DATETIME:
+                assert df[column].dtype.kind == 'M', (name, column)
+            else:
+                assert str(df[column].dtype) == kind, (name, column)
+        assert len(df) == len(tables[name])
+
+
+def test_sparse_volumes_keep_their_gaps(tables, tmp_path):
+    write_tables(tables, str(tmp_path))
+    bulk = read_typed_csv(str(tmp_path / 'data_bulk.csv'), 'data_bulk')
+    source = tables['data_bulk']
+    for column in bulk.columns[1:]:
+        assert (bulk[column].isna().to_numpy() == source[column].isna().to_numpy()).all()
+
+
+def test_chunks_equal_the_whole_table(tables, tmp_path):
+    write_tables(tables, str(tmp_path))
+    path = str(tmp_path / 'data_arc.csv')
+    whole = read_typed_csv(path, 'data_arc')
+    chunks = list(read_typed_csv(path, 'data_arc', chunksize=1000))
+    assert len(chunks) == -(-len(whole) // 1000)
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), whole)
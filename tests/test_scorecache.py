@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from sklearn.base import clone
+from sklearn.compose import TransformedTargetRegressor
+from sklearn.ensemble import BaggingRegressor
+from sklearn.model_selection import KFold
+from sklearn.tree import DecisionTreeRegressor
+
+from steelworks import search
+from steelworks.scorecache import ScoreCache, model_fingerprint
+from steelworks.search import FitPool
+
+
+@pytest.fixture()
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(120, 4))
+    y = X @ [1.0, -2.0, 0.5, 0.0] + rng.normal(scale=0.1, size=120)
+    folds = list(KFold(3).split(X))
+    return X, y, folds
+
+
+@pytest.fixture()
+def fits(monkeypatch):
+    done = []
+    traced_fit = search._traced_fit
+
+    def counting(estimator, params, datasets, fold, n_train, candidate):
+        done.append((candidate, fold))
+        return traced_fit(estimator, params, datasets, fold, n_train, candidate)
+
+    monkeypatch.setattr(search, '_traced_fit', counting)
+    return done
+
+
+def test_estimator_parameters_are_fingerprinted_by_their_params():
+    first = model_fingerprint(BaggingRegressor(DecisionTreeRegressor(max_depth=3)), {})
+    again = model_fingerprint(BaggingRegressor(DecisionTreeRegressor(max_depth=3)), {})
+    other = model_fingerprint(BaggingRegressor(DecisionTreeRegressor(max_depth=4)), {})
+    assert first == again
+    assert first != other
+    assert ' at 0x' not in first[1]
+
+
+def test_functions_without_an_address_are_cacheable():
+    estimator = TransformedTargetRegressor(DecisionTreeRegressor(), func=np.log1p,
+                                           inverse_func=np.expm1)
+    assert model_fingerprint(estimator, {}) == model_fingerprint(clone(estimator), {})
+    assert model_fingerprint(estimator, {'regressor__max_depth': np.int64(3)})[1] == \
+        model_fingerprint(estimator, {'regressor__max_depth': 3})[1]
+
+
+def test_values_with_an_address_are_not_cached(data, fits, tmp_path):
+    estimator = TransformedTargetRegressor(DecisionTreeRegressor(), func=lambda y: y,
+                                           inverse_func=lambda y: y)
+    assert model_fingerprint(estimator, {}) is None
+    cache = ScoreCache(str(tmp_path / 'scores.sqlite'))
+    for _ in range(2):
+        with FitPool(estimator, *data, n_jobs=1, cache=cache) as pool:
+            pool.scores([{'regressor__max_depth': 2}])
+    assert len(fits) == 6
+    assert len(cache) == 0
+
+
+def test_a_repeated_search_fits_only_new_candidates(data, fits, tmp_path):
+    cache = ScoreCache(str(tmp_path / 'scores.sqlite'))
+    with FitPool(DecisionTreeRegressor(random_state=0), *data, n_jobs=1, cache=cache) as pool:
+        first, _ = pool.scores([{'max_depth': 2}, {'max_depth': 3}])
+    assert len(fits) == 6
+    fits.clear()
+
+    with FitPool(DecisionTreeRegressor(random_state=0), *data, n_jobs=1, cache=cache) as pool:
+        scores, _ = pool.scores([{'max_depth': 2}, {'max_depth': 3}, {'max_depth': 4}])
+    assert sorted(fits) == [(2, 0), (2, 1), (2, 2)]
+    np.testing.assert_array_equal(scores[:2], first)
+    assert len(cache) == 9
+
+
+def test_a_changed_dataset_misses_the_cache(data, fits, tmp_path):
+    X, y, folds = data
+    cache = ScoreCache(str(tmp_path / 'scores.sqlite'))
+    for target in (y, y + 1):
+        with FitPool(DecisionTreeRegressor(random_state=0), X, target, folds, n_jobs=1,
+                     cache=cache) as pool:
+            pool.scores([{'max_depth': 2}])
+    assert len(fits) == 6
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ScoreCache(str(tmp_path / 'scores.sqlite'), max_entries=2)
+    a, b, c = (cache.key('data', 'model', name, 0) for name in 'abc')
+    cache.store(a, 1.0, 0.1)
+    cache.store(b, 2.0, 0.1)
+    assert cache.lookup([a]) == {a: (1.0, 0.1)}
+    cache.store(c, 3.0, 0.1)
+    assert len(cache) == 2
+    assert set(cache.lookup([a, b, c])) == {a, c}
+
+
+def test_results_survive_reopening(tmp_path):
+    path = str(tmp_path / 'scores.sqlite')
+    cache = ScoreCache(path)
+    key = cache.key('data', 'model', '{}', 1, 50)
+    cache.store(key, 4.5, 0.2)
+    cache.close()
+    assert ScoreCache(path).lookup([key]) == {key: (4.5, 0.2)}
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from sklearn.model_selection import GridSearchCV, KFold
+from sklearn.tree import DecisionTreeRegressor
+
+from steelworks.columns import FEATURE_COLUMNS, TARGET
+from steelworks.search import ParallelGridSearch
+
+
+GRID = {'max_depth': [2, 4, 6], 'min_samples_leaf': [1, 20]}
+
+
+@pytest.fixture(scope='module')
+def reference(final_df):
+    X, y = final_df[FEATURE_COLUMNS], final_df[TARGET]
+    search = GridSearchCV(DecisionTreeRegressor(random_state=0), GRID, cv=KFold(3),
+                          scoring='neg_mean_absolute_error').fit(X, y)
+    return X, y, search
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_matches_grid_search_cv(reference, n_jobs):
+    X, y, expected = reference
+    search = ParallelGridSearch(DecisionTreeRegressor(random_state=0), GRID, cv=KFold(3),
+                                n_jobs=n_jobs).fit(X, y)
+    assert search.best_params_ == expected.best_params_
+    assert search.best_score_ == pytest.approx(expected.best_score_)
+    assert search.cv_results_['params'] == expected.cv_results_['params']
+    for name in ('mean_test_score', 'split0_test_score', 'split1_test_score',
+                 'split2_test_score'):
+        np.testing.assert_allclose(search.cv_results_[name], expected.cv_results_[name])
+    np.testing.assert_array_equal(search.cv_results_['rank_test_score'],
+                                  expected.cv_results_['rank_test_score'])
+    np.testing.assert_allclose(search.best_estimator_.predict(X),
+                               expected.best_estimator_.predict(X))
+
+
+def test_without_refit_has_no_best_estimator(reference):
+    X, y, _ = reference
+    search = ParallelGridSearch(DecisionTreeRegressor(random_state=0), GRID, cv=KFold(3),
+                                n_jobs=1, refit=False).fit(X, y)
+    assert not hasattr(search, 'best_estimator_')
@@ -0,0 +1,67 @@
+import http.client
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from steelworks.columns import FEATURE_COLUMNS
+from steelworks.serve import MicroBatcher, make_server, parse_rows
+
+
+class SumModel:
+    def predict(self, rows):
+        if np.isnan(rows).any():
+            raise RuntimeError('NaN features')
+        return rows.sum(axis=1)
+
+
+@pytest.fixture()
+def server():
+    batcher = MicroBatcher(SumModel())
+    server = make_server(batcher, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    batcher.close()
+
+
+def post(server, body):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    connection.request('POST', '/predict', body=json.dumps(body),
+                       headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    answer = response.status, json.loads(response.read())
+    connection.close()
+    return answer
+
+
+def test_parse_rows_by_name_and_position():
+    row = list(range(len(FEATURE_COLUMNS)))
+    named = dict(zip(FEATURE_COLUMNS, row))
+    np.testing.assert_array_equal(parse_rows({'instances': [row, named]}), [row, row])
+    with pytest.raises(ValueError):
+        parse_rows({'instances': []})
+    with pytest.raises(ValueError):
+        parse_rows({'features': row[:-1]})
+
+
+def test_predict(server):
+    row = [1.0] * len(FEATURE_COLUMNS)
+    assert post(server, {'instances': [row, row]}) == (200, {'predictions': [len(row)] * 2})
+
+
+def test_bad_requests(server):
+    assert post(server, {'instances': []})[0] == 400
+    assert post(server, {'features': [1.0]})[0] == 400
+    assert post(server, {'rows': []})[0] == 400
+
+
+def test_model_error_is_a_500(server):
+    status, body = post(server, {'features': [None] * len(FEATURE_COLUMNS)})
+    assert status == 500
+    assert 'NaN features' in body['error']
+    # The service keeps answering.
+    assert post(server, {'features': [0.0] * len(FEATURE_COLUMNS)})[0] == 200
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from steelworks.sketches import (ARC_END, ARC_METRICS, HEAT_METRICS, FeatureSketch, HeatMonitor,
+                                 RunningMoments, SketchMonitor, TDigest, table_sketches)
+
+QUANTILES = [0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999]
+
+
+@pytest.fixture(scope='module')
+def values():
+    return np.random.default_rng(0).lognormal(size=200_000)
+
+
+def rank_error(values, estimates, quantiles):
+    ordered = np.sort(values)
+    ranks = np.searchsorted(ordered, estimates) / len(ordered)
+    return np.max(np.abs(ranks - quantiles))
+
+
+def test_merged_digests_are_as_accurate_as_one(values):
+    parts = []
+    for chunk in np.array_split(values, 40):
+        digest = TDigest()
+        digest.update_many(chunk)
+        parts.append(digest)
+    merged = TDigest().merge(*parts)
+    assert rank_error(values, merged.quantile(QUANTILES), QUANTILES) < 5e-4
+    assert merged.count == len(values)
+    assert (merged.min, merged.max) == (values.min(), values.max())
+    assert len(merged.means) < merged.compression
+
+
+def test_streamed_values_match_a_batch(values):
+    streamed = TDigest()
+    for value in values[:20_000]:
+        streamed.update(value)
+    assert rank_error(values[:20_000], streamed.quantile(QUANTILES), QUANTILES) < 2e-3
+    assert streamed.quantile(0.0) == values[:20_000].min()
+    assert streamed.quantile(1.0) == values[:20_000].max()
+
+
+def test_empty_digest_has_no_quantiles():
+    assert np.isnan(TDigest().quantile(0.5))
+    assert np.isnan(TDigest().quantile([0.25, 0.75])).all()
+
+
+def test_merged_moments_are_exact(values):
+    moments = RunningMoments()
+    for chunk in np.array_split(values, 7):
+        part = RunningMoments()
+        part.update_many(chunk)
+        moments.merge(part)
+    streamed = RunningMoments()
+    for value in values[:1000]:
+        streamed.update(value)
+    assert moments.count == len(values)
+    assert moments.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert moments.var == pytest.approx(values.var(ddof=1), rel=1e-10)
+    assert streamed.std == pytest.approx(values[:1000].std(ddof=1), rel=1e-10)
+
+
+def test_describe_matches_pandas(values):
+    sketch = FeatureSketch()
+    sketch.update_many(np.r_[values, np.nan, np.inf])
+    expected = pd.Series(values).describe()
+    described = sketch.describe()
+    exact = ['count', 'mean', 'std', 'min', 'max']
+    pd.testing.assert_series_equal(described[exact], expected[exact], rtol=1e-10)
+    np.testing.assert_allclose(described[['25%', '50%', '75%']], expected[['25%', '50%', '75%']],
+                               rtol=2e-3)
+    assert FeatureSketch().describe()['count'] == 0
+
+
+def live_monitor(tables):
+    monitor = HeatMonitor()
+    events = [(row[ARC_END], 'data_arc', row) for row in tables['data_arc'].to_dict('records')]
+    events += [(row['Время замера'], 'data_temp', row)
+               for row in tables['data_temp'].to_dict('records')]
+    for _, table, row in sorted(events, key=lambda event: event[0]):
+        monitor.update(table, row)
+    for key in {row['key'] for _, _, row in events}:
+        monitor.close(key)
+    return monitor
+
+
+def test_live_monitor_matches_the_tables(tables):
+    live, batch = live_monitor(tables), table_sketches(tables)
+    metrics = ARC_METRICS + HEAT_METRICS
+    assert live.metrics == batch.metrics == sorted(metrics)
+    for metric in metrics:
+        pd.testing.assert_index_equal(live.windows(metric).index, batch.windows(metric).index)
+        expected, described = batch.describe([metric]), live.describe([metric])
+        exact = ['count', 'mean', 'std', 'min', 'max']
+        pd.testing.assert_frame_equal(described.loc[exact], expected.loc[exact], rtol=1e-9)
+        np.testing.assert_allclose(described.loc[['25%', '50%', '75%']],
+                                   expected.loc[['25%', '50%', '75%']], rtol=1e-2)
+
+
+def test_monitor_ranges_and_merge(tables):
+    monitor = table_sketches(tables)
+    windows = monitor.windows('last_temp')
+    middle = windows.index[len(windows) // 2]
+    before = monitor.sketch('last_temp', end=middle).count
+    after = monitor.sketch('last_temp', start=middle).count
+    assert before + after == windows['count'].sum() == monitor.sketch('last_temp').count
+
+    doubled = table_sketches(tables).merge(monitor)
+    assert doubled.sketch('last_temp').count == 2 * monitor.sketch('last_temp').count
+    with pytest.raises(ValueError):
+        SketchMonitor('1h').merge(monitor)
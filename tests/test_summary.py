@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from steelworks.quality import check_quality, heat_facts
+from steelworks.summary import HeatSummary
+
+
+def test_matches_idxmin_idxmax(tables):
+    temp = tables['data_temp']
+    heats = HeatSummary.from_measurements(temp).frame
+    first = temp.loc[temp.groupby('key')['Время замера'].idxmin()].set_index('key')
+    last = temp.loc[temp.groupby('key')['Время замера'].idxmax()].set_index('key')
+    pd.testing.assert_series_equal(heats['first_temp'], first['Температура'],
+                                   check_names=False)
+    pd.testing.assert_series_equal(heats['last_temp'], last['Температура'], check_names=False)
+    assert (heats['n_measurements'] == temp.groupby('key').size()).all()
+
+
+def test_empty_summary_has_the_same_dtypes(tables):
+    full = HeatSummary.from_measurements(tables['data_temp'])
+    empty = HeatSummary.from_measurements(tables['data_temp'].iloc[:0])
+    assert len(empty) == 0
+    pd.testing.assert_series_equal(empty.frame.dtypes, full.frame.dtypes)
+    assert empty.frame.index.dtype == full.frame.index.dtype
+    assert empty.duration_seconds().empty
+    assert empty.temperature_gain().empty
+
+
+def test_heats_without_measurements(tables):
+    # Arc and material rows, but no temperature rows, e.g. in a partition.
+    keys = tables['data_arc']['key'].unique()[:20]
+    part = {name: table[table['key'].isin(keys)] for name, table in tables.items()}
+    part['data_temp'] = part['data_temp'].iloc[:0]
+    heats = HeatSummary.from_measurements(part['data_temp'])
+    heat_facts(part, heats)
+    check_quality(part, heats)
+
+
+def test_partition_without_measurements(tables):
+    pytest.importorskip('pyarrow')
+    from steelworks.partition import process_partition
+
+    keys = tables['data_arc']['key'].unique()[:20]
+    part = {name: table[table['key'].isin(keys)] for name, table in tables.items()}
+    part['data_temp'] = part['data_temp'].iloc[:0]
+    final_df, _ = process_partition(part)
+    assert final_df.empty
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from steelworks import trace
+
+linux_only = pytest.mark.skipif(not os.path.exists('/proc/self/clear_refs'),
+                                reason='needs /proc/self/clear_refs')
+
+
+def _touch(megabytes):
+    block = np.ones(megabytes * 2**20 // 8)
+    del block
+
+
+def _spans(tracer):
+    return {span['name']: span for span in tracer.spans}
+
+
+def test_spans_are_recorded_and_written(tmp_path):
+    path = tmp_path / 'trace.json'
+    with trace.tracing(str(path)):
+        with trace.stage('outer', rows_in=3) as span:
+            with trace.stage('inner'):
+                pass
+            span.rows_out = 2
+    spans = {span['name']: span for span in json.loads(path.read_text())['spans']}
+    assert spans['outer']['rows_in'] == 3 and spans['outer']['rows_out'] == 2
+    assert spans['inner']['depth'] == 1
+    chrome = json.loads((tmp_path / 'trace.chrome.json').read_text())
+    assert {event['name'] for event in chrome['traceEvents']} == {'outer', 'inner'}
+
+
+def test_stage_is_free_when_tracing_is_off():
+    assert not trace.enabled()
+    assert trace.stage('anything') is trace.stage('other')
+
+
+@linux_only
+def test_nested_stages_pass_their_peak_up():
+    with trace.tracing() as tracer:
+        with trace.stage('outer'):
+            with trace.stage('inner'):
+                _touch(100)
+    spans = _spans(tracer)
+    assert spans['inner']['rss_exact'] and spans['outer']['rss_exact']
+    assert spans['inner']['rss_mb'] > 90 and spans['outer']['rss_mb'] > 90
+
+
+@linux_only
+def test_stage_of_another_thread_does_not_reset_the_peak():
+    def other():
+        with trace.stage('other'):
+            pass
+
+    with trace.tracing() as tracer:
+        with trace.stage('main'):
+            _touch(100)
+            thread = threading.Thread(target=other)
+            thread.start()
+            thread.join()
+    spans = _spans(tracer)
+    assert spans['main']['rss_exact'] and spans['main']['rss_mb'] > 90
+    assert not spans['other']['rss_exact']
+
+
+def test_refused_reset_falls_back_to_a_lower_bound(tmp_path, monkeypatch):
+    # A directory exists but cannot be opened for writing, like a
+    # clear_refs the container does not let us write.
+    monkeypatch.setattr(trace, '_CLEAR_REFS', str(tmp_path))
+    with trace.tracing() as tracer:
+        with trace.stage('refused'):
+            pass
+    span = _spans(tracer)['refused']
+    assert not span['rss_exact']
+    assert span['rss_mb'] >= 0
+
+
+@linux_only
+def test_peak_rss_measures_without_tracing():
+    with trace.PeakRss() as rss:
+        _touch(100)
+    assert rss.exact and rss.rss_mb > 90
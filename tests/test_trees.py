@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from steelworks.columns import FEATURE_COLUMNS, TARGET
+from steelworks.trees import TreeEnsemble, export_model
+
+
+def _lightgbm():
+    lightgbm = pytest.importorskip('lightgbm')
+    return lightgbm.LGBMRegressor(n_estimators=50, random_state=0, verbose=-1)
+
+
+def _catboost():
+    catboost = pytest.importorskip('catboost')
+    return catboost.CatBoostRegressor(iterations=50, depth=5, random_seed=0, verbose=False,
+                                      allow_writing_files=False)
+
+
+MODELS = {
+    'tree': lambda: DecisionTreeRegressor(max_depth=8, random_state=0),
+    'forest': lambda: RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+    'lightgbm': _lightgbm,
+    'catboost': _catboost,
+}
+
+
+@pytest.fixture(scope='module')
+def data(final_df):
+    X = final_df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    missing = X.copy()
+    missing[np.random.default_rng(0).random(X.shape) < 0.05] = np.nan
+    return X, missing, final_df[TARGET].to_numpy(dtype=np.float64)
+
+
+@pytest.mark.parametrize('nan_in_training', [False, True])
+@pytest.mark.parametrize('kind', sorted(MODELS))
+def test_export_predicts_like_the_library(kind, nan_in_training, data, tmp_path):
+    complete, missing, y = data
+    model = MODELS[kind]().fit(missing if nan_in_training else complete, y)
+    # Missing values at prediction time exercise the NaN routing either way.
+    X = np.vstack([complete, missing])
+    expected = model.predict(X)
+    ensemble = export_model(model)
+    np.testing.assert_allclose(ensemble.predict(X), expected, rtol=0, atol=1e-6)
+
+    nan_rows = np.full((3, X.shape[1]), np.nan)
+    np.testing.assert_allclose(ensemble.predict(nan_rows), model.predict(nan_rows), atol=1e-6)
+
+    path = str(tmp_path / f'{kind}.trees')
+    ensemble.save(path)
+    loaded = TreeEnsemble.load(path)
+    assert loaded.n_trees == ensemble.n_trees
+    np.testing.assert_array_equal(loaded.predict(X), ensemble.predict(X))
+
+
+def test_unknown_models_are_refused():
+    from sklearn.linear_model import LinearRegression
+
+    with pytest.raises(TypeError):
+        export_model(LinearRegression().fit([[0.0], [1.0]], [0.0, 1.0]))